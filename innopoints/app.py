@@ -13,6 +13,7 @@ import sqlalchemy.exc
 
 from innopoints.extensions import db, ma, mail, oauth, login_manager, push
 from innopoints.blueprints import all_blueprints
+from innopoints.commands import all_commands
 
 log = logging.getLogger(__name__)
 
@@ -87,6 +88,9 @@ def create_app(config='config/prod.py'):
         import_module(blueprint.import_name)
         app.register_blueprint(blueprint)
 
+    for command in all_commands:
+        app.cli.add_command(command)
+
     # Needed when running behind Nginx under Docker for authorization
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_host=1)
     return app
@@ -0,0 +1,341 @@
+"""Maintenance commands for the Flask CLI.
+
+To register a command, add it to the `all_commands` tuple.
+"""
+
+import logging
+import time
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_mail import Message
+from PIL import Image
+from sqlalchemy.exc import SQLAlchemyError
+
+from innopoints.core.file_manager import (
+    file_manager,
+    get_file_manager,
+    variant_handle,
+    FileManagerLocal,
+)
+from innopoints.core.image import make_variants, VARIANT_QUALITY
+from innopoints.core.image_processing import process_pending
+from innopoints.core.notifications.delivery import deliver_pending, prune_sent
+from innopoints.core.notifications.content import get_content
+from innopoints.core.notifications.rendering import EMAIL_TEMPLATE, render_email
+from innopoints.core.notifications.smtp import get_smtp_pool
+from innopoints.core.statistics import refresh_rollups
+from innopoints.extensions import db
+from innopoints.models import (
+    Account,
+    FileStatus,
+    Notification,
+    NotificationType,
+    StaticFile,
+    StockChange,
+    StockChangeStatus,
+    Transaction,
+    Variety,
+)
+
+log = logging.getLogger(__name__)
+
+
+@click.command('reconcile-balances')
+@click.option('--fix', is_flag=True, help='Overwrite the mismatched balances with the ledger sums.')
+@with_appcontext
+def reconcile_balances(fix):
+    """Compare the stored account balances against the sum of their transactions."""
+    ledger = (
+        db.session.query(Transaction.account_email,
+                         db.func.sum(Transaction.change).label('total'))
+            .group_by(Transaction.account_email)
+            .subquery()
+    )
+    ledger_balance = db.func.coalesce(ledger.c.total, 0)
+    mismatches = (
+        db.session.query(Account, ledger_balance)
+            .outerjoin(ledger, Account.email == ledger.c.account_email)
+            .filter(Account.balance != ledger_balance)
+            .order_by(Account.email)
+    ).all()
+
+    for account, expected in mismatches:
+        click.echo(f'{account.email}: stored {account.balance}, ledger {expected}')
+        if fix:
+            account.balance = expected
+
+    if not mismatches:
+        click.echo('All balances match the ledger.')
+        return
+
+    if fix:
+        db.session.commit()
+        log.warning(f'Reconciled {len(mismatches)} balance(s) with the ledger')
+        click.echo(f'Fixed {len(mismatches)} balance(s).')
+    else:
+        raise click.ClickException(f'{len(mismatches)} balance(s) do not match the ledger.')
+
+
+@click.command('reconcile-stock')
+@click.option('--fix', is_flag=True, help='Overwrite the mismatched counters with the ledger sums.')
+@with_appcontext
+def reconcile_stock(fix):
+    """Compare the stored variety amounts and purchases against their stock changes."""
+    # pylint: disable=invalid-unary-operand-type
+    ledger = (
+        db.session.query(
+            StockChange.variety_id,
+            db.func.sum(StockChange.amount).label('amount'),
+            db.func.sum(StockChange.amount)
+                .filter(StockChange.amount < 0, ~Account.is_admin).label('purchases'),
+        ).join(StockChange.account)
+            .filter(StockChange.status != StockChangeStatus.rejected)
+            .group_by(StockChange.variety_id)
+            .subquery()
+    )
+    ledger_amount = db.func.coalesce(ledger.c.amount, 0)
+    ledger_purchases = db.func.coalesce(-ledger.c.purchases, 0)
+    mismatches = (
+        db.session.query(Variety, ledger_amount, ledger_purchases)
+            .outerjoin(ledger, Variety.id == ledger.c.variety_id)
+            .filter((Variety.amount != ledger_amount) | (Variety.purchases != ledger_purchases))
+            .order_by(Variety.id)
+    ).all()
+
+    for variety, amount, purchases in mismatches:
+        click.echo(f'Variety {variety.id}: stored {variety.amount} in stock, '
+                   f'{variety.purchases} purchased; '
+                   f'ledger {amount} in stock, {purchases} purchased')
+        if fix:
+            variety.amount = amount
+            variety.purchases = purchases
+
+    if not mismatches:
+        click.echo('All stock counters match the ledger.')
+        return
+
+    if fix:
+        db.session.commit()
+        log.warning(f'Reconciled {len(mismatches)} stock counter(s) with the ledger')
+        click.echo(f'Fixed {len(mismatches)} variety counter(s).')
+    else:
+        raise click.ClickException(f'{len(mismatches)} variety counter(s) do not match the ledger.')
+
+
+@click.command('reconcile-notifications')
+@click.option('--fix', is_flag=True,
+              help='Overwrite the mismatched counters with the actual counts.')
+@with_appcontext
+def reconcile_notifications(fix):
+    """Compare the stored unread notification counters against the unread notifications."""
+    unread = (
+        db.session.query(Notification.recipient_email,
+                         db.func.count(Notification.id).label('total'))
+            .filter(~Notification.is_read)
+            .group_by(Notification.recipient_email)
+            .subquery()
+    )
+    unread_count = db.func.coalesce(unread.c.total, 0)
+    mismatches = (
+        db.session.query(Account, unread_count)
+            .outerjoin(unread, Account.email == unread.c.recipient_email)
+            .filter(Account.unread_notifications != unread_count)
+            .order_by(Account.email)
+    ).all()
+
+    for account, expected in mismatches:
+        click.echo(f'{account.email}: stored {account.unread_notifications} unread, '
+                   f'actual {expected}')
+        if fix:
+            account.unread_notifications = expected
+
+    if not mismatches:
+        click.echo('All unread notification counters match.')
+        return
+
+    if fix:
+        db.session.commit()
+        log.warning(f'Reconciled {len(mismatches)} unread notification counter(s)')
+        click.echo(f'Fixed {len(mismatches)} unread notification counter(s).')
+    else:
+        raise click.ClickException(
+            f'{len(mismatches)} unread notification counter(s) do not match.'
+        )
+
+
+@click.command('deliver-notifications')
+@click.option('--batch-size', default=100, show_default=True,
+              help='The number of deliveries to claim at once.')
+@click.option('--interval', default=5.0, show_default=True,
+              help='Seconds to wait for new deliveries when there are none due.')
+@click.option('--once', is_flag=True, help='Exit when there are no deliveries due.')
+@with_appcontext
+def deliver_notifications(batch_size, interval, once):
+    """Deliver the queued email and push notifications, retrying the failed ones.
+    The sent deliveries are deleted after NOTIFICATION_DELIVERY_RETENTION, while idle.
+    Several workers may run at once."""
+    smtp_pool = get_smtp_pool()
+    retention = timedelta(seconds=current_app.config['NOTIFICATION_DELIVERY_RETENTION'])
+    try:
+        while True:
+            try:
+                delivered = deliver_pending(batch_size)
+                if delivered < batch_size:
+                    prune_sent(retention)
+            except SQLAlchemyError as exc:
+                db.session.rollback()
+                log.exception(exc)
+                delivered = 0
+
+            if delivered < batch_size:
+                if once:
+                    return
+                time.sleep(interval)
+    finally:
+        smtp_pool.close()
+        click.echo(f'Emails: {smtp_pool.stats}')
+
+
+@click.command('refresh-statistics')
+@with_appcontext
+def refresh_statistics():
+    """Rebuild the daily rollups the statistics are served from.
+    Run it daily, e.g. from cron, shortly after midnight UTC."""
+    until = refresh_rollups()
+    db.session.commit()
+    click.echo(f'Rolled up the statistics before {until.isoformat()}.')
+
+
+@click.command('process-images')
+@click.option('--batch-size', default=8, show_default=True,
+              help='The number of uploads to claim at once.')
+@click.option('--interval', default=1.0, show_default=True,
+              help='Seconds to wait for new uploads when there are none to process.')
+@click.option('--once', is_flag=True, help='Exit when there are no uploads to process.')
+@with_appcontext
+def process_images(batch_size, interval, once):
+    """Crop, shrink and make the downscaled copies of the uploaded images.
+    Several workers may run at once."""
+    workers = current_app.config['IMAGE_PROCESSING_WORKERS']
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            try:
+                processed = process_pending(executor, batch_size)
+            except SQLAlchemyError as exc:
+                db.session.rollback()
+                log.exception(exc)
+                processed = 0
+            except BrokenProcessPool as exc:
+                log.exception(exc)
+                executor.shutdown()
+                executor = ProcessPoolExecutor(max_workers=workers)
+                processed = 0
+
+            if processed < batch_size:
+                if once:
+                    return
+                time.sleep(interval)
+    finally:
+        executor.shutdown()
+
+
+@click.command('generate-image-variants')
+@with_appcontext
+def generate_image_variants():
+    """Store the downscaled copies of the images uploaded before they were made on upload."""
+    files = (
+        StaticFile.query
+            .filter(StaticFile.status == FileStatus.ready, StaticFile.variants.is_(None))
+            .order_by(StaticFile.id)
+    ).all()
+    generated = 0
+    for file in files:
+        handle = str(file.id)
+        try:
+            with file_manager.open(handle) as stream:
+                image = Image.open(stream)
+                image.load()
+        except FileNotFoundError:
+            log.warning(f'The file {file.id} is missing from the storage')
+            continue
+
+        variants = make_variants(image)
+        for width, variant in variants.items():
+            file_manager.store(variant, variant_handle(handle, width), quality=VARIANT_QUALITY)
+        file.variants = sorted(variants)
+        db.session.commit()
+        generated += len(variants)
+
+    click.echo(f'Stored {generated} copies of {len(files)} file(s).')
+
+
+@click.command('migrate-file-storage')
+@with_appcontext
+def migrate_file_storage():
+    """Move the files stored in the flat `static_files` folder into the content-addressed storage.
+    The files are served from either place meanwhile."""
+    manager = get_file_manager()
+    if not isinstance(manager, FileManagerLocal):
+        raise click.ClickException('The files are not stored locally.')
+    moved = manager.move_flat_files()
+    click.echo(f'Moved {moved} file(s).')
+
+
+@click.command('benchmark-email-rendering')
+@click.option('--count', default=10000, show_default=True,
+              help='The number of recipients of the broadcast.')
+@with_appcontext
+def benchmark_email_rendering(count):
+    """Measure the rendering of the emails for a broadcast to many recipients."""
+    notifications = [
+        Notification(id=index,
+                     recipient_email=f'user{index}@innopolis.university',
+                     type=NotificationType.service,
+                     payload={'message': 'The Innopoints store is open this Friday.'})
+        for index in range(count)
+    ]
+
+    def read_template_per_message():
+        for notification in notifications:
+            content = get_content(notification.type, notification.payload)
+            body = ''.join(map(str, content['body']))
+            with open(EMAIL_TEMPLATE) as email_template:
+                Message(content['title'],
+                        recipients=[notification.recipient_email],
+                        html=email_template.read().format(header=content['title'], body=body))
+
+    def render_per_message():
+        for notification in notifications:
+            render_email(notification)
+
+    def render_shared():
+        shared = {}
+        for notification in notifications:
+            render_email(notification, shared=shared)
+
+    for label, benchmark in (('Reading the template per message', read_template_per_message),
+                             ('Compiled template', render_per_message),
+                             ('Compiled template, shared content', render_shared)):
+        started = time.perf_counter()
+        benchmark()
+        elapsed = time.perf_counter() - started
+        click.echo(f'{label}: {elapsed:.3f}s, {count / elapsed:.0f} messages/s')
+
+
+all_commands = (
+    reconcile_balances,
+    reconcile_stock,
+    reconcile_notifications,
+    deliver_notifications,
+    refresh_statistics,
+    process_images,
+    generate_image_variants,
+    migrate_file_storage,
+    benchmark_email_rendering,
+)
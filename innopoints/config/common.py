@@ -7,6 +7,20 @@ SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
 SQLALCHEMY_ENGINE_OPTIONS = {'future': True}
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+PAGINATION_COUNT_CAP = 1000  # rows counted at most with `count=capped`
+FILE_CACHE_MAX_AGE = 365 * 24 * 60 * 60  # seconds, the stored files never change
+FILE_MEMORY_CACHE_SIZE = 64 * 1024 * 1024  # bytes of the files cached by each worker, 0 to disable
+FILE_MEMORY_CACHE_MAX_FILE_SIZE = 1024 * 1024  # bytes, larger files are streamed from the storage
+FILE_MEMORY_CACHE_TTL = 10 * 60  # seconds, how long the other workers serve a deleted file
+FILE_STORAGE = os.environ.get('FILE_STORAGE', 'local')  # 'local' or 's3'
+FILE_STORAGE_PATH = './static_files/'
+S3_BUCKET = os.environ.get('S3_BUCKET')
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')  # e.g. of MinIO, None for AWS
+S3_REGION = os.environ.get('S3_REGION')
+S3_POOL_SIZE = 10  # connections, also the concurrent parts of an upload
+S3_URL_EXPIRY = 24 * 60 * 60  # seconds, None to stream the files through the application
+FILE_REDIRECT_MAX_AGE = 12 * 60 * 60  # seconds, shorter than the URLs redirected to are valid
+IMAGE_PROCESSING_WORKERS = 2  # processes of each `flask process-images` worker
 
 SESSION_COOKIE_HTTPONLY = True
 REMEMBER_COOKIE_HTTPONLY = True
@@ -19,5 +33,11 @@ MAIL_USERNAME = 'innopoints@innopolis.university'
 MAIL_PASSWORD = os.environ['MAIL_PASSWORD']
 MAIL_DEFAULT_SENDER = MAIL_USERNAME
 MAIL_USE_TLS = True
+MAIL_POOL_SIZE = 2
+MAIL_POOL_MAX_AGE = 10 * 60  # seconds
+MAIL_POOL_MAX_IDLE = 60  # seconds
+NOTIFICATION_DELIVERY_RETENTION = 7 * 24 * 60 * 60  # seconds, how long the sent ones are kept
 WEBPUSH_VAPID_PRIVATE_KEY = os.environ.get('WEBPUSH_VAPID_PRIVATE_KEY')
 WEBPUSH_SENDER_INFO = os.environ.get('WEBPUSH_SENDER_INFO')
+WEBPUSH_TIMEOUT = 10  # seconds, per push service request
+WEBPUSH_MAX_WORKERS = 8
@@ -0,0 +1,94 @@
+"""An in-memory cache of the static files, kept by each worker process.
+
+The hot images are served from it without querying the database or reading the storage.
+The stored files never change and their IDs are never reused, so the entries only go stale
+when a file is deleted. The worker deleting it drops the entries at once, the other workers
+keep serving it until the entries expire."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from flask import current_app
+
+# The approximate memory taken by the cached details of a file, in bytes
+DETAILS_SIZE = 256
+
+
+class CachedFile(NamedTuple):
+    """The details of a static file needed to serve it."""
+    mimetype: str
+    variants: Tuple[int, ...]
+
+
+class FileCache:
+    """A thread-safe cache of the values with their total size limited,
+    evicting the least recently used ones first."""
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # the value, its size and the time it expires at, ordered from the least recently used
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remove(self, key: Hashable):
+        _value, size, _expires = self._entries.pop(key)
+        self.size -= size
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value or None if there is none."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        """Cache the value of the given size, unless it alone exceeds the limit."""
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.size += size
+            while self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, key: Hashable):
+        """Drop the cached value if there is one."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return the hit and miss counters and the current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'size': self.size,
+                'max_size': self.max_size,
+            }
+
+
+def get_file_cache() -> FileCache:
+    """Return the file cache of the current application, creating it on first use."""
+    extensions = current_app.extensions
+    if 'file_cache' not in extensions:
+        config = current_app.config
+        extensions['file_cache'] = FileCache(max_size=config['FILE_MEMORY_CACHE_SIZE'],
+                                             ttl=config['FILE_MEMORY_CACHE_TTL'])
+    return extensions['file_cache']
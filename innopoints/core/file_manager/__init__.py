@@ -1,4 +1,44 @@
-"""File manager module."""
+"""File manager module.
+
+The storage is chosen with the FILE_STORAGE setting: 'local' keeps the files in the
+FILE_STORAGE_PATH folder (see `local.py`), 's3' in the S3_BUCKET of an object storage (see `s3.py`).
+`file_manager` stands for the file manager of the current application."""
+
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+from .base import FileInfo, FileManager
 from .local import FileManagerLocal
 
-file_manager = FileManagerLocal()
+
+def get_file_manager() -> FileManager:
+    """Return the file manager of the current application, creating it on first use."""
+    extensions = current_app.extensions
+    if 'file_manager' not in extensions:
+        config = current_app.config
+        if config['FILE_STORAGE'] == 'local':
+            extensions['file_manager'] = FileManagerLocal(config['FILE_STORAGE_PATH'])
+        elif config['FILE_STORAGE'] == 's3':
+            # boto3 is only imported when the object storage is used
+            from .s3 import FileManagerS3  # pylint: disable=import-outside-toplevel
+            extensions['file_manager'] = FileManagerS3(bucket=config['S3_BUCKET'],
+                                                       endpoint_url=config['S3_ENDPOINT_URL'],
+                                                       region=config['S3_REGION'],
+                                                       pool_size=config['S3_POOL_SIZE'],
+                                                       url_expiry=config['S3_URL_EXPIRY'])
+        else:
+            raise ValueError(f'Unknown file storage "{config["FILE_STORAGE"]}".')
+    return extensions['file_manager']
+
+
+file_manager: FileManager = LocalProxy(get_file_manager)
+
+
+def variant_handle(handle: str, width: int) -> str:
+    """Return the handle of the downscaled copy of the image with the given handle."""
+    return f'{handle}_{width}'
+
+
+def upload_handle(handle: str) -> str:
+    """Return the handle of the uploaded file kept until the image with the given handle is made."""
+    return f'{handle}_upload'
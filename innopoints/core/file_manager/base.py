@@ -0,0 +1,46 @@
+"""The interface of the file managers."""
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import BinaryIO, NamedTuple, Optional, Union
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+
+class FileInfo(NamedTuple):
+    """The size and the modification time of a stored file."""
+    size: int
+    modified: datetime
+
+
+class FileManager(ABC):
+    """Stores the files by their handles.
+    A missing file is reported with FileNotFoundError, a failure of the storage with OSError."""
+
+    def retrieve(self, handle: str) -> bytes:
+        """Get the file with given handle."""
+        with self.open(handle) as file:
+            return file.read()
+
+    @abstractmethod
+    def open(self, handle: str) -> BinaryIO:
+        """Open the file with given handle for reading, the caller has to close it."""
+
+    @abstractmethod
+    def info(self, handle: str) -> FileInfo:
+        """Get the size and the modification time of the file with given handle."""
+
+    @abstractmethod
+    def store(self, file: Union[FileStorage, Image.Image, bytes], handle: str, quality: int = 100):
+        """Upload the given file with the handle. Images are stored as WebP of the given quality."""
+
+    @abstractmethod
+    def delete(self, handle: str):
+        """Delete the file with a given handle."""
+
+    def url(self, handle: str, mimetype: str) -> Optional[str]:
+        """Return the URL the clients can get the file with given handle from directly,
+        or None if the file is served by the application."""
+        # pylint: disable=unused-argument,no-self-use
+        return None
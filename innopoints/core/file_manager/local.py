@@ -1,42 +1,174 @@
-"""Manages static files. This particular module uses local file system to store files."""
+"""Manages static files. This particular module uses local file system to store files.
 
+The files are stored by their content: each distinct content is stored once, as a blob named
+by its SHA-256 in `blobs/`, and the handles are hard links to the blobs in `handles/`.
+The link count of a blob is thus the number of its handles plus one, the blob is removed
+along with its last handle. Both directories are sharded two levels deep by the hash,
+so that none of them grows too large to look up. The files are written to `tmp/` first
+and linked into place, a handle never points at a partially written file."""
+
+import hashlib
+import io
 import os
-from typing import Union
+import tempfile
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterable, Union
 
 from PIL import Image
 from werkzeug.datastructures import FileStorage
 
+from .base import FileInfo, FileManager
+
+
+BLOBS = 'blobs'
+HANDLES = 'handles'
+TEMP = 'tmp'
+CHUNK_SIZE = 64 * 1024
+
+
+def _sharded(directory: str, digest: str, name: str) -> str:
+    return os.path.join(directory, digest[:2], digest[2:4], name)
+
 
-class FileManagerLocal:
+def _digest(path: str) -> str:
+    """Return the SHA-256 of the file contents."""
+    content_hash = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+class FileManagerLocal(FileManager):
     """Implementation of the file manager using local file system."""
     def __init__(self, url='./static_files/'):
         self.base_path = url
-        if not os.path.exists(url):
-            os.makedirs(url)
+        for directory in (BLOBS, HANDLES, TEMP):
+            os.makedirs(self._join_base(directory), exist_ok=True)
 
     def _join_base(self, *paths: str) -> str:
         """Helper function to join path to base and normalize it according to OS."""
         return os.path.normpath(os.path.join(self.base_path, *paths))
 
-    def retrieve(self, handle: str) -> bytes:
-        """Get the file with given handle."""
-        path = self._join_base(handle)
+    def _blob_path(self, digest: str) -> str:
+        return self._join_base(_sharded(BLOBS, digest, digest))
+
+    def _handle_path(self, handle: str) -> str:
+        return self._join_base(_sharded(HANDLES, hashlib.sha256(handle.encode()).hexdigest(),
+                                        handle))
+
+    def _path(self, handle: str) -> str:
+        """Return the path of the file with given handle,
+        falling back to the flat layout the files were stored in before."""
+        path = self._handle_path(handle)
         if not os.path.exists(path):
-            raise FileNotFoundError()
-        file = open(path, 'rb')
-        return file.read()
+            flat_path = self._join_base(handle)
+            if os.path.isfile(flat_path):
+                return flat_path
+        return path
+
+    def _temp_path(self) -> str:
+        file_descriptor, path = tempfile.mkstemp(dir=self._join_base(TEMP))
+        os.close(file_descriptor)
+        os.remove(path)
+        return path
 
-    def store(self, file: Union[FileStorage, Image.Image], handle: str):
-        """Upload the given file with the handle."""
-        filename = self._join_base(handle)
+    def _collect(self, digest: str, inode: int):
+        """Remove the blob if it has no handles left (and was not stored anew meanwhile)."""
+        blob = self._blob_path(digest)
+        try:
+            stat = os.stat(blob)
+        except FileNotFoundError:
+            return
+        if stat.st_ino == inode and stat.st_nlink == 1:
+            os.remove(blob)
+
+    def _link(self, blob: str, handle: str):
+        """Point the handle at the blob, releasing the blob it pointed at before."""
+        path = self._handle_path(handle)
+        try:
+            previous = os.stat(path)
+        except FileNotFoundError:
+            previous = None
+        else:
+            if previous.st_ino == os.stat(blob).st_ino:
+                return
+        previous_digest = _digest(path) if previous and previous.st_nlink == 2 else None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = self._temp_path()
+        os.link(blob, temp_path)
+        os.replace(temp_path, path)
+        if previous_digest is not None:
+            self._collect(previous_digest, previous.st_ino)
+
+    def _store_chunks(self, chunks: Iterable[bytes], handle: str):
+        content_hash = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=self._join_base(TEMP), delete=False) as temp_file:
+            for chunk in chunks:
+                content_hash.update(chunk)
+                temp_file.write(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+
+        try:
+            blob = self._blob_path(content_hash.hexdigest())
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            while True:
+                try:
+                    os.link(temp_file.name, blob)
+                except FileExistsError:
+                    pass  # the same content is stored already
+                try:
+                    self._link(blob, handle)
+                    break
+                except FileNotFoundError:
+                    continue  # the blob was removed with its last handle meanwhile
+        finally:
+            os.remove(temp_file.name)
+
+    def open(self, handle: str) -> BinaryIO:
+        """Open the file with given handle for reading, the caller has to close it."""
+        return open(self._path(handle), 'rb')
+
+    def info(self, handle: str) -> FileInfo:
+        """Get the size and the modification time of the file with given handle."""
+        stat = os.stat(self._path(handle))
+        return FileInfo(size=stat.st_size,
+                        modified=datetime.fromtimestamp(stat.st_mtime, timezone.utc))
+
+    def store(self, file: Union[FileStorage, Image.Image, bytes], handle: str, quality: int = 100):
+        """Upload the given file with the handle. Images are stored as WebP of the given quality.
+        The contents stored under another handle already are not stored again."""
         if isinstance(file, Image.Image):
-            file.save(filename, format='WebP', quality=100)
+            buffer = io.BytesIO()
+            file.save(buffer, format='WebP', quality=quality)
+            file = buffer.getvalue()
+
+        if isinstance(file, bytes):
+            self._store_chunks([file], handle)
         else:
-            file.save(filename)
+            self._store_chunks(iter(lambda: file.stream.read(CHUNK_SIZE), b''), handle)
 
     def delete(self, handle: str):
         """Delete the file with a given handle."""
-        filename = self._join_base(handle)
-        if not os.path.exists(filename):
-            raise FileNotFoundError()
-        os.remove(filename)
+        path = self._path(handle)
+        stat = os.stat(path)
+        # only the last handle of a blob needs the hash, to find the blob and remove it
+        digest = _digest(path) if stat.st_nlink == 2 else None
+        os.remove(path)
+        if digest is not None:
+            self._collect(digest, stat.st_ino)
+
+    def move_flat_files(self) -> int:
+        """Move the files stored in the flat layout used before into the blobs.
+        Returns the number of files moved."""
+        moved = 0
+        for entry in os.scandir(self.base_path):
+            if not entry.is_file():
+                continue
+            with open(entry.path, 'rb') as file:
+                self._store_chunks(iter(lambda: file.read(CHUNK_SIZE), b''), entry.name)
+            os.remove(entry.path)
+            moved += 1
+        return moved
@@ -0,0 +1,127 @@
+"""Manages static files. This particular module stores the files in an S3-compatible
+object storage (e.g. AWS S3 or MinIO), so that the web servers need no shared volume.
+
+The client keeps a pool of HTTP connections and is shared by the threads of the process.
+The uploads are streamed, the large ones in parts uploaded concurrently.
+With the URL expiry set, the clients are redirected to presigned URLs of the files
+instead of the files being streamed through the application."""
+
+import io
+from contextlib import contextmanager
+from typing import BinaryIO, Optional, Union
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from .base import FileInfo, FileManager
+
+
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MISSING_ERROR_CODES = {'404', 'NoSuchKey', 'NotFound'}
+
+
+@contextmanager
+def _storage_errors(handle: str):
+    """Report the missing objects with FileNotFoundError and the other failures with OSError."""
+    try:
+        yield
+    except ClientError as err:
+        if err.response.get('Error', {}).get('Code') in MISSING_ERROR_CODES:
+            raise FileNotFoundError(f'The file "{handle}" is missing.') from err
+        raise OSError(f'The object storage failed on the file "{handle}".') from err
+    except BotoCoreError as err:
+        raise OSError(f'The object storage failed on the file "{handle}".') from err
+
+
+class _ObjectStream(io.RawIOBase):
+    """A file-like wrapper of the body of an object being downloaded."""
+    def __init__(self, body):
+        super().__init__()
+        self._body = body
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._body.close()
+        super().close()
+
+
+class FileManagerS3(FileManager):
+    """Implementation of the file manager using an S3-compatible object storage.
+    The credentials are read by boto3 from the environment (AWS_ACCESS_KEY_ID, etc.)."""
+    # pylint: disable=too-many-arguments
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, pool_size: int = 10,
+                 url_expiry: Optional[int] = None):
+        self.bucket = bucket
+        self.url_expiry = url_expiry
+        self.client = boto3.session.Session().client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(max_pool_connections=pool_size,
+                          retries={'max_attempts': 3, 'mode': 'standard'}),
+        )
+        self.transfer_config = TransferConfig(multipart_threshold=MULTIPART_THRESHOLD,
+                                              max_concurrency=pool_size)
+
+    def open(self, handle: str) -> BinaryIO:
+        """Open the file with given handle for reading, the caller has to close it."""
+        with _storage_errors(handle):
+            body = self.client.get_object(Bucket=self.bucket, Key=handle)['Body']
+        return io.BufferedReader(_ObjectStream(body))
+
+    def info(self, handle: str) -> FileInfo:
+        """Get the size and the modification time of the file with given handle."""
+        with _storage_errors(handle):
+            head = self.client.head_object(Bucket=self.bucket, Key=handle)
+        return FileInfo(size=head['ContentLength'], modified=head['LastModified'])
+
+    def store(self, file: Union[FileStorage, Image.Image, bytes], handle: str, quality: int = 100):
+        """Upload the given file with the handle. Images are stored as WebP of the given quality."""
+        if isinstance(file, Image.Image):
+            stream = io.BytesIO()
+            file.save(stream, format='WebP', quality=quality)
+            stream.seek(0)
+        elif isinstance(file, bytes):
+            stream = io.BytesIO(file)
+        else:
+            stream = file.stream
+
+        with _storage_errors(handle):
+            self.client.upload_fileobj(stream, self.bucket, handle, Config=self.transfer_config)
+
+    def delete(self, handle: str):
+        """Delete the file with a given handle."""
+        with _storage_errors(handle):
+            # deleting a missing object succeeds, the callers expect to be told it is missing
+            self.client.head_object(Bucket=self.bucket, Key=handle)
+            self.client.delete_object(Bucket=self.bucket, Key=handle)
+
+    def url(self, handle: str, mimetype: str) -> Optional[str]:
+        """Return a presigned URL of the file with given handle,
+        or None if the files are served by the application."""
+        if self.url_expiry is None:
+            return None
+        with _storage_errors(handle):
+            return self.client.generate_presigned_url(
+                'get_object',
+                Params={
+                    'Bucket': self.bucket,
+                    'Key': handle,
+                    'ResponseContentType': mimetype,
+                    # the stored files never change
+                    'ResponseCacheControl': f'public, max-age={self.url_expiry}, immutable',
+                },
+                ExpiresIn=self.url_expiry,
+            )
@@ -1,29 +1,70 @@
-"""Image manipulation."""
+"""Image manipulation.
 
-from typing import Dict
+The uploaded images are processed by the `flask process-images` worker, see `process_upload`."""
+
+import io
+from typing import BinaryIO, Dict, List, Optional, Tuple
 
 from PIL import Image
 
 from innopoints.core.helpers import abort
 
 
-def crop(image: Image.Image, dimensions: Dict[str, str]):
-    """Crop an image to the dimensions specified with keys 'x', 'y', 'width', 'height'."""
+# The formats the uploads are accepted in, as detected by Pillow
+IMAGE_FORMATS = {'JPEG', 'PNG', 'WEBP'}
+# Decoding an image takes memory proportional to its pixels, larger images are rejected
+MAX_IMAGE_PIXELS = 40 * 1000 * 1000
+
+
+class InvalidImage(ValueError):
+    """Raised when the uploaded file is not an image that can be processed."""
+
+
+def open_image(stream: BinaryIO) -> Image.Image:
+    """Open the image, only reading its header, and check that it can be processed."""
+    try:
+        image = Image.open(stream)
+    except (OSError, Image.DecompressionBombError) as err:
+        raise InvalidImage('The file is not an image.') from err
+
+    if image.format not in IMAGE_FORMATS:
+        raise InvalidImage(f'Image format "{image.format}" is not allowed.')
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise InvalidImage(f'The image is larger than {MAX_IMAGE_PIXELS} pixels.')
+    return image
+
+
+def parse_crop(dimensions: Dict[str, str]) -> Optional[List[int]]:
+    """Return the crop specified with keys 'x', 'y', 'width', 'height' as a list in that order,
+    or None if the image is not to be cropped."""
     if 'x' not in dimensions:
-        return image
+        return None
 
     try:
-        # pylint: disable=invalid-name
-        x = int(dimensions['x'])
-        y = int(dimensions['y'])
-        width = int(dimensions['width'])
-        height = int(dimensions['height'])
+        return [int(dimensions[key]) for key in ('x', 'y', 'width', 'height')]
     except KeyError:
         abort(400, {'message': 'Not enough data to perform the crop.'})
-    else:
-        if x != 0 or y != 0 or width != image.width or height != image.height:
-            return image.crop((x, y, x + width, y + height))
-        return image
+    except ValueError:
+        abort(400, {'message': 'The crop dimensions should be integers.'})
+
+
+def check_crop(image: Image.Image, dimensions: List[int]):
+    """Check that the crop returned by `parse_crop` lies within the image.
+    Pillow pads the part of the box outside the image, so a larger box would be allocated whole."""
+    # pylint: disable=invalid-name
+    x, y, width, height = dimensions
+    if (x < 0 or y < 0 or width <= 0 or height <= 0
+            or x + width > image.width or y + height > image.height):
+        raise InvalidImage('The crop is outside of the image.')
+
+
+def crop(image: Image.Image, dimensions: List[int]):
+    """Crop an image to the dimensions returned by `parse_crop`."""
+    # pylint: disable=invalid-name
+    x, y, width, height = dimensions
+    if x != 0 or y != 0 or width != image.width or height != image.height:
+        return image.crop((x, y, x + width, y + height))
+    return image
 
 
 SQUARE_THRESHOLD = 832
@@ -44,4 +85,41 @@ def shrink(image: Image.Image):
         else:
             return image
 
-    return image.resize(new_size)
+    return image.resize(new_size, Image.LANCZOS, reducing_gap=3.0)
+
+
+# The widths of the downscaled copies stored along with the uploaded images, in pixels
+VARIANT_WIDTHS = (128, 320, 640)
+VARIANT_QUALITY = 80
+
+
+def make_variants(image: Image.Image) -> Dict[int, Image.Image]:
+    """Return the copies of the image downscaled to the variant widths below its own width."""
+    return {
+        width: image.resize((width, max(1, round(image.height * width / image.width))),
+                            Image.LANCZOS, reducing_gap=3.0)
+        for width in VARIANT_WIDTHS
+        if width < image.width
+    }
+
+
+def encode(image: Image.Image, quality: int = 100) -> bytes:
+    """Encode the image as WebP of the given quality."""
+    buffer = io.BytesIO()
+    image.save(buffer, format='WebP', quality=quality)
+    return buffer.getvalue()
+
+
+def process_upload(data: bytes,
+                   dimensions: Optional[List[int]]) -> Tuple[bytes, Dict[int, bytes]]:
+    """Crop and shrink the uploaded image and make its downscaled copies.
+    Returns the encoded image and the encoded copies by their widths.
+    Runs in the worker processes, so it only depends on the arguments."""
+    image = open_image(io.BytesIO(data))
+    if dimensions is not None:
+        check_crop(image, dimensions)
+        image = crop(image, dimensions)
+    image = shrink(image)
+    variants = {width: encode(variant, VARIANT_QUALITY)
+                for width, variant in make_variants(image).items()}
+    return encode(image), variants
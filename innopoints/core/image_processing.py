@@ -0,0 +1,108 @@
+"""Processing of the uploaded images (StaticFile) outside of the web requests.
+
+Run by the `flask process-images` worker. The uploads are decoded, cropped, shrunk
+and encoded along with their downscaled copies in a pool of processes, see `process_upload`.
+Several workers may run at once, each claims its own batch of uploads."""
+
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import requests
+
+from innopoints.core.file_manager import file_manager, upload_handle, variant_handle
+from innopoints.core.image import process_upload
+from innopoints.extensions import db
+from innopoints.models import FileStatus, StaticFile
+
+log = logging.getLogger(__name__)
+
+
+def _record_failure(file: StaticFile, exc: Exception):
+    file.status = FileStatus.failed
+    file.crop = None
+    log.warning(f'Failed to process the uploaded file {file.id}: {exc!r}')
+
+
+def _delete_upload(file_id: int):
+    try:
+        file_manager.delete(upload_handle(str(file_id)))
+    except FileNotFoundError:
+        pass
+
+
+def _process_alone(data: bytes, file: StaticFile):
+    """Process the upload in a process of its own, so that only this upload fails if it dies."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(process_upload, data, file.crop).result()
+
+
+def process_pending(executor: Executor, batch_size: int) -> int:
+    """Process a batch of the uploaded images in the executor's processes and store the results.
+    Returns the number of uploads processed, either made ready or failed.
+    Raises BrokenProcessPool if a process died, the executor has to be replaced then."""
+    files = (
+        StaticFile.query
+            .filter(StaticFile.status == FileStatus.processing)
+            .order_by(StaticFile.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+    ).all()
+    if not files:
+        db.session.rollback()
+        return 0
+
+    uploads = {}
+    results = {}
+    for file in files:
+        try:
+            uploads[file] = file_manager.retrieve(upload_handle(str(file.id)))
+        except FileNotFoundError as exc:
+            _record_failure(file, exc)
+        else:
+            results[file] = executor.submit(process_upload, uploads[file], file.crop)
+
+    broken = None
+    outcomes = {}
+    for file, result in results.items():
+        try:
+            outcomes[file] = result.result()
+        except BrokenProcessPool as exc:
+            broken = exc
+        except Exception as exc:  # pylint: disable=broad-except
+            _record_failure(file, exc)
+
+    if broken is not None:
+        # The upload that killed the process cannot be told apart from the others in the batch,
+        # they are retried one by one and only the one killing its process again fails
+        for file in results:
+            if file in outcomes or file.status == FileStatus.failed:
+                continue
+            try:
+                outcomes[file] = _process_alone(uploads[file], file)
+            except Exception as exc:  # pylint: disable=broad-except
+                _record_failure(file, exc)
+
+    for file, (image, variants) in outcomes.items():
+        handle = str(file.id)
+        try:
+            file_manager.store(image, handle)
+            for width, variant in variants.items():
+                file_manager.store(variant, variant_handle(handle, width))
+        except (OSError, requests.exceptions.HTTPError) as exc:
+            # left to be processed again by the next batch
+            log.exception(exc)
+            continue
+        file.status = FileStatus.ready
+        file.crop = None
+        file.variants = sorted(variants)
+
+    done = [file.id for file in files if file.status != FileStatus.processing]
+    db.session.commit()
+    for file_id in done:
+        _delete_upload(file_id)
+    log.info(f'Processed {len(done)} of {len(files)} uploaded files')
+
+    if broken is not None:
+        raise broken
+    return len(done)
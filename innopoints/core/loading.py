@@ -0,0 +1,85 @@
+"""Eager loading strategies for serializing many models at once.
+
+The `*_loading` functions return the loader options to pass to `Query.options()` so that
+the whole result set is serialized in a fixed number of queries."""
+
+from typing import List, Optional
+
+from sqlalchemy.orm import joinedload, selectinload, undefer
+
+from innopoints.models import (
+    Account,
+    Activity,
+    Application,
+    Product,
+    ProductImage,
+    Project,
+    StockChange,
+    Transaction,
+    Variety,
+)
+
+
+# (payload key with the ID, key for the instance, model, loader options)
+PAYLOAD_REFERENCES = (
+    ('project_id', 'project', Project, ()),
+    ('activity_id', 'activity', Activity, ()),
+    ('product_id', 'product', Product, ()),
+    ('variety_id', 'variety', Variety,
+     (selectinload(Variety.images).selectinload(ProductImage.image),)),
+    ('account_email', 'account', Account, ()),
+    ('application_id', 'application', Application, ()),
+    ('stock_change_id', 'stock_change', StockChange, ()),
+    ('transaction_id', 'transaction', Transaction, ()),
+)
+
+
+def project_loading(with_applications=False):
+    """Return the loader options for dumping projects with ProjectSchema.
+    Pass `with_applications` if the applications of the activities are serialized as well."""
+    activities = selectinload(Project.activities)
+    options = [
+        undefer(Project.start_date),
+        undefer(Project.end_date),
+        selectinload(Project.creator),
+        selectinload(Project.moderators),
+        selectinload(Project.tags),
+        selectinload(Project.image),
+        activities.undefer(Activity.accepted_applications),
+        activities.selectinload(Activity.competences),
+    ]
+
+    if with_applications:
+        applications = activities.selectinload(Activity.applications)
+        options.extend((
+            applications.joinedload(Application.applicant),
+            applications.selectinload(Application.feedback),
+            applications.selectinload(Application.reports),
+        ))
+
+    return options
+
+
+def product_loading():
+    """Return the loader options for dumping products with their varieties with ProductSchema."""
+    images = selectinload(Product.varieties).selectinload(Variety.images)
+    return [images.selectinload(ProductImage.image)]
+
+
+def hydrate_payloads(payloads: List[Optional[dict]]) -> List[Optional[dict]]:
+    """Replace the IDs in the notification payloads with the instances they reference.
+    The payloads are modified in place, the instances of each model are loaded with a single query.
+    References to deleted instances are replaced with None."""
+    for id_key, key, model, options in PAYLOAD_REFERENCES:
+        referencing = [payload for payload in payloads if payload and id_key in payload]
+        if not referencing:
+            continue
+
+        primary_key = model.__mapper__.primary_key[0]
+        ids = {payload[id_key] for payload in referencing}
+        instances = model.query.options(*options).filter(primary_key.in_(ids))
+        by_id = {getattr(instance, primary_key.key): instance for instance in instances}
+        for payload in referencing:
+            payload[key] = by_id.get(payload.pop(id_key))
+
+    return payloads
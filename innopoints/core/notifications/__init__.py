@@ -1,54 +1,44 @@
 """Helper module for sending notifications, depending on the user preference"""
 
 import logging
-import threading
-from typing import Sequence
+from collections import Counter, defaultdict
+from typing import Iterable
 
-from flask import copy_current_request_context
-from flask_mail import Message
 from sqlalchemy.exc import IntegrityError
 
-from innopoints.extensions import db, mail
-from innopoints.models import Notification, NotificationType, Account, type_to_group
-from .content import get_content
-from .push import push
+from innopoints.core.timezone import tz_aware_now
+from innopoints.extensions import db
+from innopoints.models import (
+    Account,
+    DeliveryStatus,
+    Notification,
+    NotificationDelivery,
+    NotificationType,
+    type_to_group,
+)
 
 log = logging.getLogger(__name__)
 
+# The notification settings values that need a delivery besides the notification feed
+DELIVERY_CHANNELS = ('email', 'push')
+
 
 def notify(recipient_email: str, notification_type: NotificationType, payload=None):
-    """Sends a notification to the specified user."""
+    """Sends a notification to the specified user.
+    The email or push delivery is queued for the `flask deliver-notifications` worker."""
     notification_group = type_to_group[notification_type]
     channel = db.session.query(
         # pylint: disable=unsubscriptable-object
         Account.notification_settings[notification_group]
     ).filter(Account.email == recipient_email).scalar()
 
-    if channel == 'email':
-        message_content = get_content(notification_type, payload)
-        body = ''.join(map(str, message_content['body']))
-
-        with open('templates/email.html') as email_template:
-            message = Message(message_content['title'],
-                              recipients=[recipient_email],
-                              html=email_template.read().format(header=message_content['title'],
-                                                                body=body))
-
-        @copy_current_request_context
-        def send_mail_async(message):
-            mail.send(message)
-
-        mail_thread = threading.Thread(name='mail_sender', target=send_mail_async, args=(message,))
-        mail_thread.start()
-        log.info(f'Sent an email to {recipient_email}')
-    elif channel == 'push':
-        push(recipient_email, notification_type, payload)
-
     notification = Notification(
         recipient_email=recipient_email,
         type=notification_type,
         payload=payload,
     )
+    if channel in DELIVERY_CHANNELS:
+        notification.deliveries.append(NotificationDelivery(channel=channel))
 
     try:
         db.session.add(notification)
@@ -61,22 +51,101 @@ def notify(recipient_email: str, notification_type: NotificationType, payload=No
         return None
 
 
-def notify_all(recipients: Sequence[Account], notification_type: str, payload=None):
-    """Sends the same notification to each of the emails in the given list."""
-    for recipient in recipients:
-        notify(recipient.email, notification_type, payload)
+def broadcast(condition, notification_type: NotificationType, payload=None) -> int:
+    """Sends the same notification to every account matching the SQL condition.
+    The notifications and their deliveries are inserted with one statement each,
+    regardless of the number of recipients. Returns the number of notifications sent."""
+    notifications = Notification.__table__
+    deliveries = NotificationDelivery.__table__
+    # pylint: disable=unsubscriptable-object
+    channel = Account.notification_settings[type_to_group[notification_type]].astext
+    now = tz_aware_now()
+
+    recipients = db.select(
+        Account.email,
+        db.false(),
+        db.literal(payload, type_=notifications.c.payload.type),
+        db.literal(now, type_=notifications.c.timestamp.type),
+        db.literal(notification_type, type_=notifications.c.type.type),
+    ).where(condition)
+    notification_ids = db.session.execute(
+        db.insert(notifications)
+            .from_select(['recipient_email', 'is_read', 'payload', 'timestamp', 'type'], recipients)
+            .returning(notifications.c.id)
+    ).scalars().all()
+    if not notification_ids:
+        db.session.rollback()
+        return 0
+
+    db.session.execute(
+        db.insert(deliveries).from_select(
+            ['notification_id', 'channel', 'status', 'attempts', 'next_attempt'],
+            db.select(
+                notifications.c.id,
+                channel,
+                db.literal(DeliveryStatus.pending, type_=deliveries.c.status.type),
+                db.literal(0),
+                db.literal(now, type_=deliveries.c.next_attempt.type),
+            ).select_from(notifications)
+                .join(Account, Account.email == notifications.c.recipient_email)
+                .where(notifications.c.id.in_(notification_ids),
+                       channel.in_(DELIVERY_CHANNELS))
+        )
+    )
+
+    # the bulk insert bypasses the Notification listeners, so the counters are updated here
+    Account.query.filter(Account.email.in_(
+        db.select(notifications.c.recipient_email).where(notifications.c.id.in_(notification_ids))
+    )).update({Account.unread_notifications: Account.unread_notifications + 1},
+              synchronize_session=False)
+
+    try:
+        db.session.commit()
+        log.info(f'Sent a notification to {len(notification_ids)} recipient(s)')
+        return len(notification_ids)
+    except IntegrityError as exc:
+        db.session.rollback()
+        log.exception(exc)
+        return 0
+
+
+def notify_all(recipients: Iterable[Account], notification_type: NotificationType, payload=None):
+    """Sends the same notification to each of the accounts in the given list."""
+    emails = {recipient.email for recipient in recipients}
+    if emails:
+        broadcast(Account.email.in_(emails), notification_type, payload)
 
 
 def remove_notifications(payload: dict):
-    """Deletes notifications whose payload has any of the entries in the given payload."""
+    """Deletes notifications whose payload has any of the entries in the given payload.
+    The entries are matched by JSONB containment, which is served by the GIN index on payloads,
+    so the values must have the same JSON types as in the stored payloads."""
+    if not payload:
+        return 0
+
+    statement = (
+        db.delete(Notification.__table__)
+            .where(db.or_(*(Notification.payload.contains({key: value})
+                            for key, value in payload.items())))
+            .returning(Notification.recipient_email, Notification.is_read)
+    )
     deleted = 0
-    for key, value in payload.items():
-        query = Notification.query.filter(Notification.payload.isnot(None))
-        query = query.filter(
-            # pylint: disable=unsubscriptable-object
-            Notification.payload[key].astext == str(value)
+    unread = Counter()
+    for recipient_email, is_read in db.session.execute(statement):
+        deleted += 1
+        if not is_read:
+            unread[recipient_email] += 1
+
+    # the bulk delete bypasses the Notification listeners, so the counters are updated here,
+    # with one statement for all the recipients that have lost the same number of notifications
+    recipients_by_count = defaultdict(list)
+    for recipient_email, count in unread.items():
+        recipients_by_count[count].append(recipient_email)
+    for count, recipient_emails in recipients_by_count.items():
+        Account.query.filter(Account.email.in_(recipient_emails)).update(
+            {Account.unread_notifications: Account.unread_notifications - count},
+            synchronize_session=False,
         )
-        deleted += query.delete(synchronize_session=False)
     try:
         db.session.commit()
         log.debug(f'Deleted {deleted} notification(s) matching "{payload}"')
@@ -5,8 +5,8 @@ from urllib.parse import urljoin
 
 from flask import current_app
 
+from innopoints.core.loading import hydrate_payloads
 from innopoints.models import NotificationType, StockChangeStatus, ApplicationStatus
-from innopoints.schemas import PayloadSchema
 
 
 @dataclass
@@ -29,8 +29,9 @@ def s(amount):
 
 # pylint: disable=too-many-branches
 def get_content(type: NotificationType, payload: dict):
-    """Given notification type and payload, returns the data for the notification."""
-    payload = payload and PayloadSchema().fill_data(payload.copy())
+    """Given notification type and payload, returns the data for the notification.
+    The payload may contain IDs or instances already filled in by `hydrate_payloads`."""
+    payload = payload and hydrate_payloads([payload.copy()])[0]
 
     title: str = None
     link: str = None
@@ -0,0 +1,148 @@
+"""Delivery of the notifications from the outbox (NotificationDelivery) by email and push.
+
+Run by the `flask deliver-notifications` worker, outside of the web requests.
+Several workers may run at once, each claims its own batch of deliveries."""
+
+import logging
+from datetime import timedelta
+from typing import List
+
+from sqlalchemy.orm import joinedload
+
+from innopoints.core.loading import hydrate_payloads
+from innopoints.core.timezone import tz_aware_now
+from innopoints.extensions import db
+from innopoints.models import DeliveryStatus, Notification, NotificationDelivery
+from .push import push
+from .rendering import render_email
+from .smtp import SMTPUnavailable, get_smtp_pool
+
+log = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = timedelta(minutes=1)  # doubled after each failed attempt
+PRUNE_BATCH_SIZE = 1000
+
+
+def _record_success(delivery: NotificationDelivery):
+    delivery.attempts += 1
+    delivery.status = DeliveryStatus.sent
+    delivery.delivered_at = tz_aware_now()
+    delivery.last_error = None
+
+
+def _record_failure(delivery: NotificationDelivery, exc: Exception):
+    """Record the failed attempt and schedule a retry, unless the attempts are exhausted."""
+    delivery.attempts += 1
+    delivery.last_error = repr(exc)
+    if delivery.attempts >= MAX_ATTEMPTS:
+        delivery.status = DeliveryStatus.failed
+        log.error(f'Gave up delivering notification {delivery.notification_id} '
+                  f'by {delivery.channel} after {delivery.attempts} attempts: {exc!r}')
+    else:
+        delivery.next_attempt = tz_aware_now() + RETRY_BACKOFF * 2 ** (delivery.attempts - 1)
+        log.warning(f'Failed to deliver notification {delivery.notification_id} '
+                    f'by {delivery.channel}, will retry: {exc!r}')
+
+
+def _deliver_emails(deliveries: List[NotificationDelivery]):
+    """Send the emails over the pooled SMTP connections."""
+    notifications = [delivery.notification for delivery in deliveries]
+    filled = hydrate_payloads([notification.payload and notification.payload.copy()
+                               for notification in notifications])
+    payloads = {notification.id: payload for notification, payload in zip(notifications, filled)}
+    smtp_pool = get_smtp_pool()
+    shared_content = {}
+
+    def send_email(notification: Notification):
+        smtp_pool.send(render_email(notification, payloads[notification.id], shared_content))
+
+    remaining = list(deliveries)
+    while remaining:
+        delivery = remaining.pop(0)
+        try:
+            send_email(delivery.notification)
+        except SMTPUnavailable as exc:
+            # no point in trying the rest of the batch until the server is back
+            log.exception(exc)
+            for failed in (delivery, *remaining):
+                _record_failure(failed, exc)
+            return
+        except Exception as exc:  # pylint: disable=broad-except
+            _record_failure(delivery, exc)
+        else:
+            _record_success(delivery)
+
+    log.info(f'Email delivery: {smtp_pool.stats}')
+
+
+def _deliver_pushes(deliveries: List[NotificationDelivery]):
+    """Send the push notifications to all the subscriptions at once."""
+    try:
+        errors = push([delivery.notification for delivery in deliveries])
+    except Exception as exc:  # pylint: disable=broad-except
+        log.exception(exc)
+        for delivery in deliveries:
+            _record_failure(delivery, exc)
+        return
+
+    for delivery in deliveries:
+        error = errors[delivery.notification_id]
+        if error is None:
+            _record_success(delivery)
+        else:
+            _record_failure(delivery, error)
+
+
+def deliver_pending(batch_size: int = 100) -> int:
+    """Deliver a batch of the due notification deliveries and record the outcomes.
+    Returns the number of deliveries attempted."""
+    deliveries = (
+        NotificationDelivery.query
+            .options(joinedload(NotificationDelivery.notification, innerjoin=True))
+            .filter(NotificationDelivery.status == DeliveryStatus.pending,
+                    NotificationDelivery.next_attempt <= tz_aware_now())
+            .order_by(NotificationDelivery.next_attempt)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True, of=NotificationDelivery)
+    ).all()
+    if not deliveries:
+        db.session.rollback()
+        return 0
+
+    emails = [delivery for delivery in deliveries if delivery.channel == 'email']
+    if emails:
+        _deliver_emails(emails)
+
+    pushes = [delivery for delivery in deliveries if delivery.channel == 'push']
+    if pushes:
+        _deliver_pushes(pushes)
+
+    for delivery in deliveries:
+        if delivery.channel not in ('email', 'push'):
+            _record_failure(delivery, ValueError(f'Unknown delivery channel "{delivery.channel}".'))
+
+    db.session.commit()
+    log.info(f'Processed {len(deliveries)} notification deliveries')
+    return len(deliveries)
+
+
+def prune_sent(retention: timedelta, batch_size: int = PRUNE_BATCH_SIZE) -> int:
+    """Delete a batch of the deliveries sent longer than the retention period ago.
+    The failed ones are kept to be looked into. Returns the number of deliveries deleted."""
+    expired = (
+        db.select([NotificationDelivery.id])
+            .where(NotificationDelivery.status == DeliveryStatus.sent)
+            .where(NotificationDelivery.delivered_at < tz_aware_now() - retention)
+            .limit(batch_size)
+            .scalar_subquery()
+    )
+    statement = (
+        db.delete(NotificationDelivery.__table__)
+            .where(NotificationDelivery.id.in_(expired))
+    )
+    deleted = db.session.execute(statement).rowcount
+    db.session.commit()
+    if deleted:
+        log.info(f'Pruned {deleted} sent notification deliveries')
+    return deleted
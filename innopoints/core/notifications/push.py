@@ -1,18 +1,31 @@
-"""Helper module for sending notifications, depending on the user preference"""
+"""Helper module for sending push notifications and managing the push subscriptions.
 
+The subscriptions are sent to concurrently, each request with a timeout.
+The subscriptions that the push service reports as expired are removed from the account."""
+
+import json
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Sequence
 
-from pywebpush import WebPushException
+from flask import current_app
+from pywebpush import webpush, WebPushException
+from requests import RequestException
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.attributes import flag_modified
 
-from innopoints.extensions import push as webpush, db
-from innopoints.models import NotificationType, Account
+from innopoints.core.loading import hydrate_payloads
+from innopoints.extensions import db
+from innopoints.models import Account, Notification, NotificationType
 from .content import get_content, Link
 
 
 log = logging.getLogger(__name__)
 
+# The push service responses for subscriptions that have expired or were revoked
+GONE_STATUSES = (404, 410)
+
 
 def remove_links(fragment):
     """Replace Link objects with their titles (no links allowed in push notifications)."""
@@ -21,31 +34,138 @@ def remove_links(fragment):
     return fragment
 
 
-def push(recipient_email: str, notification_type: NotificationType, payload=None):
-    '''Sends a notification to the specified user.'''
-    subscriptions = Account.query.get(recipient_email).notification_settings.get('subscriptions')
-    if subscriptions is None:
-        log.error(f'User {recipient_email} is not subscribed to push notifications.')
-        return
-
+def get_push_content(notification_type: NotificationType, payload=None,
+                     filled_payload=None) -> dict:
+    """Return the data of the push notification.
+    The payload may be passed already filled by `hydrate_payloads` as `filled_payload`."""
     try:
-        data = get_content(notification_type, payload)
+        data = get_content(notification_type, filled_payload or payload)
         data['body'] = ''.join(map(remove_links, data['body']))
     except KeyError:
         data = payload
+    return data
 
-    for subscription in subscriptions:
-        try:
-            webpush.send(subscription, data)
-        except WebPushException as ex:
-            log.exception(ex)
+
+def _webpush_options() -> dict:
+    """Read the VAPID options from the config, to be used outside of the application context."""
+    config = current_app.config
+    # pywebpush fills in the audience and expiration of the claims it is given,
+    # these depend on the push service and must not be shared between requests
+    claims = {key: value for key, value in config['WEBPUSH_VAPID_CLAIMS'].items()
+              if key not in ('aud', 'exp')}
+    return {
+        'vapid_private_key': config['WEBPUSH_VAPID_PRIVATE_KEY'],
+        'vapid_claims': claims,
+        'timeout': config['WEBPUSH_TIMEOUT'],
+    }
+
+
+def _send(subscription: dict, data: str, options: dict) -> Optional[Exception]:
+    """Send the data to the subscription, return the error if it failed."""
+    try:
+        webpush(subscription, data, **dict(options, vapid_claims=dict(options['vapid_claims'])))
+        return None
+    except (WebPushException, RequestException) as exc:
+        return exc
+
+
+def _is_gone(error: Exception) -> bool:
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code in GONE_STATUSES
+
+
+def push_to(subscription: dict, data: dict) -> Optional[Exception]:
+    """Send the data to a single subscription, return the error if it failed."""
+    return _send(subscription, json.dumps(data), _webpush_options())
+
+
+def push(notifications: Sequence[Notification]) -> Dict[int, Optional[Exception]]:
+    """Send the notifications to all the push subscriptions of their recipients at once.
+    Returns a mapping from the notification ID to the error, if none of the live subscriptions
+    of the recipient could be reached, or None otherwise. Expired subscriptions are removed,
+    the caller has to commit the session."""
+    emails = {notification.recipient_email for notification in notifications}
+    subscriptions = dict(
+        db.session.query(
+            Account.email,
+            # pylint: disable=unsubscriptable-object
+            Account.notification_settings['subscriptions'],
+        ).filter(Account.email.in_(emails))
+    )
+
+    filled = hydrate_payloads([notification.payload and notification.payload.copy()
+                               for notification in notifications])
+    contents = {}
+    jobs = []
+    for notification, payload in zip(notifications, filled):
+        recipient_subscriptions = subscriptions.get(notification.recipient_email)
+        if not recipient_subscriptions:
+            log.error(f'User {notification.recipient_email} is not subscribed '
+                      'to push notifications.')
+            continue
+
+        key = (notification.type, json.dumps(notification.payload, sort_keys=True))
+        if key not in contents:
+            contents[key] = json.dumps(
+                get_push_content(notification.type, notification.payload, payload)
+            )
+        jobs.extend((notification, subscription, contents[key])
+                    for subscription in recipient_subscriptions)
+
+    options = _webpush_options()
+    with ThreadPoolExecutor(max_workers=current_app.config['WEBPUSH_MAX_WORKERS']) as executor:
+        outcomes = list(executor.map(lambda job: _send(job[1], job[2], options), jobs))
+
+    reached = set()
+    errors = {}
+    gone = defaultdict(set)
+    for (notification, subscription, _data), error in zip(jobs, outcomes):
+        if error is None:
+            reached.add(notification.id)
+        elif _is_gone(error):
+            log.info(f'Removing an expired push subscription of {notification.recipient_email}')
+            gone[notification.recipient_email].add(subscription.get('endpoint'))
+        else:
+            log.warning(f'Failed to push to {notification.recipient_email}: {error!r}')
+            errors[notification.id] = error
+
+    if gone:
+        _remove_subscriptions(gone)
+
+    return {notification.id: None if notification.id in reached else errors.get(notification.id)
+            for notification in notifications}
+
+
+def _without(subscriptions: Iterable[dict], endpoints: Optional[set]) -> list:
+    """Return the subscriptions except for the ones with the given endpoints (all if None)."""
+    if endpoints is None:
+        return []
+    return [subscription for subscription in subscriptions
+            if subscription.get('endpoint') not in endpoints]
+
+
+def _remove_subscriptions(endpoints_by_email: Dict[str, set]):
+    """Remove the subscriptions with the given endpoints from the accounts."""
+    accounts = (
+        Account.query
+            .filter(Account.email.in_(endpoints_by_email))
+            .with_for_update()
+    )
+    for account in accounts:
+        settings = account.notification_settings
+        settings['subscriptions'] = _without(settings.get('subscriptions', []),
+                                             endpoints_by_email[account.email])
+        flag_modified(account, 'notification_settings')
 
 
 def subscribe(user, subscription_information):
-    '''Add the subscription information to the list of the user's push subscriptions.'''
+    '''Add the subscription information to the list of the user's push subscriptions.
+    A subscription with the same endpoint is replaced.'''
     settings = user.notification_settings
     settings.update({
-        'subscriptions': settings.get('subscriptions', []) + [subscription_information]
+        'subscriptions': _without(settings.get('subscriptions', []),
+                                  {subscription_information['endpoint']})
+                         + [subscription_information]
     })
     flag_modified(user, 'notification_settings')
 
@@ -57,4 +177,22 @@ def subscribe(user, subscription_information):
         raise exc
 
 
-# TODO: create unsubscribe method to remove all (or some) push subscriptions
+def unsubscribe(user, endpoint: Optional[str] = None) -> bool:
+    '''Remove the push subscription with the given endpoint, or all of them if it is None.
+    Returns whether any subscriptions were removed.'''
+    settings = user.notification_settings
+    subscriptions = settings.get('subscriptions', [])
+    remaining = _without(subscriptions, None if endpoint is None else {endpoint})
+    if len(remaining) == len(subscriptions):
+        return False
+
+    settings['subscriptions'] = remaining
+    flag_modified(user, 'notification_settings')
+
+    try:
+        db.session.commit()
+    except IntegrityError as exc:
+        db.session.rollback()
+        log.exception(exc)
+        raise exc
+    return True
@@ -0,0 +1,67 @@
+"""Rendering of the notification emails.
+
+The email template is read and compiled once per process. The content of a notification
+(title and HTML) depends only on its type and payload, so the notifications of a broadcast
+share it and only the recipient differs between the messages."""
+
+import json
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, Optional, Tuple
+
+from flask_mail import Message
+
+from innopoints.models import Notification, NotificationType
+from .content import get_content
+
+EMAIL_TEMPLATE = 'templates/email.html'
+
+
+class CompiledTemplate:
+    """A `str.format`-style template, split into the literal text and the fields once.
+    Format specs and conversions are not supported."""
+
+    def __init__(self, source: str):
+        self._chunks = [(literal, field)
+                        for literal, field, _spec, _conversion in Formatter().parse(source)]
+
+    def render(self, **fields) -> str:
+        """Substitute the fields into the template."""
+        parts = []
+        for literal, field in self._chunks:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(fields[field]))
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def load_template(path: str) -> CompiledTemplate:
+    """Read and compile the template, once per process."""
+    with open(path) as template_file:
+        return CompiledTemplate(template_file.read())
+
+
+def render_content(notification_type: NotificationType, payload=None) -> Tuple[str, str]:
+    """Return the subject and the HTML of the email for a notification with the given content."""
+    message_content = get_content(notification_type, payload)
+    body = ''.join(map(str, message_content['body']))
+    html = load_template(EMAIL_TEMPLATE).render(header=message_content['title'], body=body)
+    return message_content['title'], html
+
+
+def render_email(notification: Notification, payload=None,
+                 shared: Optional[Dict[tuple, Tuple[str, str]]] = None) -> Message:
+    """Assemble the email message for the notification.
+    The payload may be passed already filled by `hydrate_payloads`.
+    Pass the same `shared` dict when rendering a batch of notifications,
+    so that the content shared by several recipients is only rendered once."""
+    if shared is None:
+        subject, html = render_content(notification.type, payload or notification.payload)
+    else:
+        key = (notification.type, json.dumps(notification.payload, sort_keys=True))
+        if key not in shared:
+            shared[key] = render_content(notification.type, payload or notification.payload)
+        subject, html = shared[key]
+
+    return Message(subject, recipients=[notification.recipient_email], html=html)
@@ -0,0 +1,155 @@
+"""A pool of persistent SMTP connections for sending the notification emails.
+
+Opening an SMTP session to the mail server means a TCP connection, a TLS handshake
+and a login, so the connections made with `mail.connect()` are kept open and reused
+for many messages. A connection is replaced when it fails, when it is older than
+`MAIL_POOL_MAX_AGE` seconds or when it has been idle for `MAIL_POOL_MAX_IDLE` seconds
+(mail servers drop idle sessions). At most `MAIL_POOL_SIZE` connections are open at once."""
+
+import logging
+import smtplib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+from flask import current_app
+from flask_mail import Connection, Message
+
+from innopoints.extensions import mail
+
+log = logging.getLogger(__name__)
+
+
+class SMTPUnavailable(Exception):
+    """Raised when a connection to the mail server cannot be opened."""
+
+
+@dataclass
+class SMTPStats:
+    """Throughput metrics of an SMTP pool."""
+    sent: int = 0
+    failed: int = 0
+    connections_opened: int = 0
+    connections_recycled: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def throughput(self) -> float:
+        """Messages sent per second since the pool was created."""
+        elapsed = time.monotonic() - self.started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f'{self.sent} sent, {self.failed} failed, {self.throughput:.1f} messages/s, '
+                f'{self.connections_opened} connection(s) opened, '
+                f'{self.connections_recycled} recycled')
+
+
+@dataclass
+class _PooledConnection:
+    connection: Connection
+    uses: int = 0
+    opened: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SMTPPool:
+    """A bounded pool of open, authenticated SMTP connections. Safe to use from several threads."""
+
+    def __init__(self, size: int, max_age: float, max_idle: float):
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.stats = SMTPStats()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: List[_PooledConnection] = []
+
+    def _count(self, counter: str):
+        """Increment the stats counter, the threads sending at once would lose the updates."""
+        with self._lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+
+    def _open(self) -> _PooledConnection:
+        try:
+            connection = mail.connect().__enter__()
+        except OSError as exc:  # smtplib errors are OSErrors as well
+            raise SMTPUnavailable(f'Cannot connect to the mail server: {exc!r}') from exc
+        self._count('connections_opened')
+        return _PooledConnection(connection)
+
+    @staticmethod
+    def _close(pooled: _PooledConnection):
+        try:
+            pooled.connection.__exit__(None, None, None)
+        except OSError:
+            pass  # the session is being dropped anyway
+
+    def _take(self) -> _PooledConnection:
+        """Take the most recently used live connection or open a new one."""
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                return self._open()
+            if now - pooled.opened < self.max_age and now - pooled.last_used < self.max_idle:
+                return pooled
+            self._count('connections_recycled')
+            self._close(pooled)
+
+    def send(self, message: Message):
+        """Send the message over a pooled connection.
+        If the server has dropped a reused connection, the message is sent over a fresh one."""
+        with self._slots:
+            try:
+                pooled = self._take()
+                try:
+                    self._send_over(pooled, message)
+                except smtplib.SMTPServerDisconnected:
+                    if not pooled.uses:
+                        raise
+                    self._count('connections_recycled')
+                    self._send_over(self._open(), message)
+            except Exception:
+                self._count('failed')
+                raise
+            self._count('sent')
+
+    def _send_over(self, pooled: _PooledConnection, message: Message):
+        try:
+            pooled.connection.send(message)
+        except OSError:
+            # the session may be left in an unknown state, start over with a new one
+            self._close(pooled)
+            raise
+        except Exception:
+            # the message itself is invalid, the session is still usable
+            self._put(pooled)
+            raise
+        pooled.uses += 1
+        self._put(pooled)
+
+    def _put(self, pooled: _PooledConnection):
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(pooled)
+
+    def close(self):
+        """Close all the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._close(pooled)
+        log.info(f'Closed the SMTP pool: {self.stats}')
+
+
+def get_smtp_pool() -> SMTPPool:
+    """Return the SMTP pool of the current application, creating it on first use."""
+    extensions = current_app.extensions
+    if 'smtp_pool' not in extensions:
+        config = current_app.config
+        extensions['smtp_pool'] = SMTPPool(size=config['MAIL_POOL_SIZE'],
+                                           max_age=config['MAIL_POOL_MAX_AGE'],
+                                           max_idle=config['MAIL_POOL_MAX_IDLE'])
+    return extensions['smtp_pool']
@@ -0,0 +1,147 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is an opaque URL-safe string encoding the ordering key of the last row of a page.
+The next page is the rows strictly after that key in the ordering of the query.
+Unlike OFFSET, this costs the same for every page, and no total count is needed to navigate."""
+
+import base64
+import json
+import math
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from flask import current_app, request
+
+from innopoints.core.helpers import abort
+from innopoints.extensions import db
+
+COUNT_MODES = ('exact', 'capped')
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the ordering key of a row into an opaque cursor.
+    Datetimes are encoded as ISO 8601 strings."""
+    serialized = [value.isoformat() if isinstance(value, datetime) else value
+                  for value in values]
+    return base64.urlsafe_b64encode(json.dumps(serialized).encode()).decode()
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> list:
+    """Decode a cursor into the ordering key, converting the values to the given types.
+    Raises ValueError if the cursor is malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Malformed cursor.') from exc
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Malformed cursor.')
+
+    try:
+        return [datetime.fromisoformat(value) if value_type is datetime else value_type(value)
+                for value, value_type in zip(values, types)]
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Malformed cursor.') from exc
+
+
+class SortKey(NamedTuple):
+    """A column or expression the rows are ordered by, with the type of its values.
+    The last key of a query must be unique (e.g. the primary key) to break the ties."""
+    expression: Any
+    type: type
+    descending: bool = False
+
+
+def _ordering(keys: Sequence[SortKey]) -> list:
+    return [key.expression.desc() if key.descending else key.expression.asc() for key in keys]
+
+
+def _after(keys: Sequence[SortKey], values: Sequence[Any]):
+    """Return the condition selecting the rows that come after the key values."""
+    condition = None
+    for key, value in reversed(list(zip(keys, values))):
+        beyond = key.expression < value if key.descending else key.expression > value
+        if condition is not None:
+            beyond = db.or_(beyond, db.and_(key.expression == value, condition))
+        condition = beyond
+    return condition
+
+
+def paginate_by_keys(query, keys: Sequence[SortKey], cursor: Optional[str],
+                     limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Return a page of the query, ordered by the keys and starting after the cursor
+    (from the beginning if it is empty), and the cursor of the next page (None on the last page).
+    The rows are returned as the query would return them.
+    Raises ValueError if the cursor is malformed."""
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, [key.type for key in keys])))
+
+    width = len(query.column_descriptions)
+    query = query.add_columns(*(key.expression for key in keys)).order_by(*_ordering(keys))
+    # fetch one extra row to know whether there is a next page
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*rows[-1][width:])
+
+    if width == 1:
+        return [row[0] for row in rows], next_cursor
+    return [dict(zip(row._fields[:width], row[:width]))  # pylint: disable=protected-access
+            for row in rows], next_cursor
+
+
+def count_rows(query, mode: str) -> Tuple[int, bool]:
+    """Count the rows of the query, either exactly or stopping at `PAGINATION_COUNT_CAP`.
+    Returns the count and whether it was capped."""
+    query = query.order_by(None)
+    if mode == 'capped':
+        cap = current_app.config['PAGINATION_COUNT_CAP']
+        query = query.limit(cap + 1)
+    count = db.session.query(db.func.count()).select_from(query.subquery()).scalar()
+    if mode == 'capped' and count > cap:
+        return cap, True
+    return count, False
+
+
+def paginate(query, keys: Sequence[SortKey], default_limit: int,
+             total: Optional[int] = None) -> Tuple[List[Any], dict]:
+    """Return the page of the query requested with the `limit` and either `page` or `cursor`
+    query parameters, and the pagination fields of the response.
+
+    With `page`, the response has the number of `pages`, from an exact count by default.
+    With `cursor` (empty for the first page), the response has the `next_cursor`
+    and the `count` only if requested. `count=capped` stops counting at a limit,
+    adding whether it was reached as `capped`. The known total can be passed instead."""
+    keyset = 'cursor' in request.args
+    try:
+        limit = int(request.args.get('limit', default_limit))
+        page = int(request.args.get('page', 1))
+    except ValueError:
+        abort(400, {'message': 'Bad query parameters.'})
+
+    if limit < 1 or page < 1:
+        abort(400, {'message': 'Limit and page number must be positive.'})
+
+    count_mode = request.args.get('count', None if keyset else 'exact')
+    if count_mode is not None and count_mode not in COUNT_MODES:
+        abort(400, {'message': f'The count mode must be one of {", ".join(COUNT_MODES)}.'})
+
+    fields = {}
+    if total is None and count_mode is not None:
+        total, capped = count_rows(query, count_mode)
+        if count_mode == 'capped':
+            fields['capped'] = capped
+
+    if keyset:
+        try:
+            rows, fields['next_cursor'] = paginate_by_keys(query, keys, request.args['cursor'],
+                                                           limit)
+        except ValueError:
+            abort(400, {'message': 'Bad query parameters.'})
+        if total is not None:
+            fields['count'] = total
+    else:
+        rows = query.order_by(*_ordering(keys)).offset(limit * (page - 1)).limit(limit).all()
+        fields['pages'] = math.ceil(total / limit)
+    return rows, fields
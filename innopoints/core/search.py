@@ -0,0 +1,54 @@
+"""Full-text search helpers.
+
+The searchable models keep a maintained `tsvector` column indexed with GIN
+(see `Project.search_vector`). The user's query is turned into a `tsquery`
+in which every word matches as a prefix, so the results can be shown while typing.
+
+Short texts like names and emails are matched with (I)LIKE patterns instead,
+served by the pg_trgm GIN indexes."""
+
+import re
+from typing import Optional
+
+from innopoints.extensions import db
+
+# The text search configuration used both for the documents and the queries
+SEARCH_CONFIG = 'english'
+
+# pg_trgm splits the text into trigrams, a shorter substring cannot be looked up in the index
+TRIGRAM_LENGTH = 3
+
+# Letters and digits only, everything else is tsquery syntax or a separator
+_WORD = re.compile(r'[^\W_]+')
+
+
+def weighted_vector(text, weight: str):
+    """Return the tsvector of the text (NULL being empty) with the weight ('A' to 'D')."""
+    return db.func.setweight(db.func.to_tsvector(SEARCH_CONFIG, db.func.coalesce(text, '')),
+                             weight)
+
+
+def prefix_tsquery(text: Optional[str]):
+    """Build a tsquery matching the documents that contain all the words of the text as prefixes.
+    Returns None if the text contains no words."""
+    words = _WORD.findall(text or '')
+    if not words:
+        return None
+    return db.func.to_tsquery(SEARCH_CONFIG, ' & '.join(f'{word}:*' for word in words))
+
+
+def matches(vector, query):
+    """Return the condition that the document vector matches the query."""
+    return vector.op('@@')(query)
+
+
+def rank(vector, query):
+    """Return the relevance of the document vector to the query.
+    The rank is widened to double precision so that it survives a round trip through Python
+    unchanged, as needed to continue after it in keyset pagination."""
+    return db.cast(db.func.ts_rank(vector, query), db.Float)
+
+
+def escape_like(text: str) -> str:
+    """Escape the LIKE wildcards in the text, so that it is matched literally."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
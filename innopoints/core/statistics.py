@@ -0,0 +1,253 @@
+"""The statistics on the volunteering and the store, served from the daily rollups.
+
+The rollups hold the whole days (in UTC) before the last refresh, see `refresh_rollups`.
+A period is answered by summing the rollups over its whole days and counting the rest
+of it (the partial days at the edges and the days since the refresh) from the source tables.
+The rollups are rebuilt by the `refresh-statistics` command, so the changes to the days
+that are already rolled up (e.g. a project finalized late or a refunded purchase)
+only show up after the next refresh."""
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from innopoints.core.timezone import tz_aware_now
+from innopoints.extensions import db
+from innopoints.models import (
+    Account,
+    Activity,
+    Application,
+    Feedback,
+    LifetimeStage,
+    Project,
+    StockChange,
+    Transaction,
+    competence_rollup,
+    feedback_competence,
+    hour_rollup,
+    innopoint_rollup,
+    project_tags,
+    rollup_refresh,
+)
+
+
+def _day(column):
+    """Return the UTC day of the timestamp column."""
+    return db.cast(db.func.timezone('UTC', column), db.Date)
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time(), tzinfo=timezone.utc)
+
+
+def _rolled_days(start: datetime, end: datetime) -> Optional[Tuple[date, date]]:
+    """Return the first and the day after the last of the rolled up whole days
+    strictly within the period, or None if there are none."""
+    until = db.session.query(db.func.max(rollup_refresh.c.until)).scalar()
+    if until is None:
+        return None
+    first = start.astimezone(timezone.utc).date() + timedelta(days=1)
+    last = min(end.astimezone(timezone.utc).date(), until)
+    if first >= last:
+        return None
+    return first, last
+
+
+def _feedback_competences():
+    """Return the query of the competences developed in the feedback,
+    with the project tags and the volunteer joined for filtering."""
+    return (
+        db.session
+            .query(feedback_competence.c.competence_id)
+            .select_from(feedback_competence)
+            .join(Feedback, feedback_competence.c.feedback_id == Feedback.application_id)
+            .join(Feedback.application)
+            .join(Application.activity)
+            .join(Activity.project)
+            .outerjoin(project_tags, Project.id == project_tags.c.project_id)
+            .join(Application.applicant)
+    )
+
+
+def _volunteering_hours():
+    """Return the query of the hours volunteered on the finished projects,
+    with the project tags and the volunteer joined for filtering."""
+    return (
+        db.session
+            .query(Application.actual_hours)
+            .select_from(Application)
+            .join(Application.activity)
+            .join(Activity.project)
+            .outerjoin(project_tags, Project.id == project_tags.c.project_id)
+            .join(Application.applicant)
+            .filter(Project.lifetime_stage == LifetimeStage.finished)
+    )
+
+
+def _spent_innopoints():
+    """Return the query of the payments for the purchases, with the customer joined for filtering.
+    Only purchases are paid for, the condition lets the index on them serve the query."""
+    return (
+        db.session
+            .query(Transaction.change)
+            .select_from(Transaction)
+            .join(Transaction.account)
+            .join(Transaction.stock_change)
+            .filter(StockChange.amount < 0)
+    )
+
+
+def competence_counts(start: datetime, end: datetime,
+                      groups: List[str], tag: Optional[str]) -> Dict[int, int]:
+    """Return the number of feedback developing each competence in the period,
+    by the volunteers from the groups (any if empty) on the projects with the tag."""
+    parts = []
+    raw = (
+        _feedback_competences()
+            .add_columns(db.literal(1).label('amount'))
+            .filter(Feedback.time > start, Feedback.time < end)
+    )
+    rolled_days = _rolled_days(start, end)
+    if rolled_days is not None:
+        first, last = rolled_days
+        raw = raw.filter(db.or_(Feedback.time < _midnight(first),
+                                Feedback.time >= _midnight(last)))
+        rolled = (
+            db.select([competence_rollup.c.competence_id, competence_rollup.c.amount])
+                .where(competence_rollup.c.day >= first)
+                .where(competence_rollup.c.day < last)
+        )
+        if groups:
+            rolled = rolled.where(competence_rollup.c.group.in_(groups))
+        if tag is not None:
+            rolled = rolled.where(competence_rollup.c.tag_id == tag)
+        parts.append(rolled)
+
+    if groups:
+        raw = raw.filter(Account.group.in_(groups))
+    if tag is not None:
+        raw = raw.filter(project_tags.c.tag_id == tag)
+    parts.append(raw.statement)
+
+    counts = db.union_all(*parts).subquery()
+    return dict(
+        db.session.query(counts.c.competence_id,
+                         db.cast(db.func.sum(counts.c.amount), db.Integer))
+            .group_by(counts.c.competence_id)
+    )
+
+
+def volunteering_hours(start: datetime, end: datetime,
+                       groups: List[str], tag: Optional[str]) -> int:
+    """Return the hours volunteered on the finished activities held within the period,
+    by the volunteers from the groups (any if empty) on the projects with the tag."""
+    parts = []
+    raw = (
+        _volunteering_hours()
+            .with_entities(Application.actual_hours.label('hours'))
+            .filter(Activity.start_date > start, Activity.end_date < end)
+    )
+    rolled_days = _rolled_days(start, end)
+    if rolled_days is not None:
+        first, last = rolled_days
+        raw = raw.filter(db.or_(Activity.start_date < _midnight(first),
+                                Activity.end_date >= _midnight(last)))
+        rolled = (
+            db.select([hour_rollup.c.hours])
+                .where(hour_rollup.c.start_day >= first)
+                .where(hour_rollup.c.end_day < last)
+        )
+        if groups:
+            rolled = rolled.where(hour_rollup.c.group.in_(groups))
+        if tag is not None:
+            rolled = rolled.where(hour_rollup.c.tag_id == tag)
+        parts.append(rolled)
+
+    if groups:
+        raw = raw.filter(Account.group.in_(groups))
+    if tag is not None:
+        raw = raw.filter(project_tags.c.tag_id == tag)
+    parts.append(raw.statement)
+
+    hours = db.union_all(*parts).subquery()
+    return db.session.query(db.cast(db.func.sum(hours.c.hours), db.Integer)).scalar() or 0
+
+
+def spent_innopoints(start: datetime, end: datetime, groups: List[str]) -> int:
+    """Return the innopoints spent in the period by the customers from the groups (any if empty)."""
+    parts = []
+    raw = (
+        _spent_innopoints()
+            .with_entities((-Transaction.change).label('spent'))
+            .filter(StockChange.time > start, StockChange.time < end)
+    )
+    rolled_days = _rolled_days(start, end)
+    if rolled_days is not None:
+        first, last = rolled_days
+        raw = raw.filter(db.or_(StockChange.time < _midnight(first),
+                                StockChange.time >= _midnight(last)))
+        rolled = (
+            db.select([innopoint_rollup.c.spent])
+                .where(innopoint_rollup.c.day >= first)
+                .where(innopoint_rollup.c.day < last)
+        )
+        if groups:
+            rolled = rolled.where(innopoint_rollup.c.group.in_(groups))
+        parts.append(rolled)
+
+    if groups:
+        raw = raw.filter(Account.group.in_(groups))
+    parts.append(raw.statement)
+
+    spent = db.union_all(*parts).subquery()
+    return db.session.query(db.cast(db.func.sum(spent.c.spent), db.Integer)).scalar() or 0
+
+
+def refresh_rollups() -> date:
+    """Rebuild the rollups of the whole days up to today (in UTC) from the source tables.
+    Returns the first day that is not rolled up. The caller has to commit the session,
+    the statistics are served from the previous rollups until then."""
+    # Concurrent refreshes would insert the rollups twice, the readers are not blocked
+    db.session.execute(db.text('LOCK TABLE rollup_refresh IN EXCLUSIVE MODE'))
+    until = tz_aware_now().date()
+    for table in (competence_rollup, hour_rollup, innopoint_rollup, rollup_refresh):
+        db.session.execute(table.delete())
+
+    feedback_day = _day(Feedback.time)
+    competences = (
+        _feedback_competences()
+            .add_columns(feedback_day, Account.group, project_tags.c.tag_id,
+                         db.func.count())
+            .filter(Feedback.time < _midnight(until))
+            .group_by(feedback_competence.c.competence_id, feedback_day,
+                      Account.group, project_tags.c.tag_id)
+    )
+    db.session.execute(competence_rollup.insert().from_select(
+        ['competence_id', 'day', 'group', 'tag_id', 'amount'], competences.statement
+    ))
+
+    start_day, end_day = _day(Activity.start_date), _day(Activity.end_date)
+    hours = (
+        _volunteering_hours()
+            .with_entities(start_day, end_day, Account.group, project_tags.c.tag_id,
+                           db.func.sum(Application.actual_hours))
+            .filter(Activity.start_date.isnot(None), Activity.end_date < _midnight(until))
+            .filter(Application.actual_hours.isnot(None))
+            .group_by(start_day, end_day, Account.group, project_tags.c.tag_id)
+    )
+    db.session.execute(hour_rollup.insert().from_select(
+        ['start_day', 'end_day', 'group', 'tag_id', 'hours'], hours.statement
+    ))
+
+    stock_change_day = _day(StockChange.time)
+    spent = (
+        _spent_innopoints()
+            .with_entities(stock_change_day, Account.group, -db.func.sum(Transaction.change))
+            .filter(StockChange.time < _midnight(until))
+            .group_by(stock_change_day, Account.group)
+    )
+    db.session.execute(innopoint_rollup.insert().from_select(
+        ['day', 'group', 'spent'], spent.statement
+    ))
+
+    db.session.execute(rollup_refresh.insert().values(time=tz_aware_now(), until=until))
+    return until
@@ -1,6 +1,8 @@
 """This module contains all the models for the database."""
 
 from .account import Account
+from .account_event import AccountEvent, AccountEventType
+from .account_statistics import AccountStatistics, cached_statistics, store_statistics
 from .activity_competence import activity_competence
 from .activity import Activity, IPTS_PER_HOUR
 from .application import Application, ApplicationStatus
@@ -8,7 +10,14 @@ from .color import Color
 from .competence import Competence
 from .feedback_competence import feedback_competence
 from .feedback import Feedback
-from .notification import Notification, NotificationType, NotificationGroup, type_to_group
+from .notification import (
+    Notification,
+    NotificationType,
+    NotificationGroup,
+    type_to_group,
+    DeliveryStatus,
+    NotificationDelivery,
+)
 from .product_image import ProductImage
 from .product import Product
 from .project_file import ProjectFile
@@ -16,7 +25,13 @@ from .project_moderation import project_moderation
 from .project_tags import project_tags
 from .project import Project, ReviewStatus, LifetimeStage
 from .size import Size
-from .static_file import StaticFile
+from .static_file import StaticFile, FileStatus
+from .statistics_rollup import (
+    competence_rollup,
+    hour_rollup,
+    innopoint_rollup,
+    rollup_refresh,
+)
 from .stock_change import StockChange, StockChangeStatus
 from .tag import Tag
 from .transaction import Transaction
@@ -26,6 +41,11 @@ from .volunteering_report import VolunteeringReport
 
 __all__ = (
     'Account',
+    'AccountEvent',
+    'AccountEventType',
+    'AccountStatistics',
+    'cached_statistics',
+    'store_statistics',
     'activity_competence',
     'Activity',
     'IPTS_PER_HOUR',
@@ -39,6 +59,8 @@ __all__ = (
     'NotificationType',
     'NotificationGroup',
     'type_to_group',
+    'DeliveryStatus',
+    'NotificationDelivery',
     'ProductImage',
     'Product',
     'ProjectFile',
@@ -49,6 +71,11 @@ __all__ = (
     'LifetimeStage',
     'Size',
     'StaticFile',
+    'FileStatus',
+    'competence_rollup',
+    'hour_rollup',
+    'innopoint_rollup',
+    'rollup_refresh',
     'StockChange',
     'StockChangeStatus',
     'Tag',
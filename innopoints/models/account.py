@@ -1,12 +1,15 @@
 """The Account model.
 
-Also contains the function to load the user for the login manager."""
+Also contains the function to load the user for the login manager
+and the listeners that keep the stored balance and unread notification counter
+in sync with the transactions and notifications."""
 
 from flask_login.mixins import UserMixin
+from sqlalchemy import event
 from sqlalchemy.dialects.postgresql import JSONB
 
 from innopoints.extensions import db, login_manager
-from innopoints.models.notification import NotificationGroup
+from innopoints.models.notification import Notification, NotificationGroup
 from innopoints.models.transaction import Transaction
 
 
@@ -22,12 +25,23 @@ DEFAULT_NOTIFICATIONS = {
 class Account(UserMixin, db.Model):
     """Represents an account of a logged in user."""
     __tablename__ = 'accounts'
+    __table_args__ = (
+        # Serve the account search by a part of the email or the name (requires pg_trgm)
+        db.Index('accounts_email_trgm', 'email',
+                 postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+        db.Index('accounts_full_name_trgm', 'full_name',
+                 postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}),
+    )
 
     full_name = db.Column(db.String(256), nullable=False)
     group = db.Column(db.String(64), nullable=True)
     email = db.Column(db.String(128), primary_key=True)
     telegram_username = db.Column(db.String(32), nullable=True)
     is_admin = db.Column(db.Boolean, nullable=False)
+    # Maintained by the Transaction listeners below, use `flask reconcile-balances` to verify
+    balance = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Maintained by the Notification listeners below and by the bulk updates of notifications
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_projects = db.relationship('Project',
                                        cascade='all, delete-orphan',
                                        passive_deletes=True,
@@ -65,14 +79,61 @@ class Account(UserMixin, db.Model):
         """Return the user's e-mail."""
         return self.email
 
-    @property
-    def balance(self):
-        """Return the user's innopoints balance."""
-        return db.session.query(
-            db.func.sum(Transaction.change)
-        ).filter(
-            Transaction.account_email == self.email
-        ).scalar() or 0
+
+def _shift_balance(connection, account_email, change):
+    """Add the change to the stored balance of the account within the current transaction."""
+    accounts = Account.__table__
+    connection.execute(
+        accounts.update()
+            .where(accounts.c.email == account_email)
+            .values(balance=accounts.c.balance + change)
+    )
+
+
+@event.listens_for(Transaction, 'after_insert')
+def credit_transaction(_mapper, connection, transaction):
+    """Apply the change of a new transaction to the account balance."""
+    _shift_balance(connection, transaction.account_email, transaction.change)
+
+
+@event.listens_for(Transaction, 'before_delete')
+def revert_transaction(_mapper, connection, transaction):
+    """Revert the change of a deleted transaction from the account balance."""
+    _shift_balance(connection, transaction.account_email, -transaction.change)
+
+
+def _shift_unread_notifications(connection, recipient_email, change):
+    """Add the change to the stored unread notification counter within the current transaction."""
+    accounts = Account.__table__
+    connection.execute(
+        accounts.update()
+            .where(accounts.c.email == recipient_email)
+            .values(unread_notifications=accounts.c.unread_notifications + change)
+    )
+
+
+@event.listens_for(Notification, 'after_insert')
+def count_notification(_mapper, connection, notification):
+    """Count a new unread notification."""
+    if not notification.is_read:
+        _shift_unread_notifications(connection, notification.recipient_email, 1)
+
+
+@event.listens_for(Notification, 'after_update')
+def recount_notification(_mapper, connection, notification):
+    """Account for a notification being read or marked as unread."""
+    history = db.inspect(notification).attrs.is_read.history
+    if not history.deleted or history.deleted[0] == notification.is_read:
+        return
+    _shift_unread_notifications(connection, notification.recipient_email,
+                                -1 if notification.is_read else 1)
+
+
+@event.listens_for(Notification, 'before_delete')
+def uncount_notification(_mapper, connection, notification):
+    """Stop counting a deleted unread notification."""
+    if not notification.is_read:
+        _shift_unread_notifications(connection, notification.recipient_email, -1)
 
 
 @login_manager.user_loader
@@ -0,0 +1,129 @@
+"""The AccountEvent model.
+
+Also contains the AccountEventType enum and the listeners that record the events
+of the account timeline as they happen."""
+
+from enum import Enum, auto
+
+from sqlalchemy import event
+
+from innopoints.core.timezone import tz_aware_now
+from innopoints.extensions import db
+from innopoints.models.activity import Activity
+from innopoints.models.application import Application
+from innopoints.models.project import Project, LifetimeStage
+from innopoints.models.project_moderation import project_moderation
+from innopoints.models.stock_change import StockChange
+
+
+class AccountEventType(Enum):
+    """Represents the kind of an entry in the account timeline."""
+    application = auto()
+    purchase = auto()
+    promotion = auto()
+    project = auto()
+
+
+class AccountEvent(db.Model):
+    """Represents an entry in the timeline of an account.
+
+    The events are only appended, the details are read from the referenced instances,
+    so the timeline shows their current state. Deleting those deletes the event as well."""
+    __tablename__ = 'account_events'
+    __table_args__ = (
+        # Serves the timeline of an account, paginated by (entry_time, id)
+        db.Index('account_events_timeline', 'account_email', 'entry_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_email = db.Column(db.String(128),
+                              db.ForeignKey('accounts.email', ondelete='CASCADE'),
+                              nullable=False)
+    entry_time = db.Column(db.DateTime(timezone=True), nullable=False)
+    type = db.Column(db.Enum(AccountEventType), nullable=False)
+    project_id = db.Column(db.Integer,
+                           db.ForeignKey('projects.id', ondelete='CASCADE'),
+                           nullable=True,
+                           index=True)
+    application_id = db.Column(db.Integer,
+                               db.ForeignKey('applications.id', ondelete='CASCADE'),
+                               nullable=True,
+                               index=True)
+    stock_change_id = db.Column(db.Integer,
+                                db.ForeignKey('stock_changes.id', ondelete='CASCADE'),
+                                nullable=True,
+                                index=True)
+
+
+def _record(connection, **values):
+    """Insert an event within the current transaction."""
+    connection.execute(AccountEvent.__table__.insert().values(**values))
+
+
+@event.listens_for(Application, 'after_insert')
+def record_application(_mapper, connection, application):
+    """Record an application to a public activity in the applicant's timeline."""
+    activities = Activity.__table__
+    project_id = connection.execute(
+        db.select([activities.c.project_id])
+            .where(activities.c.id == application.activity_id)
+            .where(~activities.c.internal)
+    ).scalar()
+    if project_id is not None:
+        _record(connection,
+                account_email=application.applicant_email,
+                entry_time=application.application_time,
+                type=AccountEventType.application,
+                project_id=project_id,
+                application_id=application.id)
+
+
+@event.listens_for(StockChange, 'after_insert')
+def record_purchase(_mapper, connection, stock_change):
+    """Record a purchase in the customer's timeline."""
+    if stock_change.amount < 0:
+        _record(connection,
+                account_email=stock_change.account_email,
+                entry_time=stock_change.time,
+                type=AccountEventType.purchase,
+                stock_change_id=stock_change.id)
+
+
+def _record_publication(connection, project):
+    """Record the project in the creator's timeline and the promotion of its moderators."""
+    _record(connection,
+            account_email=project.creator_email,
+            entry_time=project.creation_time,
+            type=AccountEventType.project,
+            project_id=project.id)
+
+    account_events = AccountEvent.__table__
+    moderators = (
+        db.select([project_moderation.c.account_email,
+                   db.literal(tz_aware_now(), type_=account_events.c.entry_time.type),
+                   db.literal(AccountEventType.promotion, type_=account_events.c.type.type),
+                   db.literal(project.id)])
+            .where(project_moderation.c.project_id == project.id)
+            .where(project_moderation.c.account_email != project.creator_email)
+    )
+    connection.execute(
+        account_events.insert().from_select(
+            ['account_email', 'entry_time', 'type', 'project_id'], moderators
+        )
+    )
+
+
+@event.listens_for(Project, 'after_insert')
+def record_project(_mapper, connection, project):
+    """Record a project that is created published."""
+    if project.lifetime_stage != LifetimeStage.draft:
+        _record_publication(connection, project)
+
+
+@event.listens_for(Project, 'after_update')
+def record_published_project(_mapper, connection, project):
+    """Record a project when it is published."""
+    history = db.inspect(project).attrs.lifetime_stage.history
+    if history.deleted and history.deleted[0] == LifetimeStage.draft \
+            and project.lifetime_stage != LifetimeStage.draft:
+        _record_publication(connection, project)
@@ -0,0 +1,156 @@
+"""The AccountStatistics model.
+
+Also contains the listeners that mark the cached statistics stale
+when the applications, reports, feedback, activities or projects of the account change."""
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import JSONB, insert
+
+from innopoints.extensions import db
+from innopoints.models.activity import Activity
+from innopoints.models.application import Application
+from innopoints.models.competence import Competence
+from innopoints.models.feedback import Feedback
+from innopoints.models.project import Project, LifetimeStage
+from innopoints.models.volunteering_report import VolunteeringReport
+
+
+class AccountStatistics(db.Model):
+    """Represents the cached all-time statistics of an account.
+
+    The version is incremented whenever the statistics go stale, the statistics computed
+    from the data read before that are not stored (see `store_statistics`)."""
+    __tablename__ = 'account_statistics'
+
+    account_email = db.Column(db.String(128),
+                              db.ForeignKey('accounts.email', ondelete='CASCADE'),
+                              primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    # NULL when stale
+    data = db.Column(JSONB, nullable=True)
+
+
+def cached_statistics(email: str):
+    """Return the version of the cached statistics of the account
+    and the statistics themselves, None if they are stale."""
+    table = AccountStatistics.__table__
+    row = db.session.execute(
+        db.select([table.c.version, table.c.data]).where(table.c.account_email == email)
+    ).first()
+    if row is None:
+        return 0, None
+    return row.version, row.data
+
+
+def store_statistics(email: str, version: int, data: dict):
+    """Cache the statistics of the account, unless they went stale since the version was read.
+    The caller has to commit the session."""
+    table = AccountStatistics.__table__
+    db.session.execute(
+        insert(table)
+            .values(account_email=email, version=version, data=data)
+            .on_conflict_do_update(index_elements=[table.c.account_email],
+                                   set_={'data': data},
+                                   where=table.c.version == version)
+    )
+
+
+def _invalidate(connection, emails):
+    """Mark the cached statistics of the accounts stale.
+    `emails` is a SELECT of distinct account emails."""
+    table = AccountStatistics.__table__
+    connection.execute(
+        insert(table)
+            .from_select(['account_email', 'version'],
+                         db.select([emails.subquery().c[0], db.literal(1)]))
+            .on_conflict_do_update(index_elements=[table.c.account_email],
+                                   set_={'version': table.c.version + 1, 'data': db.null()})
+    )
+
+
+def _applicant(application_id):
+    applications = Application.__table__
+    return (
+        db.select([applications.c.applicant_email])
+            .where(applications.c.id == application_id)
+    )
+
+
+def _applicants(*conditions):
+    applications = Application.__table__
+    activities = Activity.__table__
+    return (
+        db.select([applications.c.applicant_email])
+            .select_from(applications.join(activities,
+                                           activities.c.id == applications.c.activity_id))
+            .where(db.and_(*conditions))
+            .distinct()
+    )
+
+
+@event.listens_for(Application, 'after_insert')
+@event.listens_for(Application, 'after_delete')
+def invalidate_by_application(_mapper, connection, application):
+    """Mark the statistics of the applicant stale."""
+    _invalidate(connection, db.select([db.literal(application.applicant_email)]))
+
+
+@event.listens_for(Application, 'after_update')
+def invalidate_by_updated_application(_mapper, connection, application):
+    """Mark the statistics of the applicant stale if the counted fields change."""
+    attributes = db.inspect(application).attrs
+    if any(getattr(attributes, field).history.has_changes()
+           for field in ('status', 'actual_hours', 'application_time', 'activity_id')):
+        _invalidate(connection, db.select([db.literal(application.applicant_email)]))
+
+
+@event.listens_for(Feedback, 'after_insert')
+@event.listens_for(Feedback, 'after_update')
+@event.listens_for(Feedback, 'after_delete')
+def invalidate_by_feedback(_mapper, connection, feedback):
+    """Mark the statistics of the volunteer stale, the competences may change."""
+    _invalidate(connection, _applicant(feedback.application_id))
+
+
+@event.listens_for(VolunteeringReport, 'after_insert')
+@event.listens_for(VolunteeringReport, 'after_update')
+@event.listens_for(VolunteeringReport, 'after_delete')
+def invalidate_by_report(_mapper, connection, report):
+    """Mark the statistics of the volunteer stale, the rating may change."""
+    _invalidate(connection, _applicant(report.application_id))
+
+
+@event.listens_for(Activity, 'after_update')
+def invalidate_by_activity(_mapper, connection, activity):
+    """Mark the statistics of the volunteers stale if the activity stops or starts counting."""
+    attributes = db.inspect(activity).attrs
+    if attributes.fixed_reward.history.has_changes() or attributes.internal.history.has_changes():
+        _invalidate(connection, _applicants(Activity.__table__.c.id == activity.id))
+
+
+@event.listens_for(Activity, 'before_delete')
+def invalidate_by_deleted_activity(_mapper, connection, activity):
+    """Mark the statistics of the volunteers stale before the applications are deleted."""
+    _invalidate(connection, _applicants(Activity.__table__.c.id == activity.id))
+
+
+@event.listens_for(Project, 'after_update')
+def invalidate_by_project(_mapper, connection, project):
+    """Mark the statistics of the volunteers stale when the project is finished or reopened."""
+    history = db.inspect(project).attrs.lifetime_stage.history
+    if LifetimeStage.finished in (*history.added, *history.deleted):
+        _invalidate(connection, _applicants(Activity.__table__.c.project_id == project.id))
+
+
+@event.listens_for(Project, 'before_delete')
+def invalidate_by_deleted_project(_mapper, connection, project):
+    """Mark the statistics of the volunteers stale before the applications are deleted."""
+    _invalidate(connection, _applicants(Activity.__table__.c.project_id == project.id))
+
+
+@event.listens_for(Competence, 'after_update')
+@event.listens_for(Competence, 'after_delete')
+def invalidate_by_competence(_mapper, connection, _competence):
+    """Mark all the statistics stale, they contain the names of the competences."""
+    table = AccountStatistics.__table__
+    connection.execute(table.update().values(version=table.c.version + 1, data=db.null()))
@@ -28,11 +28,12 @@ class Activity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=True)
     description = db.Column(db.String(1024), nullable=True)
-    start_date = db.Column(db.DateTime(timezone=True), nullable=True)
-    end_date = db.Column(db.DateTime(timezone=True), nullable=True)
+    start_date = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
+    end_date = db.Column(db.DateTime(timezone=True), nullable=True, index=True)
     project_id = db.Column(db.Integer,
                            db.ForeignKey('projects.id', ondelete='CASCADE'),
-                           nullable=False)
+                           nullable=False,
+                           index=True)
     project = db.relationship('Project',
                               back_populates='activities')
     working_hours = db.Column(db.Integer, nullable=True, default=1)
@@ -52,6 +53,16 @@ class Activity(db.Model):
                                    cascade='all, delete-orphan',
                                    passive_deletes=True,
                                    back_populates='activity')
+    # Deferred to avoid the subquery unless requested, see `undefer` in innopoints.core.loading
+    accepted_applications = db.column_property(
+        db.select([db.func.count(Application.id)])
+            .where((Application.activity_id == id)
+                   & (Application.status == ApplicationStatus.approved))
+            .correlate_except(Application)
+            .scalar_subquery(),
+        deferred=True,
+        doc='The amount of accepted applications.',
+    )
 
     @property
     def dates(self):
@@ -59,12 +70,6 @@ class Activity(db.Model):
         return {'start': self.start_date.isoformat(),
                 'end': self.end_date.isoformat()}
 
-    @property
-    def accepted_applications(self):
-        """Return the amount of accepted applications."""
-        return Application.query.filter_by(activity_id=self.id,
-                                           status=ApplicationStatus.approved).count()
-
     @property
     def vacant_spots(self):
         """Return the amount of vacant spots for the activity."""
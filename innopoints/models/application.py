@@ -30,7 +30,8 @@ class Application(db.Model):
     applicant = db.relationship('Account', back_populates='applications')
     activity_id = db.Column(db.Integer,
                             db.ForeignKey('activities.id', ondelete='CASCADE'),
-                            nullable=False)
+                            nullable=False,
+                            index=True)
     activity = db.relationship('Activity',
                                uselist=False,
                                single_parent=True,
@@ -18,7 +18,7 @@ class Feedback(db.Model):
                                   single_parent=True)
     competences = db.relationship('Competence',
                                   secondary='feedback_competence')
-    time = db.Column(db.DateTime(timezone=True), nullable=False, default=tz_aware_now)
+    time = db.Column(db.DateTime(timezone=True), nullable=False, default=tz_aware_now, index=True)
     answers = db.Column(db.ARRAY(db.String(1024)), nullable=False)
     transaction = db.relationship('Transaction',
                                   uselist=False,
@@ -1,6 +1,6 @@
-"""The Notification model.
+"""The Notification and NotificationDelivery models.
 
-Also contains the NotificationType and NotificationGroup enums."""
+Also contains the NotificationType, NotificationGroup and DeliveryStatus enums."""
 
 from enum import Enum, auto
 
@@ -54,13 +54,64 @@ type_to_group = {
 class Notification(db.Model):
     """Represents a notification about a certain event."""
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # Serves the feed of a recipient, paginated by (timestamp, id)
+        db.Index('notifications_feed', 'recipient_email', 'timestamp', 'id'),
+        db.Index('notifications_unread', 'recipient_email', 'timestamp', 'id',
+                 postgresql_where=db.text('NOT is_read')),
+        # Serves the lookups by the referenced instances, `payload @> '{"project_id": 1}'`
+        db.Index('notifications_payload', 'payload',
+                 postgresql_using='gin', postgresql_ops={'payload': 'jsonb_path_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     recipient_email = db.Column(db.String(128),
                                 db.ForeignKey('accounts.email', ondelete='CASCADE'),
                                 nullable=False)
     recipient = db.relationship('Account', back_populates='notifications')
-    is_read = db.Column(db.Boolean, nullable=False, default=False)
+    # The previous value is needed to update the unread notification counter
+    is_read = db.column_property(db.Column(db.Boolean, nullable=False, default=False),
+                                 active_history=True)
     payload = db.Column(JSONB, nullable=True)
     timestamp = db.Column(db.DateTime(timezone=True), nullable=False, default=tz_aware_now)
     type = db.Column(db.Enum(NotificationType), nullable=False)
+    deliveries = db.relationship('NotificationDelivery',
+                                 cascade='all, delete-orphan',
+                                 passive_deletes=True,
+                                 back_populates='notification')
+
+
+class DeliveryStatus(Enum):
+    """Represents the state of a notification delivery."""
+    pending = auto()
+    sent = auto()
+    failed = auto()
+
+
+class NotificationDelivery(db.Model):
+    """Represents a delivery of a notification by email or push, pending or done.
+    Written in the same transaction as the notification and processed by
+    the `flask deliver-notifications` worker."""
+    __tablename__ = 'notification_deliveries'
+    __table_args__ = (
+        # Serves the worker polling for due deliveries
+        db.Index('notification_deliveries_due', 'next_attempt',
+                 postgresql_where=db.text("status = 'pending'")),
+        # Serves the pruning of the deliveries sent long ago
+        db.Index('notification_deliveries_sent', 'delivered_at',
+                 postgresql_where=db.text("status = 'sent'")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    notification_id = db.Column(db.Integer,
+                                db.ForeignKey('notifications.id', ondelete='CASCADE'),
+                                nullable=False,
+                                index=True)
+    notification = db.relationship('Notification', back_populates='deliveries')
+    # The channel from the notification settings of the recipient: 'email' or 'push'
+    channel = db.Column(db.String(16), nullable=False)
+    status = db.Column(db.Enum(DeliveryStatus), nullable=False, default=DeliveryStatus.pending)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt = db.Column(db.DateTime(timezone=True), nullable=False, default=tz_aware_now)
+    last_error = db.Column(db.Text, nullable=True)
+    delivered_at = db.Column(db.DateTime(timezone=True), nullable=True)
@@ -1,5 +1,11 @@
-"""The Product model."""
+"""The Product model.
 
+Also contains the listeners that keep the search vector of the products up to date."""
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+
+from innopoints.core.search import weighted_vector
 from innopoints.core.timezone import tz_aware_now
 from innopoints.extensions import db
 
@@ -10,6 +16,7 @@ class Product(db.Model):
     __table_args__ = __table_args__ = (
         db.UniqueConstraint('name', 'type',
                             name='unique product'),
+        db.Index('products_search', 'search_vector', postgresql_using='gin'),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -22,11 +29,48 @@ class Product(db.Model):
                                 back_populates='product')
     price = db.Column(db.Integer,
                       db.CheckConstraint('price >= 0', name='non-negative price'),
-                      nullable=False)
+                      nullable=False,
+                      index=True)
     addition_time = db.Column(db.DateTime(timezone=True), nullable=False, default=tz_aware_now)
+    # The name, the type and the description, maintained by the listeners below
+    search_vector = db.deferred(db.Column(TSVECTOR, nullable=True))
+    # The distinct colors and sizes of the varieties, an empty string standing for none.
+    # Maintained by the Variety listeners in innopoints.models.variety
+    colors = db.Column(ARRAY(db.String(6)), nullable=False, default=list, server_default='{}')
+    sizes = db.Column(ARRAY(db.String(3)), nullable=False, default=list, server_default='{}')
 
     def __str__(self):
         """Human-readable representation of a product."""
         if self.type is None:
             return self.name
         return f"'{self.name}' {self.type}"
+
+
+def _refresh_search_vector(connection, product_id):
+    """Rebuild the search vector of the product within the current transaction."""
+    products = Product.__table__
+    document = (
+        weighted_vector(products.c.name, 'A')
+            .op('||')(weighted_vector(products.c.type, 'B'))
+            .op('||')(weighted_vector(products.c.description, 'C'))
+    )
+    connection.execute(
+        products.update()
+            .where(products.c.id == product_id)
+            .values(search_vector=document)
+    )
+
+
+@event.listens_for(Product, 'after_insert')
+def index_product(_mapper, connection, product):
+    """Build the search vector of a new product."""
+    _refresh_search_vector(connection, product.id)
+
+
+@event.listens_for(Product, 'after_update')
+def reindex_product(_mapper, connection, product):
+    """Rebuild the search vector of a product if its text changed."""
+    state = db.inspect(product)
+    if any(state.attrs[attribute].history.has_changes()
+           for attribute in ('name', 'type', 'description')):
+        _refresh_search_vector(connection, product.id)
@@ -4,6 +4,10 @@ Also contains the ReviewStatus and LifetimeStage enums."""
 
 from enum import Enum, auto
 
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from innopoints.core.search import weighted_vector
 from innopoints.core.timezone import tz_aware_now
 from innopoints.extensions import db
 from innopoints.models.activity import Activity
@@ -27,6 +31,9 @@ class LifetimeStage(Enum):
 class Project(db.Model):
     """Represents a project for volunteering."""
     __tablename__ = 'projects'
+    __table_args__ = (
+        db.Index('projects_search', 'search_vector', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=True)
@@ -42,31 +49,38 @@ class Project(db.Model):
                                  back_populates='moderated_projects')
     creator_email = db.Column(db.String(128),
                               db.ForeignKey('accounts.email', ondelete='CASCADE'),
-                              nullable=False)
+                              nullable=False,
+                              index=True)
     creator = db.relationship('Account',
                               back_populates='created_projects')
     admin_feedback = db.Column(db.String(1024), nullable=True)
     review_status = db.Column(db.Enum(ReviewStatus), nullable=True)
-    lifetime_stage = db.Column(db.Enum(LifetimeStage), nullable=False, default=LifetimeStage.draft)
+    # The previous value is needed to record the publication in the account timeline
+    lifetime_stage = db.column_property(
+        db.Column(db.Enum(LifetimeStage), nullable=False, default=LifetimeStage.draft),
+        active_history=True,
+    )
     tags = db.relationship('Tag', secondary='project_tags')
+    # The name, the activity names and the activity descriptions, maintained by the listeners below
+    search_vector = db.deferred(db.Column(TSVECTOR, nullable=True))
 
-    @property
-    def start_date(self):
-        """Returns the project start date as the earliest start_time of its activities."""
-        return db.session.query(
-            db.func.min(Activity.start_date),
-        ).filter(
-            Activity.project_id == self.id,
-        ).scalar()
-
-    @property
-    def end_date(self):
-        """Returns the project end date as the earliest start_time of its activities."""
-        return db.session.query(
-            db.func.max(Activity.end_date),
-        ).filter(
-            Activity.project_id == self.id,
-        ).scalar()
+    # Deferred to avoid the subqueries unless requested, see `undefer` in innopoints.core.loading
+    start_date = db.column_property(
+        db.select([db.func.min(Activity.start_date)])
+            .where(Activity.project_id == id)
+            .correlate_except(Activity)
+            .scalar_subquery(),
+        deferred=True,
+        doc='The project start date as the earliest start_date of its activities.',
+    )
+    end_date = db.column_property(
+        db.select([db.func.max(Activity.end_date)])
+            .where(Activity.project_id == id)
+            .correlate_except(Activity)
+            .scalar_subquery(),
+        deferred=True,
+        doc='The project end date as the latest end_date of its activities.',
+    )
 
     @property
     def image_url(self):
@@ -74,3 +88,62 @@ class Project(db.Model):
         if self.image_id is None:
             return None
         return f'/file/{self.image_id}'
+
+
+def _activity_text(column):
+    """Return the subquery concatenating the column over the public activities of the project."""
+    activities = Activity.__table__
+    return (
+        db.select([db.func.string_agg(column, ' ')])
+            .where(activities.c.project_id == Project.__table__.c.id)
+            .where(~activities.c.internal)
+            .scalar_subquery()
+    )
+
+
+def _refresh_search_vector(connection, project_id):
+    """Rebuild the search vector of the project within the current transaction."""
+    projects = Project.__table__
+    activities = Activity.__table__
+    document = (
+        weighted_vector(projects.c.name, 'A')
+            .op('||')(weighted_vector(_activity_text(activities.c.name), 'B'))
+            .op('||')(weighted_vector(_activity_text(activities.c.description), 'C'))
+    )
+    connection.execute(
+        projects.update()
+            .where(projects.c.id == project_id)
+            .values(search_vector=document)
+    )
+
+
+def _changed(instance, *attributes):
+    state = db.inspect(instance)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+
+@event.listens_for(Project, 'after_insert')
+def index_project(_mapper, connection, project):
+    """Build the search vector of a new project."""
+    _refresh_search_vector(connection, project.id)
+
+
+@event.listens_for(Project, 'after_update')
+def reindex_project(_mapper, connection, project):
+    """Rebuild the search vector of a renamed project."""
+    if _changed(project, 'name'):
+        _refresh_search_vector(connection, project.id)
+
+
+@event.listens_for(Activity, 'after_insert')
+@event.listens_for(Activity, 'after_delete')
+def reindex_activity_project(_mapper, connection, activity):
+    """Rebuild the search vector of the project of a new or deleted activity."""
+    _refresh_search_vector(connection, activity.project_id)
+
+
+@event.listens_for(Activity, 'after_update')
+def reindex_updated_activity_project(_mapper, connection, activity):
+    """Rebuild the search vector of the project if the searchable text of an activity changed."""
+    if _changed(activity, 'name', 'description', 'internal'):
+        _refresh_search_vector(connection, activity.project_id)
@@ -10,5 +10,6 @@ project_moderation = db.Table(
               primary_key=True),
     db.Column('account_email', db.String(128),
               db.ForeignKey('accounts.email', ondelete='CASCADE'),
-              primary_key=True)
+              primary_key=True,
+              index=True)
 )
@@ -1,14 +1,37 @@
-"""The StaticFile model."""
+"""The StaticFile model.
+
+Also contains the FileStatus enum."""
+
+from enum import Enum, auto
 
 from innopoints.extensions import db
 
 
+class FileStatus(Enum):
+    """Represents the state of the processing of an uploaded image."""
+    processing = auto()
+    ready = auto()
+    failed = auto()
+
+
 class StaticFile(db.Model):
-    """Represents the user-uploaded static files."""
+    """Represents the user-uploaded static files.
+    The uploads are stored as is and processed by the `flask process-images` worker."""
     __tablename__ = 'static_files'
+    __table_args__ = (
+        # Serves the worker polling for the uploads to process
+        db.Index('static_files_processing', 'id',
+                 postgresql_where=db.text("status = 'processing'")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     mimetype = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.Enum(FileStatus), nullable=False, default=FileStatus.ready)
+    # The crop requested on upload (x, y, width, height), until the image is processed
+    crop = db.Column(db.ARRAY(db.Integer), nullable=True)
+    # The widths of the downscaled copies, see `innopoints.core.image.make_variants`.
+    # NULL until the copies are made, empty if the image is too narrow to have any
+    variants = db.Column(db.ARRAY(db.Integer), nullable=True)
     owner_email = db.Column(db.String(128),
                             db.ForeignKey('accounts.email', ondelete='CASCADE'),
                             nullable=False)
@@ -0,0 +1,49 @@
+"""The daily rollups of the statistics, see `innopoints.core.statistics`.
+
+The days are taken in UTC. A project with several tags is counted once per tag,
+one without tags once with a NULL tag, as the statistics have always counted them."""
+
+from innopoints.extensions import db
+
+
+# The number of feedback on the day that developed the competence
+competence_rollup = db.Table(
+    'competence_rollup',
+    db.Column('day', db.Date, nullable=False, index=True),
+    db.Column('group', db.String(64), nullable=True),
+    db.Column('tag_id', db.Integer,
+              db.ForeignKey('tags.id', ondelete='CASCADE'),
+              nullable=True),
+    db.Column('competence_id', db.Integer,
+              db.ForeignKey('competences.id', ondelete='CASCADE'),
+              nullable=False),
+    db.Column('amount', db.Integer, nullable=False),
+)
+
+# The hours volunteered on the finished activities held between the days
+hour_rollup = db.Table(
+    'hour_rollup',
+    db.Column('start_day', db.Date, nullable=False, index=True),
+    db.Column('end_day', db.Date, nullable=False),
+    db.Column('group', db.String(64), nullable=True),
+    db.Column('tag_id', db.Integer,
+              db.ForeignKey('tags.id', ondelete='CASCADE'),
+              nullable=True),
+    db.Column('hours', db.Integer, nullable=False),
+)
+
+# The innopoints spent on the purchases made on the day
+innopoint_rollup = db.Table(
+    'innopoint_rollup',
+    db.Column('day', db.Date, nullable=False, index=True),
+    db.Column('group', db.String(64), nullable=True),
+    db.Column('spent', db.Integer, nullable=False),
+)
+
+# The days before `until` are rolled up as of the refresh
+rollup_refresh = db.Table(
+    'rollup_refresh',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('time', db.DateTime(timezone=True), nullable=False),
+    db.Column('until', db.Date, nullable=False),
+)
@@ -19,19 +19,29 @@ class StockChangeStatus(Enum):
 class StockChange(db.Model):
     """Represents the change in the amount of variety available."""
     __tablename__ = 'stock_changes'
+    __table_args__ = (
+        # Serve the purchase list and the purchases awaiting the admins, newest first
+        db.Index('stock_changes_purchases', 'time', postgresql_where=db.text('amount < 0')),
+        db.Index('stock_changes_for_review', 'time',
+                 postgresql_where=db.text("status IN ('pending', 'ready_for_pickup')")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Integer, nullable=False)
+    # The previous values are needed to update the variety stock counters
+    amount = db.column_property(db.Column(db.Integer, nullable=False), active_history=True)
     time = db.Column(db.DateTime(timezone=True), nullable=False, default=tz_aware_now)
-    status = db.Column(db.Enum(StockChangeStatus), nullable=False)
+    status = db.column_property(db.Column(db.Enum(StockChangeStatus), nullable=False),
+                                active_history=True)
     account_email = db.Column(db.String(128),
                               db.ForeignKey('accounts.email', ondelete='CASCADE'),
-                              nullable=False)
+                              nullable=False,
+                              index=True)
     account = db.relationship('Account',
                               back_populates='stock_changes')
     variety_id = db.Column(db.Integer,
                            db.ForeignKey('varieties.id', ondelete='CASCADE'),
-                           nullable=False)
+                           nullable=False,
+                           index=True)
     variety = db.relationship('Variety',
                               back_populates='stock_changes')
     transaction = db.relationship('Transaction',
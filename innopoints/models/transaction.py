@@ -14,16 +14,19 @@ class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     account_email = db.Column(db.String(128),
                               db.ForeignKey('accounts.email', ondelete='CASCADE'),
-                              nullable=False)
+                              nullable=False,
+                              index=True)
     account = db.relationship('Account', back_populates='transactions')
     change = db.Column(db.Integer, nullable=False)
     stock_change_id = db.Column(db.Integer,
                                 db.ForeignKey('stock_changes.id', ondelete='SET NULL'),
-                                nullable=True)
+                                nullable=True,
+                                index=True)
     stock_change = db.relationship('StockChange',
                                    back_populates='transaction')
     feedback_id = db.Column(db.Integer,
                             db.ForeignKey('feedback.application_id', ondelete='SET NULL'),
-                            nullable=True)
+                            nullable=True,
+                            index=True)
     feedback = db.relationship('Feedback',
                                back_populates='transaction')
@@ -1,7 +1,14 @@
-"""The Variety model."""
+"""The Variety model.
+
+Also contains the listeners that keep the stored stock counters in sync with the stock changes
+and the admin rights of the customers, and the color and size facets of the products in sync
+with their varieties."""
+
+from sqlalchemy import event
 
 from innopoints.extensions import db
 from innopoints.models.account import Account
+from innopoints.models.product import Product
 from innopoints.models.stock_change import StockChange, StockChangeStatus
 
 
@@ -45,28 +52,135 @@ class Variety(db.Model):
                                     cascade='all, delete-orphan',
                                     passive_deletes=True,
                                     back_populates='variety')
+    # Maintained by the StockChange and Account listeners below, verified by `flask reconcile-stock`
+    amount = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    purchases = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+def _stock_contribution(amount, status):
+    """Return the amount a stock change with the given status adds to the variety's stock."""
+    if status == StockChangeStatus.rejected:
+        return 0
+    return amount
+
+
+def _shift_stock(connection, stock_change, amount_diff, purchases_diff):
+    """Add the differences to the stored counters of the variety within the current transaction.
+    Purchases by administrators are not counted."""
+    if amount_diff == 0 and purchases_diff == 0:
+        return
+
+    varieties = Variety.__table__
+    accounts = Account.__table__
+    is_customer = (
+        db.select([db.not_(accounts.c.is_admin)])
+            .where(accounts.c.email == stock_change.account_email)
+            .scalar_subquery()
+    )
+    connection.execute(
+        varieties.update()
+            .where(varieties.c.id == stock_change.variety_id)
+            .values(amount=varieties.c.amount + amount_diff,
+                    purchases=varieties.c.purchases + db.case([(is_customer, purchases_diff)],
+                                                              else_=0))
+    )
+
+
+@event.listens_for(StockChange, 'after_insert')
+def add_stock_change(_mapper, connection, stock_change):
+    """Apply the amount of a new stock change to the variety counters."""
+    contribution = _stock_contribution(stock_change.amount, stock_change.status)
+    _shift_stock(connection, stock_change, contribution, -min(contribution, 0))
+
+
+@event.listens_for(StockChange, 'after_update')
+def update_stock_change(_mapper, connection, stock_change):
+    """Apply the difference caused by a status or amount change to the variety counters."""
+    state = db.inspect(stock_change)
+    amount_history = state.attrs.amount.history
+    status_history = state.attrs.status.history
+    if not amount_history.has_changes() and not status_history.has_changes():
+        return
+
+    old_amount = amount_history.deleted[0] if amount_history.deleted else stock_change.amount
+    old_status = status_history.deleted[0] if status_history.deleted else stock_change.status
+    old_contribution = _stock_contribution(old_amount, old_status)
+    new_contribution = _stock_contribution(stock_change.amount, stock_change.status)
+    _shift_stock(connection, stock_change,
+                 new_contribution - old_contribution,
+                 min(old_contribution, 0) - min(new_contribution, 0))
+
+
+@event.listens_for(StockChange, 'before_delete')
+def remove_stock_change(_mapper, connection, stock_change):
+    """Revert the amount of a deleted stock change from the variety counters."""
+    contribution = _stock_contribution(stock_change.amount, stock_change.status)
+    _shift_stock(connection, stock_change, -contribution, min(contribution, 0))
+
+
+@event.listens_for(Account, 'after_update')
+def recount_purchases(_mapper, connection, account):
+    """Recount the purchases of the varieties bought by the account if it gained
+    or lost the admin rights, the purchases by administrators are not counted."""
+    if not db.inspect(account).attrs.is_admin.history.has_changes():
+        return
+
+    varieties = Variety.__table__
+    stock_changes = StockChange.__table__
+    accounts = Account.__table__
+    purchases = (
+        db.select([db.func.coalesce(-db.func.sum(stock_changes.c.amount), 0)])
+            .select_from(stock_changes.join(accounts))
+            .where(stock_changes.c.variety_id == varieties.c.id)
+            .where(stock_changes.c.amount < 0)
+            .where(stock_changes.c.status != StockChangeStatus.rejected)
+            .where(db.not_(accounts.c.is_admin))
+            .scalar_subquery()
+    )
+    bought = (
+        db.select([stock_changes.c.variety_id])
+            .where(stock_changes.c.account_email == account.email)
+    )
+    connection.execute(
+        varieties.update()
+            .where(varieties.c.id.in_(bought))
+            .values(purchases=purchases)
+    )
+
+
+def _facet(column):
+    """Return the subquery collecting the distinct values of the column over the product's
+    varieties, with an empty string for NULL."""
+    varieties = Variety.__table__
+    values = db.func.array_agg(db.distinct(db.func.coalesce(column, '')))
+    return (
+        db.select([db.func.coalesce(values, db.text("'{}'"))])
+            .where(varieties.c.product_id == Product.__table__.c.id)
+            .scalar_subquery()
+    )
+
+
+def _refresh_facets(connection, product_id):
+    """Recollect the colors and sizes of the product within the current transaction."""
+    products = Product.__table__
+    varieties = Variety.__table__
+    connection.execute(
+        products.update()
+            .where(products.c.id == product_id)
+            .values(colors=_facet(varieties.c.color), sizes=_facet(varieties.c.size))
+    )
+
+
+@event.listens_for(Variety, 'after_insert')
+@event.listens_for(Variety, 'after_delete')
+def refresh_product_facets(_mapper, connection, variety):
+    """Recollect the facets of the product of a new or deleted variety."""
+    _refresh_facets(connection, variety.product_id)
+
 
-    @property
-    def amount(self):
-        """Return the amount of items of this variety, computed
-           from the StockChange instances."""
-        return db.session.query(
-            db.func.sum(StockChange.amount)
-        ).filter(
-            StockChange.variety_id == self.id,
-            StockChange.status != StockChangeStatus.rejected
-        ).scalar() or 0
-
-    @property
-    def purchases(self):
-        """Return the amount of purchases of this variety, computed
-           from the StockChange instances."""
-        # pylint: disable=invalid-unary-operand-type
-        return -(db.session.query(
-            db.func.sum(StockChange.amount)
-        ).join(StockChange.account).filter(
-            StockChange.variety_id == self.id,
-            StockChange.status != StockChangeStatus.rejected,
-            StockChange.amount < 0,
-            ~Account.is_admin
-        ).scalar() or 0)
+@event.listens_for(Variety, 'after_update')
+def refresh_updated_product_facets(_mapper, connection, variety):
+    """Recollect the facets of the product if the color or the size of a variety changed."""
+    state = db.inspect(variety)
+    if state.attrs.color.history.has_changes() or state.attrs.size.history.has_changes():
+        _refresh_facets(connection, variety.product_id)
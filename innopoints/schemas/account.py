@@ -18,7 +18,8 @@ class AccountSchema(ma.SQLAlchemyAutoSchema):
     def get_csrf_token(self, _account):
         return self.context.get('csrf_token')
 
-    balance = ma.Int()
+    balance = ma.Int(dump_only=True)
+    unread_notifications = ma.Int(dump_only=True)
     csrf_token = ma.Method(serialize='get_csrf_token', dump_only=True)
 
 
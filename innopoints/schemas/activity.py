@@ -3,7 +3,7 @@
 from marshmallow import validate, validates_schema, ValidationError, pre_load, post_dump
 
 from innopoints.extensions import ma
-from innopoints.models import Activity, Application, ApplicationStatus, Competence
+from innopoints.models import Activity, ApplicationStatus, Competence
 from .application import ApplicationSchema
 
 
@@ -22,6 +22,7 @@ class ActivitySchema(ma.SQLAlchemyAutoSchema):
         load_instance = True
         ordered = True
         include_relationships = True
+        exclude = ('accepted_applications',)
 
     @pre_load
     def unwrap_dates(self, data, **_kwargs):
@@ -67,14 +68,13 @@ class ActivitySchema(ma.SQLAlchemyAutoSchema):
         """Retrieve the applications for a particular activity.
            For non-moderators will only return the approved applications."""
         fields = ['id', 'applicant', 'status', 'application_time']
-        filtering = {'activity_id': activity.id,
-                     'status': ApplicationStatus.approved}
+        only_approved = True
 
         if 'user' not in self.context or not self.context['user'].is_authenticated:
             return None
 
         if self.context['user'] in activity.project.moderators or self.context['user'].is_admin:
-            filtering.pop('status')
+            only_approved = False
             fields.append('telegram_username')
             fields.append('comment')
             fields.append('actual_hours')
@@ -82,8 +82,9 @@ class ActivitySchema(ma.SQLAlchemyAutoSchema):
             fields.append('reports')
 
         appl_schema = ApplicationSchema(only=fields, many=True)
-        applications = Application.query.filter_by(**filtering)
-        return appl_schema.dump(applications.all())
+        applications = [application for application in activity.applications
+                        if not only_approved or application.status == ApplicationStatus.approved]
+        return appl_schema.dump(applications)
 
     def get_existing_application(self, activity):
         """Using the user information from the context, provide a shorthand
@@ -91,11 +92,9 @@ class ActivitySchema(ma.SQLAlchemyAutoSchema):
         appl_schema = ApplicationSchema(only=('id', 'telegram_username', 'comment',
                                               'actual_hours', 'status', 'feedback'))
         if 'user' in self.context and self.context['user'].is_authenticated:
-            application = Application.query.filter_by(applicant_email=self.context['user'].email,
-                                                      activity_id=activity.id).one_or_none()
-            if application is None:
-                return None
-            return appl_schema.dump(application)
+            for application in activity.applications:
+                if application.applicant_email == self.context['user'].email:
+                    return appl_schema.dump(application)
         return None
 
     working_hours = ma.Int(allow_none=True, validate=validate.Range(min=1))
@@ -3,18 +3,9 @@
 from marshmallow import pre_dump
 from marshmallow_enum import EnumField
 
+from innopoints.core.loading import hydrate_payloads
 from innopoints.extensions import ma
-from innopoints.models import (
-    Notification, NotificationType,
-    Project,
-    Activity,
-    Product,
-    Variety,
-    Account,
-    Application,
-    StockChange,
-    Transaction,
-)
+from innopoints.models import Notification, NotificationType
 
 
 # pylint: disable=missing-docstring
@@ -33,23 +24,7 @@ class PayloadSchema(ma.Schema):
 
     @pre_dump
     def fill_data(self, data, **_kwargs):
-        if 'project_id' in data:
-            data['project'] = Project.query.get(data.pop('project_id'))
-        if 'activity_id' in data:
-            data['activity'] = Activity.query.get(data.pop('activity_id'))
-        if 'product_id' in data:
-            data['product'] = Product.query.get(data.pop('product_id'))
-        if 'variety_id' in data:
-            data['variety'] = Variety.query.get(data.pop('variety_id'))
-        if 'account_email' in data:
-            data['account'] = Account.query.get(data.pop('account_email'))
-        if 'application_id' in data:
-            data['application'] = Application.query.get(data.pop('application_id'))
-        if 'stock_change_id' in data:
-            data['stock_change'] = StockChange.query.get(data.pop('stock_change_id'))
-        if 'transaction_id' in data:
-            data['transaction'] = Transaction.query.get(data.pop('transaction_id'))
-        return data
+        return hydrate_payloads([data])[0]
 
 
 class NotificationSchema(ma.SQLAlchemyAutoSchema):
@@ -57,5 +32,18 @@ class NotificationSchema(ma.SQLAlchemyAutoSchema):
         model = Notification
         load_instance = True
         include_relationships = True
+        exclude = ('deliveries',)
+
+    @pre_dump(pass_many=True)
+    def fill_payloads(self, data, many, **_kwargs):
+        """Load the instances referenced by all the payloads at once.
+        The filled copy is stored separately to keep the JSONB column unchanged."""
+        notifications = data if many else [data]
+        payloads = hydrate_payloads([notification.payload and notification.payload.copy()
+                                     for notification in notifications])
+        for notification, payload in zip(notifications, payloads):
+            notification.filled_payload = payload
+        return data
+
     type = EnumField(NotificationType)
-    payload = ma.Nested(PayloadSchema)
+    payload = ma.Nested(PayloadSchema, attribute='filled_payload')
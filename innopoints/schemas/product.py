@@ -14,6 +14,7 @@ class ProductSchema(ma.SQLAlchemyAutoSchema):
         load_instance = True
         ordered = True
         include_relationships = True
+        exclude = ('search_vector', 'colors', 'sizes')
 
     varieties = ma.Nested('VarietySchema', many=True, validate=validate.Length(min=1))
     name = ma.Str(validate=validate.Length(min=1, max=128))
@@ -15,18 +15,26 @@ class ProjectSchema(ma.SQLAlchemyAutoSchema):
         load_instance = True
         ordered = True
         include_relationships = True
+        exclude = ('search_vector',)
 
     name = ma.Str(allow_none=True,
                   validate=validate.Length(max=128),
                   error_messages={'validator_failed': 'The name must be below 128 characters.'})
     creator = ma.Nested('AccountSchema', only=('full_name', 'email'))
     image_id = ma.Int(allow_none=True)
+    image_variants = ma.Method(serialize='get_image_variants', dump_only=True)
     review_status = EnumField(ReviewStatus)
     lifetime_stage = EnumField(LifetimeStage)
     activities = ma.Nested('ActivitySchema', many=True)
     moderators = ma.Nested('AccountSchema', only=('full_name', 'email'), many=True)
-    start_date = ma.DateTime()
-    end_date = ma.DateTime()
+    start_date = ma.DateTime(dump_only=True)
+    end_date = ma.DateTime(dump_only=True)
+
+    def get_image_variants(self, project):
+        """Return the widths of the downscaled copies of the cover, see `GET /file/{id}`."""
+        if project.image is None:
+            return []
+        return project.image.variants or []
 
 
 class TagSchema(ma.SQLAlchemyAutoSchema):
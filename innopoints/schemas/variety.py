@@ -89,13 +89,14 @@ class VarietySchema(ma.SQLAlchemyAutoSchema):
 
     @post_dump
     def flatten_images(self, data, **_kwargs):
-        """Convert an array of image objects with order into a flat array of URL strings."""
+        """Convert an array of image objects with order into a flat array of URL strings.
+        The widths of their downscaled copies go to `image_variants` in the same order."""
         if 'images' not in data:
             return data
 
-        data['images'] = [image["image_id"]
-                          for image in sorted(data['images'],
-                                              key=lambda x: x['order'])]
+        images = sorted(data['images'], key=lambda x: x['order'])
+        data['images'] = [image["image_id"] for image in images]
+        data['image_variants'] = [image['variants'] for image in images]
         return data
 
     images = ma.Nested('ProductImageSchema', many=True)
@@ -174,3 +175,8 @@ class ProductImageSchema(ma.SQLAlchemyAutoSchema):
         ordered = True
         include_fk = True
         include_relationships = True
+
+    variants = ma.Method(serialize='get_variants', dump_only=True)
+
+    def get_variants(self, product_image):
+        return product_image.image.variants or []
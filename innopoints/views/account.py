@@ -23,15 +23,14 @@ Innopoints:
 """
 
 from datetime import datetime
+from enum import Enum
 import logging
 import sqlite3
-import math
 
 from flask import request, jsonify, session
 from flask_login import login_required, current_user
 from marshmallow import ValidationError
 from sqlalchemy import or_
-from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm.attributes import flag_modified
 from sqlalchemy.exc import IntegrityError
 from werkzeug.security import check_password_hash
@@ -40,21 +39,26 @@ from innopoints.blueprints import api
 from innopoints.core.helpers import abort, admin_required
 from innopoints.core.timezone import tz_aware_now, unix_epoch
 from innopoints.core.notifications import notify
+from innopoints.core.pagination import SortKey, paginate, paginate_by_keys
+from innopoints.core.search import TRIGRAM_LENGTH, escape_like
 from innopoints.extensions import db
 from innopoints.models import (
     Account,
+    AccountEvent,
+    AccountEventType,
     Activity,
     Application,
     ApplicationStatus,
+    cached_statistics,
     Competence,
     Feedback,
     feedback_competence,
     LifetimeStage,
-    Notification,
     NotificationType,
     Product,
     Project,
     StockChange,
+    store_statistics,
     Transaction,
     Variety,
     VolunteeringReport,
@@ -65,17 +69,73 @@ NO_PAYLOAD = ('', 204)
 log = logging.getLogger(__name__)
 
 
-def subquery_to_events(subquery, event_type):
-    """Take a subquery that has an 'entry_time' field and output a query
-    that packs the rest of the fields into a JSON payload and returns it with the time."""
-    # payload = db.func.row_to_json(query).cast(JSONB) - 'entry_time'
-    return db.session.query(
-        subquery.c.entry_time.label('entry_time'),
-        db.literal(event_type).label('type'),
-        (db.func.row_to_json(db.literal_column(subquery.name)).cast(JSONB) - 'entry_time').label('payload')
+# The fields of the timeline entry payloads by the event type
+TIMELINE_PAYLOADS = {
+    AccountEventType.application: ('application_id', 'application_status',
+                                   'activity_name', 'activity_id',
+                                   'project_name', 'project_id', 'project_stage',
+                                   'feedback_id', 'reward'),
+    AccountEventType.purchase: ('stock_change_id', 'stock_change_status',
+                                'product_id', 'product_name', 'product_type'),
+    AccountEventType.promotion: ('project_id', 'project_name', 'application_id'),
+    AccountEventType.project: ('project_id', 'project_name', 'review_status'),
+}
+
+
+def _timeline_query(user):
+    """Return the query of the timeline events of the user along with the current details
+    of the instances they reference, as needed for the entry payloads."""
+    moderation = db.aliased(Activity)
+    moderation_application = db.aliased(Application)
+    return (
+        db.session
+            .query(AccountEvent.entry_time,
+                   AccountEvent.type,
+                   AccountEvent.project_id,
+                   Project.name.label('project_name'),
+                   Project.lifetime_stage.label('project_stage'),
+                   Project.review_status,
+                   # the moderation application for promotions
+                   db.func.coalesce(AccountEvent.application_id,
+                                    moderation_application.id).label('application_id'),
+                   Application.status.label('application_status'),
+                   Activity.name.label('activity_name'),
+                   Activity.id.label('activity_id'),
+                   Feedback.application_id.label('feedback_id'),
+                   (Application.actual_hours * Activity.reward_rate).label('reward'),
+                   AccountEvent.stock_change_id,
+                   StockChange.status.label('stock_change_status'),
+                   Product.id.label('product_id'),
+                   Product.name.label('product_name'),
+                   Product.type.label('product_type'))
+            .filter(AccountEvent.account_email == user.email)
+            .outerjoin(Project, Project.id == AccountEvent.project_id)
+            .outerjoin(Application, Application.id == AccountEvent.application_id)
+            .outerjoin(Activity, Activity.id == Application.activity_id)
+            .outerjoin(Feedback, Feedback.application_id == Application.id)
+            .outerjoin(StockChange, StockChange.id == AccountEvent.stock_change_id)
+            .outerjoin(Variety, Variety.id == StockChange.variety_id)
+            .outerjoin(Product, Product.id == Variety.product_id)
+            .outerjoin(moderation,
+                       (AccountEvent.type == AccountEventType.promotion)
+                       & (moderation.project_id == AccountEvent.project_id)
+                       & moderation.internal
+                       & (moderation.name == '[[Moderation]]'))
+            .outerjoin(moderation_application,
+                       (moderation_application.activity_id == moderation.id)
+                       & (moderation_application.applicant_email == AccountEvent.account_email))
     )
 
 
+def _timeline_entry(row: dict) -> dict:
+    """Pack a row of the timeline query into an entry with the payload of its type."""
+    payload = {}
+    for field in TIMELINE_PAYLOADS[row['type']]:
+        value = row[field]
+        payload[field] = value.name if isinstance(value, Enum) else value
+    return {'entry_time': row['entry_time'], 'type': row['type'].name, 'payload': payload}
+
+
 @api.route('/account', defaults={'email': None})
 @api.route('/accounts/<email>')
 @login_required
@@ -113,41 +173,37 @@ def list_groups():
     return jsonify([row[0] for row in groups.all()])
 
 
+def _account_search(text):
+    """Return the condition matching the accounts by a part of the email or the name.
+    Texts too short for the trigram index only match the start of the email or of a name."""
+    escaped = escape_like(text)
+    if len(text) >= TRIGRAM_LENGTH:
+        return or_(Account.email.ilike(f'%{escaped}%'),
+                   Account.full_name.ilike(f'%{escaped}%'))
+    return or_(Account.email.ilike(f'{escaped}%'),
+               Account.full_name.ilike(f'{escaped}%'),
+               Account.full_name.ilike(f'% {escaped}%'))
+
+
 @api.route('/accounts')
 @login_required
 def list_users():
-    """List all user accounts on the website."""
-    default_page = 1
+    """List all user accounts on the website, paginated with either pages or cursors."""
     default_limit = 25
 
-    try:
-        limit = int(request.args.get('limit', default_limit))
-        page = int(request.args.get('page', default_page))
-    except ValueError:
-        abort(400, {'message': 'Bad query parameters.'})
-
     db_query = db.session.query(Account.email, Account.full_name)
-    count_query = db.session.query(db.func.count(Account.email))
-    if 'q' in request.args:
-        like_query = f'%{request.args["q"]}%'
-        db_query = db_query.filter(
-            or_(Account.email.ilike(like_query),
-                Account.full_name.ilike(like_query))
-        )
-        count_query = count_query.filter(
-            or_(Account.email.ilike(like_query),
-                Account.full_name.ilike(like_query))
-        )
-
-    if limit < 1 or page < 1:
-        abort(400, {'message': 'Limit and page number must be positive.'})
-
-    db_query = db_query.order_by(Account.email.asc())
-    db_query = db_query.offset(limit * (page - 1)).limit(limit)
-
+    keys = [SortKey(Account.email, str)]
+    search = request.args.get('q', '').strip()
+    if search:
+        db_query = db_query.filter(_account_search(search))
+        # Show the accounts whose email or name starts with the text first
+        prefix = f'{escape_like(search)}%'
+        starts_with = or_(Account.email.ilike(prefix), Account.full_name.ilike(prefix))
+        keys.insert(0, SortKey(db.case([(starts_with, 0)], else_=1), int))
+
+    accounts, pagination = paginate(db_query, keys, default_limit)
     schema = AccountSchema(many=True, only=('email', 'full_name'))
-    return jsonify(pages=math.ceil(count_query.scalar() / limit),
-                   data=schema.dump(db_query.all()))
+    return jsonify(data=schema.dump(accounts), **pagination)
 
 
 @api.route('/accounts/<string:email>/balance', methods=['PATCH'])
@@ -180,8 +236,13 @@ def change_balance(email):
 @api.route('/accounts/<email>/timeline')
 @login_required
 def get_timeline(email):
-    """Get the timeline of the account.
-    If the e-mail is not passed, return own timeline."""
+    """Get the timeline of the account, newest first.
+    If the e-mail is not passed, return own timeline.
+
+    If either `limit` or `cursor` is given, returns a page of the entries
+    along with the cursor for the next page (null on the last page).
+    Otherwise, returns all of the entries in the date range."""
+    default_limit = 20
     if email is None:
         user = current_user
     else:
@@ -211,146 +272,40 @@ def get_timeline(email):
     else:
         end_date = tz_aware_now()
 
-    # pylint: disable=invalid-unary-operand-type
-
-    applications = (
-        db.session
-            .query(Application.id.label('application_id'),
-                   Application.status.label('application_status'))
-            .add_columns(Application.application_time.label('entry_time'))
-            .filter(Application.applicant == user)
-            .join(Application.activity)
-            .add_columns(Activity.name.label('activity_name'),
-                         Activity.id.label('activity_id'))
-            .filter(~Activity.internal)
-            .join(Activity.project)
-            .add_columns(Project.name.label('project_name'),
-                         Project.id.label('project_id'),
-                         Project.lifetime_stage.label('project_stage'))
-            .outerjoin(Application.feedback)
-            .add_columns(Feedback.application_id.label('feedback_id'),
-                         (Application.actual_hours * Activity.reward_rate).label('reward'))
-    )
-
-    purchases = (
-        db.session
-            .query(StockChange.id.label('stock_change_id'),
-                   StockChange.status.label('stock_change_status'),
-                   StockChange.time.label('entry_time'))
-            .filter(StockChange.account == user)
-            .filter(StockChange.amount < 0)
-            .join(StockChange.variety).join(Variety.product)
-            .add_columns(Product.id.label('product_id'),
-                         Product.name.label('product_name'),
-                         Product.type.label('product_type'))
-    )
-
-    promotions = (
-        # pylint: disable=unsubscriptable-object
-        db.session
-            .query(Notification.payload['project_id'].label('project_id'),
-                   Notification.timestamp.label('entry_time'))
-            .filter(Notification.recipient == user,
-                    Notification.type == NotificationType.added_as_moderator)
-            .join(Project,
-                  Project.id == Notification.payload.op('->>')('project_id').cast(db.Integer))
-            .filter(Project.creator != user, Project.lifetime_stage != LifetimeStage.draft)
-            .add_columns(Project.name.label('project_name'))
-            .outerjoin(Project.activities.and_(Activity.internal,
-                                               Activity.name == '[[Moderation]]'))
-            .outerjoin(Activity.applications.and_(Application.applicant == user))
-            .add_columns(Application.id.label('application_id'))
-    )
-
-    projects = (
-        db.session
-            .query(Project.id.label('project_id'),
-                   Project.name.label('project_name'),
-                   Project.review_status,
-                   Project.creation_time.label('entry_time'))
-            .filter(Project.creator == user,
-                    Project.lifetime_stage != LifetimeStage.draft)
-    )
-
-    timeline = subquery_to_events(
-        applications.filter(Application.application_time >= start_date,
-                            Application.application_time <= end_date).subquery('application_events'),
-        'application',
-    ).union(
-        subquery_to_events(
-            purchases.filter(StockChange.time >= start_date,
-                             StockChange.time <= end_date).subquery('purchase_events'),
-            'purchase'
-        ),
-        subquery_to_events(
-            promotions.filter(Notification.timestamp >= start_date,
-                              Notification.timestamp <= end_date).subquery('promotion_events'),
-            'promotion'
-        ),
-        subquery_to_events(
-            projects.filter(Project.creation_time >= start_date,
-                            Project.creation_time <= end_date).subquery('project_events'),
-            'project'
-        )
-    ).subquery()
-    ordered_timeline = db.session.query(timeline).order_by(timeline.c.entry_time.desc())
-
-    leftover_applications = db.session.query(
-        applications.filter(Application.application_time <= start_date).exists()
-    ).scalar()
-    leftover_purchases = db.session.query(
-        purchases.filter(StockChange.time <= start_date).exists()
-    ).scalar()
-    leftover_promotions = db.session.query(
-        promotions.filter(Notification.timestamp <= start_date).exists()
-    ).scalar()
-    leftover_projects = db.session.query(
-        projects.filter(Project.creation_time <= start_date).exists()
-    ).scalar()
-
-    out_schema = TimelineSchema(many=True)
-    return jsonify(data=out_schema.dump(ordered_timeline.all()),
-                   more=any((leftover_applications,
-                             leftover_purchases,
-                             leftover_promotions,
-                             leftover_projects)))
-
+    timeline = _timeline_query(user).filter(AccountEvent.entry_time >= start_date,
+                                            AccountEvent.entry_time <= end_date)
+    keys = [SortKey(AccountEvent.entry_time, datetime, descending=True),
+            SortKey(AccountEvent.id, int, descending=True)]
 
-@api.route('/account/statistics', defaults={'email': None})
-@api.route('/accounts/<email>/statistics')
-@login_required
-def get_statistics(email):
-    """Get the statistics of the account.
-    If the e-mail is not passed, return own statistics."""
-    if email is None:
-        user = current_user
+    next_cursor = None
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        timeline = timeline.order_by(AccountEvent.entry_time.desc(), AccountEvent.id.desc())
+        rows = [row._asdict() for row in timeline]  # pylint: disable=protected-access
     else:
-        if not current_user.is_admin and email != current_user.email:
-            abort(401)
-        user = Account.query.get_or_404(email)
-
-    if 'start_date' in request.args:
         try:
-            start_date = datetime.fromisoformat(request.args['start_date'])
+            limit = int(request.args.get('limit', default_limit))
+            if limit < 1:
+                abort(400, {'message': 'Limit must be positive.'})
+            rows, next_cursor = paginate_by_keys(timeline, keys, request.args.get('cursor'), limit)
         except ValueError:
-            abort(400, {'message': 'The datetime must be in ISO format with timezone.'})
-
-        if start_date.tzinfo is None:
-            abort(400, {'message': 'The timezone must be passed.'})
-    else:
-        start_date = unix_epoch
+            abort(400, {'message': 'Bad query parameters.'})
+
+    # older entries are outside of the requested range
+    more = next_cursor is not None or db.session.query(
+        AccountEvent.query
+            .filter(AccountEvent.account_email == user.email,
+                    AccountEvent.entry_time < start_date)
+            .exists()
+    ).scalar()
 
-    if 'end_date' in request.args:
-        try:
-            end_date = datetime.fromisoformat(request.args['end_date'])
-        except ValueError:
-            abort(400, {'message': 'The datetime must be in ISO format with timezone.'})
+    out_schema = TimelineSchema(many=True)
+    return jsonify(data=out_schema.dump(map(_timeline_entry, rows)),
+                   more=more,
+                   next_cursor=next_cursor)
 
-        if end_date.tzinfo is None:
-            abort(400, {'message': 'The timezone must be passed.'})
-    else:
-        end_date = tz_aware_now()
 
+def _account_statistics(user, start_date, end_date) -> dict:
+    """Compute the statistics of the account on the applications placed within the period."""
     volunteering = (
         # pylint: disable=invalid-unary-operand-type
         db.session.query(db.func.sum(Application.actual_hours),
@@ -388,11 +343,67 @@ def get_statistics(email):
             .group_by(Competence.name)
     ).all()
 
-    return jsonify(hours=volunteering[0] or 0,
-                   positions=volunteering[1],
-                   rating=float(rating or 0),
-                   competences=[dict(zip(('amount', 'id', 'name'), competence))
-                                for competence in competences])
+    return {
+        'hours': volunteering[0] or 0,
+        'positions': volunteering[1],
+        'rating': float(rating or 0),
+        'competences': [dict(zip(('amount', 'id', 'name'), competence))
+                        for competence in competences],
+    }
+
+
+@api.route('/account/statistics', defaults={'email': None})
+@api.route('/accounts/<email>/statistics')
+@login_required
+def get_statistics(email):
+    """Get the statistics of the account.
+    If the e-mail is not passed, return own statistics.
+    The all-time statistics are cached until the data they are computed from changes."""
+    if email is None:
+        user = current_user
+    else:
+        if not current_user.is_admin and email != current_user.email:
+            abort(401)
+        user = Account.query.get_or_404(email)
+
+    all_time = 'start_date' not in request.args and 'end_date' not in request.args
+    if all_time:
+        version, statistics = cached_statistics(user.email)
+        if statistics is not None:
+            return jsonify(**statistics)
+
+    if 'start_date' in request.args:
+        try:
+            start_date = datetime.fromisoformat(request.args['start_date'])
+        except ValueError:
+            abort(400, {'message': 'The datetime must be in ISO format with timezone.'})
+
+        if start_date.tzinfo is None:
+            abort(400, {'message': 'The timezone must be passed.'})
+    else:
+        start_date = unix_epoch
+
+    if 'end_date' in request.args:
+        try:
+            end_date = datetime.fromisoformat(request.args['end_date'])
+        except ValueError:
+            abort(400, {'message': 'The datetime must be in ISO format with timezone.'})
+
+        if end_date.tzinfo is None:
+            abort(400, {'message': 'The timezone must be passed.'})
+    else:
+        end_date = tz_aware_now()
+
+    statistics = _account_statistics(user, start_date, end_date)
+    if all_time:
+        store_statistics(user.email, version, statistics)
+        try:
+            db.session.commit()
+        except IntegrityError as err:
+            db.session.rollback()
+            log.exception(err)
+
+    return jsonify(**statistics)
 
 
 @api.route('/account/notification_settings', defaults={'email': None})
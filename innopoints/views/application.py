@@ -25,7 +25,7 @@ from sqlalchemy.exc import IntegrityError
 
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort
-from innopoints.core.notifications import notify, notify_all, remove_notifications
+from innopoints.core.notifications import broadcast, notify, remove_notifications
 from innopoints.core.timezone import tz_aware_now
 from innopoints.extensions import db
 from innopoints.models import (
@@ -414,7 +414,7 @@ def leave_feedback(project_id, activity_id, application_id):
     notification = Notification.query.filter(
         Notification.recipient_email == current_user.email,
         Notification.type == NotificationType.claim_innopoints,
-        Notification.payload.op('->>')('application_id').cast(db.Integer) == application_id,
+        Notification.payload.contains({'application_id': application_id}),
     ).one_or_none()
 
     if notification is not None:
@@ -432,9 +432,9 @@ def leave_feedback(project_id, activity_id, application_id):
                           for application in activity.applications
                           if not activity.internal)
     if all_feedback_in:
-        admins = Account.query.filter_by(is_admin=True).all()
-        mods = {*project.moderators, *admins}
-        notify_all(mods, NotificationType.all_feedback_in, {
+        moderator_emails = [moderator.email for moderator in project.moderators]
+        recipients = Account.is_admin | Account.email.in_(moderator_emails)
+        broadcast(recipients, NotificationType.all_feedback_in, {
             'project_id': project.id,
         })
 
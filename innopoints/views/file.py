@@ -2,7 +2,9 @@
 
 StaticFile:
 - POST /file
-- GET /file/{file_id}
+- GET /file/{file_id}?width={width}
+- GET /file/{file_id}/status
+- GET /file/cache
 - DELETE /file/{file_id}
 """
 
@@ -11,17 +13,25 @@ import mimetypes
 
 import requests
 import werkzeug
-from flask import jsonify, request, current_app
+from flask import jsonify, redirect, request, current_app
 from flask_login import login_required, current_user
-from PIL import Image
 from sqlalchemy.exc import IntegrityError
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import wrap_file
 
 from innopoints.blueprints import api
-from innopoints.core.file_manager import file_manager
-from innopoints.core.helpers import abort, allow_no_json
-from innopoints.core.image import crop, shrink
+from innopoints.core.file_cache import get_file_cache, CachedFile, DETAILS_SIZE
+from innopoints.core.file_manager import file_manager, upload_handle, variant_handle
+from innopoints.core.helpers import abort, admin_required, allow_no_json
+from innopoints.core.image import (
+    check_crop,
+    open_image,
+    parse_crop,
+    InvalidImage,
+    VARIANT_WIDTHS,
+)
 from innopoints.extensions import db
-from innopoints.models import StaticFile
+from innopoints.models import FileStatus, StaticFile
 
 
 ALLOWED_MIMETYPES = {'image/jpeg', 'image/png', 'image/webp'}
@@ -41,7 +51,9 @@ def get_mimetype(file: werkzeug.datastructures.FileStorage) -> str:
 @api.route('/file', methods=['POST'])
 @login_required
 def upload_file():
-    """Upload a file."""
+    """Upload a file.
+    Only the header of the image is read, the image is processed by the
+    `flask process-images` worker and can be retrieved once the status is 'ready'."""
     if 'file' not in request.files:
         abort(400, {'message': 'No file attached.'})
 
@@ -54,38 +66,132 @@ def upload_file():
     if mimetype not in ALLOWED_MIMETYPES:
         abort(400, {'message': f'Mimetype "{mimetype}" is not allowed.'})
 
-    image = shrink(
-        crop(
-            Image.open(file.stream),
-            request.form
-        )
-    )
-
-    new_file = StaticFile(mimetype='image/webp', owner=current_user)
+    dimensions = parse_crop(request.form)
+    try:
+        image = open_image(file.stream)
+        if dimensions is not None:
+            check_crop(image, dimensions)
+    except InvalidImage as err:
+        abort(400, {'message': str(err)})
+    file.stream.seek(0)
+
+    new_file = StaticFile(mimetype='image/webp',
+                          owner=current_user,
+                          status=FileStatus.processing,
+                          crop=dimensions)
     db.session.add(new_file)
-    db.session.commit()
+    db.session.flush()
     try:
-        file_manager.store(image, str(new_file.id))
+        file_manager.store(file, upload_handle(str(new_file.id)))
     except (OSError, requests.exceptions.HTTPError) as err:
+        db.session.rollback()
         log.exception(err)
-        db.session.delete(new_file)
-        db.session.commit()
         abort(400, {'message': 'Upload failed.'})
-    return jsonify(id=new_file.id, url=f'/file/{new_file.id}')
+    db.session.commit()
+    return jsonify(id=new_file.id, url=f'/file/{new_file.id}', status=new_file.status.name)
 
 
 @api.route('/file/<int:file_id>')
 def retrieve_file(file_id):
-    """Get the chosen static file."""
+    """Get the chosen static file.
+    If the width is given, the narrowest downscaled copy at least that wide is served,
+    or the file itself if there are none.
+    The files are never changed and their IDs are never reused, so the responses
+    are cached for good and the conditional requests are answered without reading the file.
+    The small files are kept in the memory of the worker (see `innopoints.core.file_cache`),
+    of the large ones only the size and the modification time are.
+    If the storage serves the files itself, the client is redirected there."""
+    cache = get_file_cache()
+    cached_file = cache.get(('file', file_id))
+    if cached_file is None:
+        file = StaticFile.query.get_or_404(file_id)
+        if file.status == FileStatus.processing:
+            abort(409, {'message': 'The file is still being processed.'})
+        if file.status == FileStatus.failed:
+            abort(404, {'message': 'The file could not be processed.'})
+        cached_file = CachedFile(mimetype=file.mimetype, variants=tuple(file.variants or ()))
+        cache.put(('file', file_id), cached_file, DETAILS_SIZE)
+
+    handle = str(file_id)
+    width = request.args.get('width', type=int)
+    if width is not None:
+        wide_enough = [variant for variant in cached_file.variants if variant >= width]
+        if wide_enough:
+            handle = variant_handle(handle, min(wide_enough))
+
+    url = file_manager.url(handle, cached_file.mimetype)
+    if url is not None:
+        response = redirect(url)
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['FILE_REDIRECT_MAX_AGE']
+        return response
+
+    max_file_size = current_app.config['FILE_MEMORY_CACHE_MAX_FILE_SIZE']
+    content = cache.get(('content', handle))
+    if content is not None:
+        data, info = content
+    else:
+        data = None
+        try:
+            info = file_manager.info(handle)
+        except FileNotFoundError:
+            abort(404)
+        if info.size > max_file_size:
+            # only the details of a large file are cached, the file is streamed from the storage
+            cache.put(('content', handle), (None, info), DETAILS_SIZE)
+
+    response = current_app.response_class(mimetype=cached_file.mimetype)
+    response.set_etag(handle)
+    response.last_modified = info.modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['FILE_CACHE_MAX_AGE']
+    response.cache_control.immutable = True
+    # Werkzeug compares the naive UTC datetimes
+    if not is_resource_modified(request.environ,
+                                etag=handle,
+                                last_modified=info.modified.replace(tzinfo=None)):
+        return response.make_conditional(request)
+
+    if data is None and info.size <= max_file_size:
+        try:
+            data = file_manager.retrieve(handle)
+        except FileNotFoundError:
+            abort(404)
+        cache.put(('content', handle), (data, info), len(data))
+
+    if data is not None:
+        response.set_data(data)
+    else:
+        try:
+            stream = file_manager.open(handle)
+        except FileNotFoundError:
+            abort(404)
+        response.response = wrap_file(request.environ, stream)
+        response.direct_passthrough = True
+        response.content_length = info.size
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response.make_conditional(request, accept_ranges=True, complete_length=info.size)
+
+
+@api.route('/file/cache')
+@admin_required
+def get_file_cache_stats():
+    """Get the hit and miss counters and the size of the file cache of this worker process."""
+    return jsonify(get_file_cache().stats)
+
+
+@api.route('/file/<int:file_id>/status')
+def get_file_status(file_id):
+    """Get the processing status of the chosen static file: 'processing', 'ready' or 'failed'."""
     file = StaticFile.query.get_or_404(file_id)
+    return jsonify(id=file.id, url=f'/file/{file.id}', status=file.status.name)
+
+
+def _delete_quietly(handle: str):
     try:
-        file_data = file_manager.retrieve(str(file.id))
+        file_manager.delete(handle)
     except FileNotFoundError:
-        abort(404)
-
-    response = current_app.make_response(file_data)
-    response.headers.set('Content-Type', file.mimetype)
-    return response
+        pass
 
 
 @api.route('/file/<int:file_id>', methods=['DELETE'])
@@ -96,10 +202,18 @@ def delete_file(file_id):
     if file.owner != current_user:
         abort(401)
 
-    try:
-        file_manager.delete(str(file_id))
-    except FileNotFoundError:
-        abort(404, 'File not found on storage')
+    status = file.status
+    if status == FileStatus.ready:
+        try:
+            file_manager.delete(str(file_id))
+        except FileNotFoundError:
+            abort(404, 'File not found on storage')
+
+        for width in file.variants or ():
+            try:
+                file_manager.delete(variant_handle(str(file_id), width))
+            except FileNotFoundError:
+                log.warning(f'The {width}px copy of the file {file_id} is missing')
 
     db.session.delete(file)
     try:
@@ -109,4 +223,17 @@ def delete_file(file_id):
         log.exception(err)
         abort(400, {'message': 'Data integrity violated.'})
 
+    if status != FileStatus.ready:
+        # the worker may have stored the image while the deletion waited for it
+        _delete_quietly(upload_handle(str(file_id)))
+        _delete_quietly(str(file_id))
+        for width in VARIANT_WIDTHS:
+            _delete_quietly(variant_handle(str(file_id), width))
+
+    cache = get_file_cache()
+    cache.discard(('file', file_id))
+    cache.discard(('content', str(file_id)))
+    for width in VARIANT_WIDTHS:
+        cache.discard(('content', variant_handle(str(file_id), width)))
+
     return NO_PAYLOAD
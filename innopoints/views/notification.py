@@ -1,21 +1,30 @@
 """Views related to notifications.
 
 - GET   /notifications
+- GET   /notifications/unread_count
 - POST  /notifications/subscribe
+- POST  /notifications/unsubscribe
+- PATCH /notifications/read
 - PATCH /notifications/{notification_id}/read
 """
 
 import logging
+from datetime import datetime
 
-from flask import request
+from flask import request, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy.exc import IntegrityError
 
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort, allow_no_json
-from innopoints.core.notifications.push import subscribe as subscribe_to_push
-from innopoints.extensions import db, push
-from innopoints.models import Notification
+from innopoints.core.notifications.push import (
+    push_to,
+    subscribe as subscribe_to_push,
+    unsubscribe as unsubscribe_from_push,
+)
+from innopoints.core.pagination import encode_cursor, decode_cursor
+from innopoints.extensions import db
+from innopoints.models import Account, Notification
 from innopoints.schemas import NotificationSchema
 
 NO_PAYLOAD = ('', 204)
@@ -25,15 +34,52 @@ log = logging.getLogger(__name__)
 @api.route('/notifications')
 @login_required
 def get_notifications():
-    """Gets all notifications of the current user."""
+    """Gets the notifications of the current user, newest first.
+
+    If either `limit` or `cursor` is given, returns a page of notifications
+    along with the cursor for the next page (null on the last page).
+    Otherwise, returns all of the notifications."""
+    default_limit = 20
+
     query = (
         Notification.query
             .filter_by(recipient_email=current_user.email)
-            .order_by(Notification.timestamp.desc())
+            .order_by(Notification.timestamp.desc(), Notification.id.desc())
     )
     if 'unread' in request.args:
         query = query.filter_by(is_read=False)
-    return NotificationSchema(many=True).jsonify(query.all())
+
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return NotificationSchema(many=True).jsonify(query.all())
+
+    try:
+        limit = int(request.args.get('limit', default_limit))
+        if 'cursor' in request.args:
+            timestamp, notification_id = decode_cursor(request.args['cursor'], (datetime, int))
+            query = query.filter(db.tuple_(Notification.timestamp, Notification.id)
+                                 < db.tuple_(timestamp, notification_id))
+    except ValueError:
+        abort(400, {'message': 'Bad query parameters.'})
+
+    if limit < 1:
+        abort(400, {'message': 'Limit must be positive.'})
+
+    # fetch one extra notification to know whether there is a next page
+    notifications = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        next_cursor = encode_cursor(notifications[-1].timestamp, notifications[-1].id)
+
+    return jsonify(data=NotificationSchema(many=True).dump(notifications),
+                   next_cursor=next_cursor)
+
+
+@api.route('/notifications/unread_count')
+@login_required
+def count_unread_notifications():
+    """Gets the number of unread notifications of the current user."""
+    return jsonify(current_user.unread_notifications)
 
 
 @api.route('/notifications/subscribe', methods=['POST'])
@@ -55,11 +101,57 @@ def subscribe():
     except IntegrityError:
         abort(400, {'message': 'Data integrity violated.'})
 
-    push.send(new_subscription, {
+    error = push_to(new_subscription, {
         'title': 'Test Run',
         'body': 'This is how you\'ll see our notifications!',
     })
+    if error is not None:
+        log.warning(f'Failed to send the test push notification: {error!r}')
+
+    return NO_PAYLOAD
+
 
+@allow_no_json
+@api.route('/notifications/unsubscribe', methods=['POST'])
+@login_required
+def unsubscribe():
+    """Removes the user's subscription to push notifications with the given endpoint.
+    If no endpoint is given, removes all of the user's subscriptions."""
+    endpoint = (request.get_json(silent=True) or {}).get('endpoint')
+    if endpoint is not None and not isinstance(endpoint, str):
+        abort(400, {'message': 'The endpoint must be a string.'})
+
+    try:
+        unsubscribe_from_push(current_user, endpoint)
+    except IntegrityError:
+        abort(400, {'message': 'Data integrity violated.'})
+
+    return NO_PAYLOAD
+
+
+@allow_no_json
+@api.route('/notifications/read', methods=['PATCH'])
+@login_required
+def read_all_notifications():
+    """Marks all notifications of the current user as read.
+    If `until` is given in the body, only marks the notification with that ID and the older ones,
+    so that the notifications that arrived after the user has seen the feed stay unread."""
+    query = Notification.query.filter_by(recipient_email=current_user.email, is_read=False)
+
+    until = (request.get_json(silent=True) or {}).get('until')
+    if until is not None:
+        if not isinstance(until, int):
+            abort(400, {'message': 'The notification ID must be an integer.'})
+        last_seen = Notification.query.get_or_404(until)
+        if last_seen.recipient_email != current_user.email:
+            abort(401)
+        query = query.filter(db.tuple_(Notification.timestamp, Notification.id)
+                             <= db.tuple_(last_seen.timestamp, last_seen.id))
+
+    # the bulk update bypasses the Notification listeners, so the counter is updated here
+    marked = query.update({Notification.is_read: True}, synchronize_session=False)
+    current_user.unread_notifications = Account.unread_notifications - marked
+    db.session.commit()
     return NO_PAYLOAD
 
 
@@ -10,27 +10,26 @@ Product:
 
 import json
 import logging
-import math
-from datetime import date
+from datetime import date, datetime
 
 from flask import request, jsonify
 from flask.views import MethodView
 from flask_login import current_user
 from marshmallow import ValidationError
-from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError
 
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort, admin_required
-from innopoints.core.notifications import notify_all, remove_notifications
+from innopoints.core.loading import product_loading
+from innopoints.core.notifications import broadcast, remove_notifications
+from innopoints.core.pagination import SortKey, paginate
+from innopoints.core.search import matches, prefix_tsquery, rank
 from innopoints.extensions import db
 from innopoints.models import (
     Account,
     Notification,
     NotificationType,
     Product,
-    StockChange,
-    StockChangeStatus,
     Variety,
 )
 from innopoints.schemas import ProductSchema
@@ -39,39 +38,67 @@ NO_PAYLOAD = ('', 204)
 log = logging.getLogger(__name__)
 
 
+def _facet_counts(db_query):
+    """Count the filtered products and the products of each color and size in one statement."""
+    filtered = db_query.with_entities(Product.colors, Product.sizes).cte('filtered')
+
+    def count_values(facet, column):
+        values = db.select([db.func.unnest(column).label('value')]).subquery()
+        return (
+            db.select([db.literal(facet).label('facet'), values.c.value, db.func.count()])
+                .group_by(values.c.value)
+        )
+
+    total = db.select([db.literal('total'), db.literal(None, db.String), db.func.count()])
+    facets = {'total': 0, 'colors': [], 'sizes': []}
+    for facet, value, count in db.session.execute(
+            db.union_all(total.select_from(filtered),
+                         count_values('colors', filtered.c.colors),
+                         count_values('sizes', filtered.c.sizes))):
+        if facet == 'total':
+            facets['total'] = count
+        else:
+            facets[facet].append({'value': value or None, 'count': count})
+
+    for facet in ('colors', 'sizes'):
+        facets[facet].sort(key=lambda item: (item['value'] is None, item['value']))
+    for color in facets['colors']:
+        if color['value'] is not None:
+            color['value'] = '#' + color['value']
+    return facets
+
+
+def _facet_values(values):
+    """Convert the excluded facet values from the query to the stored ones."""
+    return ['' if value == '\x00' else value.lstrip('#') for value in values]
+
+
 @api.route('/products')
 def list_products():
-    """List products available in InnoStore."""
-    # pylint: disable=invalid-unary-operand-type
-    purchases = (
-        db.session.query(StockChange.variety_id,
-                         db.func.sum(StockChange.amount).label('variety_purchases'))
-            .join(StockChange.account)
-            .filter(StockChange.amount < 0,
-                    StockChange.status != StockChangeStatus.rejected,
-                    ~Account.is_admin)
-            .group_by(StockChange.variety_id).subquery()
-    )
-    color_array = db.func.ARRAY_AGG(Variety.color)
+    """List products available in InnoStore, along with the facets of the filtered products.
+    The products are paginated with either pages or cursors."""
+    search_query = prefix_tsquery(request.args.get('q'))
     default_limit = 24
-    default_page = 1
-    default_order_by = 'addition_time'
+    default_order_by = 'addition_time' if search_query is None else 'relevance'
     default_order = 'desc'
-    ordering = {
-        ('addition_time', 'asc'): Product.addition_time.asc(),
-        ('addition_time', 'desc'): Product.addition_time.desc(),
-        ('price', 'asc'): Product.price.asc(),
-        ('price', 'desc'): Product.price.desc(),
-        ('purchases', 'asc'): db.nullsfirst(db.asc(-db.func.sum(purchases.c.variety_purchases))),
-        ('purchases', 'desc'): db.nullslast(db.desc(-db.func.sum(purchases.c.variety_purchases))),
+    purchases = (
+        db.select([db.func.coalesce(db.func.sum(Variety.purchases), 0)])
+            .where(Variety.product_id == Product.id)
+            .scalar_subquery()
+    )
+    sort_keys = {
+        'addition_time': (Product.addition_time, datetime),
+        'price': (Product.price, int),
+        'purchases': (purchases, int),
     }
+    if search_query is not None:
+        sort_keys['relevance'] = (rank(Product.search_vector, search_query), float)
 
     try:
-        limit = int(request.args.get('limit', default_limit))
-        page = int(request.args.get('page', default_page))
         order_by = request.args.get('order_by', default_order_by)
         order = request.args.get('order', default_order)
         excluded_colors = request.args.getlist('excluded_colors', type=str)
+        excluded_sizes = request.args.getlist('excluded_sizes', type=str)
         min_price = request.args.get('min_price', 0, int)
         max_price = request.args.get('max_price', type=int)
     except ValueError:
@@ -84,56 +111,35 @@ def list_products():
         all(item is None or isinstance(item, str) for item in excluded_colors):
         abort(400, {'message': 'Excluded colors has to be an array of strings and possibly null.'})
 
-    if limit < 1 or page < 1:
-        abort(400, {'message': 'Limit and page number must be positive.'})
-
-    if (order_by, order) not in ordering:
+    if order_by not in sort_keys or order not in ('asc', 'desc') \
+            or (order_by == 'relevance' and order != 'desc'):
         abort(400, {'message': 'Invalid ordering specified.'})
 
     db_query = Product.query
-    if 'q' in request.args:
-        like_query = f'%{request.args["q"]}%'
-        or_condition = or_(Product.name.ilike(like_query),
-                           Product.type.ilike(like_query),
-                           Product.description.ilike(like_query))
-        db_query = db_query.filter(or_condition).distinct()
+    if search_query is not None:
+        db_query = db_query.filter(matches(Product.search_vector, search_query))
 
+    # A product is shown if at least one of its varieties is not excluded
     if excluded_colors:
-        db_query = db_query.join(Product.varieties)
-        if '\x00' in excluded_colors:
-            db_query = db_query.filter(Variety.color.isnot(None))
-            excluded_colors.remove('\x00')
-        excluded_colors = [color.lstrip('#') for color in excluded_colors]
-        db_query = (
-            db_query.group_by(Product)
-                .having(~(color_array.cast(db.ARRAY(db.Text)).op('<@')(excluded_colors)))
-        )
+        db_query = db_query.filter(~Product.colors.contained_by(_facet_values(excluded_colors)))
+    if excluded_sizes:
+        db_query = db_query.filter(~Product.sizes.contained_by(_facet_values(excluded_sizes)))
 
     if min_price > 0:
         db_query = db_query.filter(Product.price >= min_price)
     if max_price is not None:
         db_query = db_query.filter(Product.price <= max_price)
 
-    count = db.session.query(db_query.subquery()).count()
-    if order_by == 'purchases':
-        if excluded_colors:
-            abort(400, {'message': 'Ordering by purchases is not allowed when filtering.'})
-        db_query = (
-            db_query.join(Product.varieties)
-                .outerjoin(purchases,
-                           Variety.id == purchases.c.variety_id)
-                .group_by(Product)
-        )
-
-    db_query = db_query.order_by(ordering[order_by, order])
-    db_query = db_query.offset(limit * (page - 1)).limit(limit)
+    facets = _facet_counts(db_query)
+    keys = [SortKey(*sort_keys[order_by], descending=order == 'desc'), SortKey(Product.id, int)]
+    products, pagination = paginate(db_query.options(*product_loading()), keys, default_limit,
+                                    total=facets.pop('total'))
 
     schema = ProductSchema(many=True, exclude=('description',
                                                'varieties.stock_changes',
                                                'varieties.product',
                                                'varieties.product_id'))
-    return jsonify(pages=math.ceil(count / limit),
-                   data=schema.dump(db_query.all()))
+    return jsonify(data=schema.dump(products), facets=facets, **pagination)
 
 
 @api.route('/products', methods=['POST'])
@@ -178,8 +184,7 @@ def create_product():
         Notification.timestamp >= date.today()
     ).exists()
     if not db.session.query(already_sent).scalar():
-        users = Account.query.filter_by(is_admin=False).all()
-        notify_all(users, NotificationType.new_arrivals)
+        broadcast(~Account.is_admin, NotificationType.new_arrivals)
 
     out_schema = ProductSchema(exclude=('varieties.product_id',
                                         'varieties.product',
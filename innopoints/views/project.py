@@ -24,7 +24,6 @@ Project:
 from datetime import datetime
 import json
 import logging
-import math
 
 from flask import request, jsonify
 from flask.views import MethodView
@@ -35,7 +34,10 @@ from sqlalchemy.exc import IntegrityError
 
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort, allow_no_json, admin_required
-from innopoints.core.notifications import notify, notify_all, remove_notifications
+from innopoints.core.loading import project_loading
+from innopoints.core.notifications import broadcast, notify, notify_all, remove_notifications
+from innopoints.core.pagination import SortKey, paginate
+from innopoints.core.search import matches, prefix_tsquery, rank
 from innopoints.extensions import db
 from innopoints.models import (
     Account,
@@ -60,7 +62,8 @@ def list_ongoing_projects():
     """List ongoing projects."""
     first_activity = db.func.min(Activity.start_date)
     competence_array = db.func.ARRAY_AGG(activity_competence.c.competence_id)
-    default_order_by = 'creation_time'
+    search_query = prefix_tsquery(request.args.get('q'))
+    default_order_by = 'creation_time' if search_query is None else 'relevance'
     default_order = 'desc'
     ordering = {
         ('creation_time', 'asc'): Project.creation_time.asc(),
@@ -68,6 +71,8 @@ def list_ongoing_projects():
         ('proximity', 'asc'): first_activity.asc(),
         ('proximity', 'desc'): first_activity.desc(),
     }
+    if search_query is not None:
+        ordering['relevance', 'desc'] = rank(Project.search_vector, search_query).desc()
 
     try:
         spots = request.args.get('spots', 0, type=int)
@@ -115,20 +120,8 @@ def list_ongoing_projects():
         db_query = db_query.filter((narrowed_subquery.c.spots >= spots)
                                  | (narrowed_subquery.c.spots == -1)).group_by(Project)
 
-    if 'q' in request.args:
-        like_query = f'%{request.args["q"]}%'
-        if narrowed_subquery is None:
-            db_query = db_query.filter(
-                or_(Project.name.ilike(like_query),
-                    Activity.name.ilike(like_query),
-                    Activity.description.ilike(like_query))
-            )
-        else:
-            db_query = db_query.filter(
-                or_(Project.name.ilike(like_query),
-                    narrowed_subquery.c.name.ilike(like_query),
-                    narrowed_subquery.c.description.ilike(like_query))
-            )
+    if search_query is not None:
+        db_query = db_query.filter(matches(Project.search_vector, search_query))
 
     if start_date:
         if narrowed_subquery is None:
@@ -151,7 +144,7 @@ def list_ongoing_projects():
 
     if order_by == 'proximity':
         db_query = db_query.group_by(Project.id)
-    db_query = db_query.order_by(ordering[order_by, order])
+    db_query = db_query.order_by(ordering[order_by, order], Project.creation_time.desc())
 
     conditional_exclude = ['review_status', 'moderators']
     if current_user.is_authenticated:
@@ -166,37 +159,24 @@ def list_ongoing_projects():
                                                             'applications', 'existing_application',
                                                             'feedback_questions')]
     schema = ProjectSchema(many=True, exclude=exclude + activity_exclude + conditional_exclude)
-    return schema.jsonify(db_query.all())
+    return schema.jsonify(db_query.options(*project_loading()).all())
 
 
 @api.route('/projects/past')
 def list_past_projects():
-    """List past projects."""
-    default_page = 1
+    """List past projects, paginated with either pages or cursors."""
     default_limit = 12
 
     db_query = Project.query.filter(or_(Project.lifetime_stage == LifetimeStage.finalizing,
                                         Project.lifetime_stage == LifetimeStage.finished))
-    if 'q' in request.args:
-        like_query = f'%{request.args["q"]}%'
-        db_query = db_query.join(Project.activities).filter(
-            or_(Project.name.ilike(like_query),
-                Activity.name.ilike(like_query),
-                Activity.description.ilike(like_query))
-        ).distinct()
+    keys = [SortKey(Project.creation_time, datetime, descending=True),
+            SortKey(Project.id, int, descending=True)]
+    search_query = prefix_tsquery(request.args.get('q'))
+    if search_query is not None:
+        db_query = db_query.filter(matches(Project.search_vector, search_query))
+        keys.insert(0, SortKey(rank(Project.search_vector, search_query), float, descending=True))
 
-    try:
-        limit = int(request.args.get('limit', default_limit))
-        page = int(request.args.get('page', default_page))
-    except ValueError:
-        abort(400, {'message': 'Bad query parameters.'})
-
-    if limit < 1 or page < 1:
-        abort(400, {'message': 'Limit and page number must be positive.'})
-
-    count = db.session.query(db_query.subquery()).count()
-    db_query = db_query.order_by(Project.creation_time.desc())
-    db_query = db_query.offset(limit * (page - 1)).limit(limit)
+    projects, pagination = paginate(db_query.options(*project_loading()), keys, default_limit)
 
     conditional_exclude = ['review_status', 'moderators']
     if current_user.is_authenticated:
@@ -211,8 +191,7 @@ def list_past_projects():
                                                             'applications', 'existing_application',
                                                             'feedback_questions')]
     schema = ProjectSchema(many=True, exclude=exclude + activity_exclude + conditional_exclude)
-    return jsonify(pages=math.ceil(count / limit),
-                   data=schema.dump(db_query.all()))
+    return jsonify(data=schema.dump(projects), **pagination)
 
 
 @api.route('/projects/drafts')
@@ -334,8 +313,7 @@ def request_review(project_id):
         log.exception(err)
         abort(400, {'message': 'Data integrity violated.'})
 
-    admins = Account.query.filter_by(is_admin=True).all()
-    notify_all(admins, NotificationType.project_review_requested, {
+    broadcast(Account.is_admin, NotificationType.project_review_requested, {
         'project_id': project.id,
     })
 
@@ -464,7 +442,8 @@ class ProjectDetailAPI(MethodView):
 
     def get(self, project_id):
         """Get full information about the project"""
-        project = Project.query.get_or_404(project_id)
+        loading = project_loading(with_applications=current_user.is_authenticated)
+        project = Project.query.options(*loading).get_or_404(project_id)
         exclude = ['review_status',
                    'admin_feedback',
                    'activities.applications',
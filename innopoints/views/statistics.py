@@ -3,6 +3,8 @@
 - GET /statistics/competences
 - GET /statistics/hours
 - GET /statistics/innopoints
+
+The statistics are served from the daily rollups, see `innopoints.core.statistics`.
 """
 
 from datetime import datetime
@@ -11,21 +13,8 @@ from flask import jsonify, request
 
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort, admin_required
+from innopoints.core.statistics import competence_counts, spent_innopoints, volunteering_hours
 from innopoints.core.timezone import tz_aware_now, unix_epoch
-from innopoints.extensions import db
-from innopoints.models import (
-    Account,
-    Activity,
-    Application,
-    Competence,
-    Feedback,
-    LifetimeStage,
-    Project,
-    StockChange,
-    Transaction,
-    feedback_competence,
-    project_tags,
-)
 
 
 @api.route('/statistics/competences')
@@ -57,32 +46,9 @@ def get_competence_stats():
     student_groups = request.args.getlist('group')
     project_tag = request.args.get('tag')
 
-    competences = (
-        db.session
-            .query(Competence.id.label('competence_id'))
-            .join(feedback_competence,
-                  Competence.id == feedback_competence.c.competence_id)
-            .join(Feedback,
-                  feedback_competence.c.feedback_id == Feedback.application_id)
-            .join(Feedback.application)
-            .join(Application.activity)
-            .join(Activity.project)
-            .outerjoin(project_tags,
-                       Project.id == project_tags.c.project_id)
-            .join(Application.applicant)
-            .add_columns(db.func.count(Feedback.application_id).label('amount'))
-            .filter(Feedback.time > start_date,
-                    Feedback.time < end_date)
-            .group_by(Competence.id)
-    )
-
-    if student_groups:
-        competences = competences.filter(Account.group.in_(student_groups))
-
-    if project_tag is not None:
-        competences = competences.filter(project_tags.c.tag_id == project_tag)
-
-    return jsonify([{'id': row[0], 'amount': row[1]} for row in competences.all()])
+    competences = competence_counts(start_date, end_date, student_groups, project_tag)
+    return jsonify([{'id': competence_id, 'amount': amount}
+                    for competence_id, amount in competences.items()])
 
 
 @api.route('/statistics/hours')
@@ -114,26 +80,7 @@ def get_hour_stats():
     student_groups = request.args.getlist('group')
     project_tag = request.args.get('tag')
 
-    hours = (
-        db.session
-            .query(db.func.sum(Application.actual_hours))
-            .join(Application.activity)
-            .join(Activity.project)
-            .outerjoin(project_tags,
-                       Project.id == project_tags.c.project_id)
-            .join(Application.applicant)
-            .filter(Project.lifetime_stage == LifetimeStage.finished)
-            .filter(Activity.start_date > start_date,
-                    Activity.end_date < end_date)
-    )
-
-    if student_groups:
-        hours = hours.filter(Account.group.in_(student_groups))
-
-    if project_tag is not None:
-        hours = hours.filter(project_tags.c.tag_id == project_tag)
-
-    return jsonify(hours.scalar() or 0)
+    return jsonify(volunteering_hours(start_date, end_date, student_groups, project_tag))
 
 
 @api.route('/statistics/innopoints')
@@ -164,16 +111,4 @@ def get_innopoint_stats():
 
     student_groups = request.args.getlist('group')
 
-    innopoints = (
-        db.session
-            .query(db.func.sum(Transaction.change))
-            .join(Transaction.account)
-            .join(Transaction.stock_change)
-            .filter(StockChange.time > start_date,
-                    StockChange.time < end_date)
-    )
-
-    if student_groups:
-        innopoints = innopoints.filter(Account.group.in_(student_groups))
-
-    return jsonify(-(innopoints.scalar() or 0))
+    return jsonify(spent_innopoints(start_date, end_date, student_groups))
@@ -20,7 +20,7 @@ Color:
 - POST /colors
 """
 
-import math
+from datetime import datetime
 import logging
 
 from flask import request, jsonify
@@ -32,7 +32,8 @@ from sqlalchemy.exc import IntegrityError
 from innopoints.extensions import db
 from innopoints.blueprints import api
 from innopoints.core.helpers import abort, admin_required
-from innopoints.core.notifications import notify_all, notify, remove_notifications
+from innopoints.core.notifications import broadcast, notify, remove_notifications
+from innopoints.core.pagination import SortKey, paginate
 from innopoints.models import (
     Account,
     Color,
@@ -205,15 +206,14 @@ def purchase_variety(product_id, variety_id):
         abort(400, {'message': 'Data integrity violated.'})
     log.debug('Purchase successful')
 
-    admins = Account.query.filter_by(is_admin=True).all()
-    notify_all(admins, NotificationType.new_purchase, {
+    broadcast(Account.is_admin, NotificationType.new_purchase, {
         'account_email': current_user.email,
         'product_id': product.id,
         'variety_id': variety.id,
         'stock_change_id': new_stock_change.id,
     })
     if variety.amount <= 0:
-        notify_all(admins, NotificationType.out_of_stock, {
+        broadcast(Account.is_admin, NotificationType.out_of_stock, {
             'product_id': product.id,
             'variety_id': variety.id,
         })
@@ -228,31 +228,16 @@ def purchase_variety(product_id, variety_id):
 @api.route('/stock_changes')
 @admin_required
 def list_purchases():
-    """List all of the purchases."""
+    """List all of the purchases, paginated with either pages or cursors."""
     default_limit = 24
-    default_page = 1
-
-    try:
-        limit = int(request.args.get('limit', default_limit))
-        page = int(request.args.get('page', default_page))
-    except ValueError:
-        abort(400, {'message': 'Bad query parameters.'})
-
-    if limit < 1 or page < 1:
-        abort(400, {'message': 'Limit and page number must be positive.'})
 
     purchases = StockChange.query.filter(StockChange.amount < 0)
-    count = db.session.query(purchases.subquery()).count()
-    purchases = (
-        purchases
-            .order_by(StockChange.time.desc())
-            .offset(limit * (page - 1))
-            .limit(limit)
-    )
+    keys = [SortKey(StockChange.time, datetime, descending=True),
+            SortKey(StockChange.id, int, descending=True)]
+    purchases, pagination = paginate(purchases, keys, default_limit)
 
     schema = StockChangeSchema(many=True)
-    return jsonify(pages=math.ceil(count / limit),
-                   data=schema.dump(purchases.all()))
+    return jsonify(data=schema.dump(purchases), **pagination)
 
 
 @api.route('/stock_changes/for_review')
@@ -0,0 +1,29 @@
+"""Index account emails and names with trigrams
+
+Revision ID: 0a6e3b9f5c21
+Revises: f4a8d2c61b57
+Create Date: 2026-10-17 17:48:05.913362
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6e3b9f5c21'
+down_revision = 'f4a8d2c61b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('accounts_email_trgm', 'accounts', ['email'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+    op.create_index('accounts_full_name_trgm', 'accounts', ['full_name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    # The extension is left installed, other databases objects may depend on it
+    op.drop_index('accounts_full_name_trgm', table_name='accounts')
+    op.drop_index('accounts_email_trgm', table_name='accounts')
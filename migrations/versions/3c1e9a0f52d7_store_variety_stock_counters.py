@@ -0,0 +1,41 @@
+"""Store variety stock counters
+
+Revision ID: 3c1e9a0f52d7
+Revises: 75589019896b
+Create Date: 2026-10-17 10:03:17.842196
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1e9a0f52d7'
+down_revision = '75589019896b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('varieties', sa.Column('amount', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('varieties', sa.Column('purchases', sa.Integer(), nullable=False, server_default='0'))
+    op.execute('''
+        UPDATE varieties
+        SET amount = stock.amount,
+            purchases = stock.purchases
+        FROM (SELECT stock_changes.variety_id,
+                     SUM(stock_changes.amount) AS amount,
+                     -COALESCE(SUM(stock_changes.amount) FILTER (
+                         WHERE stock_changes.amount < 0 AND NOT accounts.is_admin
+                     ), 0) AS purchases
+              FROM stock_changes
+              JOIN accounts ON accounts.email = stock_changes.account_email
+              WHERE stock_changes.status != 'rejected'
+              GROUP BY stock_changes.variety_id) AS stock
+        WHERE varieties.id = stock.variety_id
+    ''')
+
+
+def downgrade():
+    op.drop_column('varieties', 'purchases')
+    op.drop_column('varieties', 'amount')
@@ -0,0 +1,35 @@
+"""Process the uploaded images outside of the requests
+
+Revision ID: 3f8a61c2d7e4
+Revises: b1f7e3a82c05
+Create Date: 2026-10-17 21:37:46.082913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a61c2d7e4'
+down_revision = 'b1f7e3a82c05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    file_status = sa.Enum('processing', 'ready', 'failed', name='filestatus')
+    file_status.create(op.get_bind())
+    # The files uploaded before are processed already
+    op.add_column('static_files', sa.Column('status', file_status,
+                                            server_default='ready', nullable=False))
+    op.alter_column('static_files', 'status', server_default=None)
+    op.add_column('static_files', sa.Column('crop', sa.ARRAY(sa.Integer()), nullable=True))
+    op.create_index('static_files_processing', 'static_files', ['id'],
+                    unique=False, postgresql_where=sa.text("status = 'processing'"))
+
+
+def downgrade():
+    op.drop_index('static_files_processing', table_name='static_files')
+    op.drop_column('static_files', 'crop')
+    op.drop_column('static_files', 'status')
+    sa.Enum(name='filestatus').drop(op.get_bind())
@@ -0,0 +1,24 @@
+"""Index notification payloads
+
+Revision ID: 5d2f8e6a1b34
+Revises: e7b03c5d1f92
+Create Date: 2026-10-17 14:02:36.581940
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2f8e6a1b34'
+down_revision = 'e7b03c5d1f92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('notifications_payload', 'notifications', ['payload'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'payload': 'jsonb_path_ops'})
+
+
+def downgrade():
+    op.drop_index('notifications_payload', table_name='notifications')
@@ -0,0 +1,69 @@
+"""Add the daily rollups of the statistics
+
+Revision ID: 5e2b8f14c9d3
+Revises: 9d41c7e2a3b8
+Create Date: 2026-10-17 19:12:44.208715
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2b8f14c9d3'
+down_revision = '9d41c7e2a3b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The rollups are filled by `flask refresh-statistics`, until then the sources are counted
+    op.create_table('competence_rollup',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('group', sa.String(length=64), nullable=True),
+    sa.Column('tag_id', sa.Integer(), nullable=True),
+    sa.Column('competence_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['competence_id'], ['competences.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE')
+    )
+    op.create_index(op.f('ix_competence_rollup_day'), 'competence_rollup', ['day'], unique=False)
+    op.create_table('hour_rollup',
+    sa.Column('start_day', sa.Date(), nullable=False),
+    sa.Column('end_day', sa.Date(), nullable=False),
+    sa.Column('group', sa.String(length=64), nullable=True),
+    sa.Column('tag_id', sa.Integer(), nullable=True),
+    sa.Column('hours', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE')
+    )
+    op.create_index(op.f('ix_hour_rollup_start_day'), 'hour_rollup', ['start_day'],
+                    unique=False)
+    op.create_table('innopoint_rollup',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('group', sa.String(length=64), nullable=True),
+    sa.Column('spent', sa.Integer(), nullable=False)
+    )
+    op.create_index(op.f('ix_innopoint_rollup_day'), 'innopoint_rollup', ['day'], unique=False)
+    op.create_table('rollup_refresh',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('until', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # The partial days and the days since the refresh are counted from the sources
+    op.create_index(op.f('ix_feedback_time'), 'feedback', ['time'], unique=False)
+    op.create_index(op.f('ix_activities_start_date'), 'activities', ['start_date'], unique=False)
+    op.create_index(op.f('ix_activities_end_date'), 'activities', ['end_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_activities_end_date'), table_name='activities')
+    op.drop_index(op.f('ix_activities_start_date'), table_name='activities')
+    op.drop_index(op.f('ix_feedback_time'), table_name='feedback')
+    op.drop_table('rollup_refresh')
+    op.drop_index(op.f('ix_innopoint_rollup_day'), table_name='innopoint_rollup')
+    op.drop_table('innopoint_rollup')
+    op.drop_index(op.f('ix_hour_rollup_start_day'), table_name='hour_rollup')
+    op.drop_table('hour_rollup')
+    op.drop_index(op.f('ix_competence_rollup_day'), table_name='competence_rollup')
+    op.drop_table('competence_rollup')
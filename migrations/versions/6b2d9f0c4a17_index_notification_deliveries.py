@@ -0,0 +1,30 @@
+"""Index notification deliveries
+
+Revision ID: 6b2d9f0c4a17
+Revises: c4e9a17b3d58
+Create Date: 2026-10-17 22:51:08.374922
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2d9f0c4a17'
+down_revision = 'c4e9a17b3d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves the cascade check on deleting the notifications
+    op.create_index(op.f('ix_notification_deliveries_notification_id'),
+                    'notification_deliveries', ['notification_id'], unique=False)
+    op.create_index('notification_deliveries_sent', 'notification_deliveries', ['delivered_at'],
+                    unique=False, postgresql_where=sa.text("status = 'sent'"))
+
+
+def downgrade():
+    op.drop_index('notification_deliveries_sent', table_name='notification_deliveries')
+    op.drop_index(op.f('ix_notification_deliveries_notification_id'),
+                  table_name='notification_deliveries')
@@ -0,0 +1,32 @@
+"""Store account balances
+
+Revision ID: 75589019896b
+Revises: 7186f22b9d26
+Create Date: 2026-10-17 09:12:41.530217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '75589019896b'
+down_revision = '7186f22b9d26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('accounts', sa.Column('balance', sa.Integer(), nullable=False, server_default='0'))
+    op.execute('''
+        UPDATE accounts
+        SET balance = ledger.total
+        FROM (SELECT account_email, SUM(change) AS total
+              FROM transactions
+              GROUP BY account_email) AS ledger
+        WHERE accounts.email = ledger.account_email
+    ''')
+
+
+def downgrade():
+    op.drop_column('accounts', 'balance')
@@ -0,0 +1,32 @@
+"""Cache the statistics of the accounts
+
+Revision ID: 7c3d5a9e0b46
+Revises: 5e2b8f14c9d3
+Create Date: 2026-10-17 19:58:31.540127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3d5a9e0b46'
+down_revision = '5e2b8f14c9d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled as the statistics are requested
+    op.create_table('account_statistics',
+    sa.Column('account_email', sa.String(length=128), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.ForeignKeyConstraint(['account_email'], ['accounts.email'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('account_email')
+    )
+
+
+def downgrade():
+    op.drop_table('account_statistics')
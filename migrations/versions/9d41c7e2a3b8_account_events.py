@@ -0,0 +1,78 @@
+"""Add the account events of the timeline
+
+Revision ID: 9d41c7e2a3b8
+Revises: 0a6e3b9f5c21
+Create Date: 2026-10-17 18:37:20.661438
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d41c7e2a3b8'
+down_revision = '0a6e3b9f5c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('account_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_email', sa.String(length=128), nullable=False),
+    sa.Column('entry_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('type', sa.Enum('application', 'purchase', 'promotion', 'project',
+                              name='accounteventtype'), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=True),
+    sa.Column('application_id', sa.Integer(), nullable=True),
+    sa.Column('stock_change_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['account_email'], ['accounts.email'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['application_id'], ['applications.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['stock_change_id'], ['stock_changes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('account_events_timeline', 'account_events',
+                    ['account_email', 'entry_time', 'id'], unique=False)
+    op.create_index(op.f('ix_account_events_project_id'), 'account_events', ['project_id'],
+                    unique=False)
+    op.create_index(op.f('ix_account_events_application_id'), 'account_events',
+                    ['application_id'], unique=False)
+    op.create_index(op.f('ix_account_events_stock_change_id'), 'account_events',
+                    ['stock_change_id'], unique=False)
+
+    # Fill the timeline with the events that happened so far
+    op.execute('''
+        INSERT INTO account_events (account_email, entry_time, type, project_id, application_id)
+        SELECT applications.applicant_email, applications.application_time, 'application',
+               activities.project_id, applications.id
+        FROM applications JOIN activities ON activities.id = applications.activity_id
+        WHERE NOT activities.internal
+    ''')
+    op.execute('''
+        INSERT INTO account_events (account_email, entry_time, type, stock_change_id)
+        SELECT account_email, time, 'purchase', id FROM stock_changes WHERE amount < 0
+    ''')
+    op.execute('''
+        INSERT INTO account_events (account_email, entry_time, type, project_id)
+        SELECT notifications.recipient_email, notifications.timestamp, 'promotion', projects.id
+        FROM notifications
+            JOIN projects ON projects.id = (notifications.payload ->> 'project_id')::integer
+        WHERE notifications.type = 'added_as_moderator'
+            AND projects.creator_email != notifications.recipient_email
+            AND projects.lifetime_stage != 'draft'
+    ''')
+    op.execute('''
+        INSERT INTO account_events (account_email, entry_time, type, project_id)
+        SELECT creator_email, creation_time, 'project', id FROM projects
+        WHERE lifetime_stage != 'draft'
+    ''')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_account_events_stock_change_id'), table_name='account_events')
+    op.drop_index(op.f('ix_account_events_application_id'), table_name='account_events')
+    op.drop_index(op.f('ix_account_events_project_id'), table_name='account_events')
+    op.drop_index('account_events_timeline', table_name='account_events')
+    op.drop_table('account_events')
+    sa.Enum(name='accounteventtype').drop(op.get_bind())
@@ -0,0 +1,37 @@
+"""Count unread notifications
+
+Revision ID: a41d6b2e9c08
+Revises: 3c1e9a0f52d7
+Create Date: 2026-10-17 11:24:05.913648
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41d6b2e9c08'
+down_revision = '3c1e9a0f52d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('accounts', sa.Column('unread_notifications', sa.Integer(),
+                                        nullable=False, server_default='0'))
+    op.execute('''
+        UPDATE accounts
+        SET unread_notifications = unread.total
+        FROM (SELECT recipient_email, COUNT(*) AS total
+              FROM notifications
+              WHERE NOT is_read
+              GROUP BY recipient_email) AS unread
+        WHERE accounts.email = unread.recipient_email
+    ''')
+    op.create_index('notifications_feed', 'notifications',
+                    ['recipient_email', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('notifications_feed', table_name='notifications')
+    op.drop_column('accounts', 'unread_notifications')
@@ -0,0 +1,26 @@
+"""Record the downscaled copies of the images
+
+Revision ID: b1f7e3a82c05
+Revises: 7c3d5a9e0b46
+Create Date: 2026-10-17 20:41:09.317562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1f7e3a82c05'
+down_revision = '7c3d5a9e0b46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The copies of the existing images are made by `flask generate-image-variants`
+    op.add_column('static_files', sa.Column('variants', sa.ARRAY(sa.Integer()),
+                                            server_default='{}', nullable=False))
+
+
+def downgrade():
+    op.drop_column('static_files', 'variants')
@@ -0,0 +1,51 @@
+"""Index foreign keys and hot filters
+
+Revision ID: b8e4c1d07a65
+Revises: 5d2f8e6a1b34
+Create Date: 2026-10-17 14:48:19.036257
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4c1d07a65'
+down_revision = '5d2f8e6a1b34'
+branch_labels = None
+depends_on = None
+
+
+FOREIGN_KEYS = (
+    ('transactions', 'account_email'),
+    ('transactions', 'stock_change_id'),
+    ('transactions', 'feedback_id'),
+    ('stock_changes', 'account_email'),
+    ('stock_changes', 'variety_id'),
+    ('activities', 'project_id'),
+    ('applications', 'activity_id'),
+    ('projects', 'creator_email'),
+    ('project_moderation', 'account_email'),
+)
+
+
+def upgrade():
+    for table, column in FOREIGN_KEYS:
+        op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+
+    op.create_index('stock_changes_purchases', 'stock_changes', ['time'], unique=False,
+                    postgresql_where=sa.text('amount < 0'))
+    op.create_index('stock_changes_for_review', 'stock_changes', ['time'], unique=False,
+                    postgresql_where=sa.text("status IN ('pending', 'ready_for_pickup')"))
+    op.create_index('notifications_unread', 'notifications',
+                    ['recipient_email', 'timestamp', 'id'], unique=False,
+                    postgresql_where=sa.text('NOT is_read'))
+
+
+def downgrade():
+    op.drop_index('notifications_unread', table_name='notifications')
+    op.drop_index('stock_changes_for_review', table_name='stock_changes')
+    op.drop_index('stock_changes_purchases', table_name='stock_changes')
+
+    for table, column in reversed(FOREIGN_KEYS):
+        op.drop_index(op.f(f'ix_{table}_{column}'), table_name=table)
@@ -0,0 +1,40 @@
+"""Add a full-text search vector to projects
+
+Revision ID: c3f92a7d4e18
+Revises: b8e4c1d07a65
+Create Date: 2026-10-17 16:12:49.203817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f92a7d4e18'
+down_revision = 'b8e4c1d07a65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('projects', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute('''
+        UPDATE projects SET search_vector =
+            setweight(to_tsvector('english', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(activities.name, ' ') FROM activities
+                WHERE activities.project_id = projects.id AND NOT activities.internal
+            ), '')), 'B')
+            || setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(activities.description, ' ') FROM activities
+                WHERE activities.project_id = projects.id AND NOT activities.internal
+            ), '')), 'C')
+    ''')
+    op.create_index('projects_search', 'projects', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('projects_search', table_name='projects')
+    op.drop_column('projects', 'search_vector')
@@ -0,0 +1,31 @@
+"""Mark the images whose downscaled copies are not made yet
+
+Revision ID: c4e9a17b3d58
+Revises: 3f8a61c2d7e4
+Create Date: 2026-10-17 22:14:53.640218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e9a17b3d58'
+down_revision = '3f8a61c2d7e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('static_files', 'variants', existing_type=sa.ARRAY(sa.Integer()),
+                    nullable=True, server_default=None)
+    # The images without copies are checked once more by `flask generate-image-variants`,
+    # the ones too narrow to have any are then marked with an empty array
+    op.execute("UPDATE static_files SET variants = NULL "
+               "WHERE variants = '{}' AND status = 'ready'")
+
+
+def downgrade():
+    op.execute("UPDATE static_files SET variants = '{}' WHERE variants IS NULL")
+    op.alter_column('static_files', 'variants', existing_type=sa.ARRAY(sa.Integer()),
+                    nullable=False, server_default='{}')
@@ -0,0 +1,39 @@
+"""Add notification outbox
+
+Revision ID: e7b03c5d1f92
+Revises: a41d6b2e9c08
+Create Date: 2026-10-17 12:41:52.207514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b03c5d1f92'
+down_revision = 'a41d6b2e9c08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_deliveries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('notification_id', sa.Integer(), nullable=False),
+    sa.Column('channel', sa.String(length=16), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'sent', 'failed', name='deliverystatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('notification_deliveries_due', 'notification_deliveries', ['next_attempt'],
+                    unique=False, postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    op.drop_index('notification_deliveries_due', table_name='notification_deliveries')
+    op.drop_table('notification_deliveries')
+    sa.Enum(name='deliverystatus').drop(op.get_bind())
@@ -0,0 +1,51 @@
+"""Add a full-text search vector and the color and size facets to products
+
+Revision ID: f4a8d2c61b57
+Revises: c3f92a7d4e18
+Create Date: 2026-10-17 17:03:12.480265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a8d2c61b57'
+down_revision = 'c3f92a7d4e18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.add_column('products', sa.Column('colors', postgresql.ARRAY(sa.String(length=6)),
+                                        server_default='{}', nullable=False))
+    op.add_column('products', sa.Column('sizes', postgresql.ARRAY(sa.String(length=3)),
+                                        server_default='{}', nullable=False))
+    op.execute('''
+        UPDATE products SET
+            search_vector =
+                setweight(to_tsvector('english', coalesce(name, '')), 'A')
+                || setweight(to_tsvector('english', coalesce(type, '')), 'B')
+                || setweight(to_tsvector('english', coalesce(description, '')), 'C'),
+            colors = coalesce((
+                SELECT array_agg(DISTINCT coalesce(varieties.color, '')) FROM varieties
+                WHERE varieties.product_id = products.id
+            ), '{}'),
+            sizes = coalesce((
+                SELECT array_agg(DISTINCT coalesce(varieties.size, '')) FROM varieties
+                WHERE varieties.product_id = products.id
+            ), '{}')
+    ''')
+    op.create_index('products_search', 'products', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+    op.create_index(op.f('ix_products_price'), 'products', ['price'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_products_price'), table_name='products')
+    op.drop_index('products_search', table_name='products')
+    op.drop_column('products', 'sizes')
+    op.drop_column('products', 'colors')
+    op.drop_column('products', 'search_vector')
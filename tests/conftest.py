@@ -0,0 +1,43 @@
+"""The fixtures shared by the test modules.
+
+The tests using the `app` fixture need a PostgreSQL server: DATABASE_URL points to any database
+on it, a scratch database is created next to it, migrated and dropped after the tests.
+They are skipped without DATABASE_URL."""
+
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
+
+from innopoints.app import create_app
+from innopoints.extensions import db
+
+
+@pytest.fixture(scope='session')
+def app():
+    """Create the application on a scratch database, the migrations are run by `create_app`."""
+    database_url = os.environ.get('DATABASE_URL')
+    if database_url is None:
+        pytest.skip('DATABASE_URL is not set')
+
+    url = make_url(database_url)
+    scratch_name = f'innopoints_test_{uuid.uuid4().hex[:8]}'
+    server = create_engine(url, isolation_level='AUTOCOMMIT')
+    with server.connect() as connection:
+        connection.exec_driver_sql(f'CREATE DATABASE {scratch_name}')
+
+    os.environ['DATABASE_URL'] = str(url.set(database=scratch_name))
+    os.environ.setdefault('MAIL_PASSWORD', '')
+    try:
+        scratch_app = create_app('config/dev.py')
+        yield scratch_app
+        with scratch_app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        os.environ['DATABASE_URL'] = database_url
+        with server.connect() as connection:
+            connection.exec_driver_sql(f'DROP DATABASE IF EXISTS {scratch_name}')
+        server.dispose()
@@ -0,0 +1,68 @@
+"""Checks the S3 file manager against the object storage mocked by moto, no server is needed."""
+
+import io
+import os
+from datetime import datetime
+
+import boto3
+import pytest
+from moto import mock_s3
+from werkzeug.datastructures import FileStorage
+
+from innopoints.core.file_manager.s3 import FileManagerS3, MULTIPART_THRESHOLD
+
+
+BUCKET = 'innopoints-test'
+REGION = 'us-east-1'
+
+
+@pytest.fixture
+def file_manager(monkeypatch):
+    """Return a file manager using an empty mocked bucket."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_s3():
+        boto3.client('s3', region_name=REGION).create_bucket(Bucket=BUCKET)
+        yield FileManagerS3(BUCKET, region=REGION)
+
+
+def test_round_trip(file_manager):  # pylint: disable=redefined-outer-name
+    content = b'innopoints' * 1000
+    file_manager.store(FileStorage(stream=io.BytesIO(content)), 'upload')
+
+    info = file_manager.info('upload')
+    assert info.size == len(content)
+    assert isinstance(info.modified, datetime) and info.modified.tzinfo is not None
+    with file_manager.open('upload') as stream:
+        assert stream.read() == content
+    assert file_manager.retrieve('upload') == content
+
+    file_manager.delete('upload')
+    with pytest.raises(FileNotFoundError):
+        file_manager.info('upload')
+
+
+@pytest.mark.parametrize('operation', ('info', 'open', 'delete'))
+def test_missing_file(file_manager, operation):  # pylint: disable=redefined-outer-name
+    with pytest.raises(FileNotFoundError):
+        getattr(file_manager, operation)('missing')
+
+
+def test_multipart_store(file_manager):  # pylint: disable=redefined-outer-name
+    content = os.urandom(MULTIPART_THRESHOLD * 2 + 1024)
+    file_manager.store(content, 'large')
+
+    assert file_manager.info('large').size == len(content)
+    assert file_manager.retrieve('large') == content
+    # the ETag of an object uploaded in parts ends with the number of the parts
+    etag = file_manager.client.head_object(Bucket=BUCKET, Key='large')['ETag']
+    assert '-' in etag
+
+
+def test_no_url_without_expiry(file_manager):  # pylint: disable=redefined-outer-name
+    file_manager.store(b'content', 'upload')
+    assert file_manager.url('upload', 'image/webp') is None
+
+    file_manager.url_expiry = 60
+    url = file_manager.url('upload', 'image/webp')
+    assert BUCKET in url and 'upload' in url
@@ -0,0 +1,88 @@
+"""Checks that the hot queries are served by the indexes meant for them.
+
+Needs a PostgreSQL server, see `conftest.py`. The sequential scans are disabled,
+so that the planner uses an index wherever it can, even on the empty tables."""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from innopoints.extensions import db
+from innopoints.models import Notification, StockChange, StockChangeStatus
+
+
+# The foreign keys indexed for the joins, see the b8e4c1d07a65 and 6b2d9f0c4a17 migrations
+FOREIGN_KEYS = (
+    ('transactions', 'account_email'),
+    ('transactions', 'stock_change_id'),
+    ('transactions', 'feedback_id'),
+    ('stock_changes', 'account_email'),
+    ('stock_changes', 'variety_id'),
+    ('activities', 'project_id'),
+    ('applications', 'activity_id'),
+    ('projects', 'creator_email'),
+    ('project_moderation', 'account_email'),
+    ('notification_deliveries', 'notification_id'),
+)
+
+
+@pytest.fixture
+def connection(app):
+    """Return a connection to the scratch database with the sequential scans disabled."""
+    with app.app_context(), db.engine.connect() as scratch_connection:
+        scratch_connection.exec_driver_sql('SET enable_seqscan = off')
+        yield scratch_connection
+
+
+def plan(connection, statement) -> str:  # pylint: disable=redefined-outer-name
+    """Return the text of the query plan of the statement."""
+    sql = statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})
+    return '\n'.join(row[0] for row in connection.exec_driver_sql(f'EXPLAIN {sql}'))
+
+
+def test_purchases_for_review(connection):  # pylint: disable=redefined-outer-name
+    stock_changes = StockChange.__table__
+    statement = (
+        db.select([stock_changes])
+            .where(stock_changes.c.status.in_((StockChangeStatus.pending,
+                                               StockChangeStatus.ready_for_pickup)))
+            .order_by(stock_changes.c.time.desc())
+    )
+    assert 'stock_changes_for_review' in plan(connection, statement)
+
+
+def test_purchase_list(connection):  # pylint: disable=redefined-outer-name
+    stock_changes = StockChange.__table__
+    statement = (
+        db.select([stock_changes])
+            .where(stock_changes.c.amount < 0)
+            .order_by(stock_changes.c.time.desc(), stock_changes.c.id.desc())
+            .limit(25)
+    )
+    assert 'stock_changes_purchases' in plan(connection, statement)
+
+
+def test_unread_notifications(connection):  # pylint: disable=redefined-outer-name
+    notifications = Notification.__table__
+    statement = (
+        db.select([notifications])
+            .where(notifications.c.recipient_email == 'someone@innopolis.university')
+            .where(~notifications.c.is_read)
+            .order_by(notifications.c.timestamp.desc(), notifications.c.id.desc())
+            .limit(20)
+    )
+    assert 'notifications_unread' in plan(connection, statement)
+
+
+@pytest.mark.parametrize('table_name, column_name', FOREIGN_KEYS)
+def test_foreign_key_join(connection, table_name, column_name):
+    # pylint: disable=redefined-outer-name
+    table = db.metadata.tables[table_name]
+    foreign_key, = table.c[column_name].foreign_keys
+    referenced = foreign_key.column
+    value = 1 if isinstance(referenced.type, db.Integer) else 'someone@innopolis.university'
+    statement = (
+        db.select([table])
+            .select_from(referenced.table.join(table, table.c[column_name] == referenced))
+            .where(referenced == value)
+    )
+    assert f'ix_{table_name}_{column_name}' in plan(connection, statement)
@@ -0,0 +1,127 @@
+"""Checks the push dispatcher against a stubbed push service, and the unsubscription view.
+
+Needs a PostgreSQL server, see `conftest.py`."""
+
+import pytest
+import requests
+from pywebpush import WebPushException
+
+from innopoints.core.notifications import push as push_module
+from innopoints.extensions import db
+from innopoints.models import Account, Notification, NotificationType
+
+
+EMAIL = 'subscriber@innopolis.university'
+PUSH_SERVICE = 'https://push.example.com/'
+
+
+def _response(status_code: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+# The answers of the push service by the subscription, None for a successful push
+OUTCOMES = {
+    'ok': None,
+    'gone': WebPushException('Push failed: 410 Gone', response=_response(410)),
+    'not-found': WebPushException('Push failed: 404 Not Found', response=_response(404)),
+    'server-error': WebPushException('Push failed: 500', response=_response(500)),
+    'timeout': requests.exceptions.Timeout('The push service did not answer.'),
+}
+
+
+def subscription(name: str) -> dict:
+    return {'endpoint': PUSH_SERVICE + name, 'keys': {'p256dh': 'key', 'auth': 'secret'}}
+
+
+@pytest.fixture
+def push_service(monkeypatch):
+    """Stub the push service, answering by the subscription. Returns the endpoints pushed to."""
+    pushed = []
+
+    def webpush(subscription_info, _data, **_options):
+        pushed.append(subscription_info['endpoint'])
+        error = OUTCOMES[subscription_info['endpoint'][len(PUSH_SERVICE):]]
+        if error is not None:
+            raise error
+
+    monkeypatch.setattr(push_module, 'webpush', webpush)
+    return pushed
+
+
+@pytest.fixture
+def subscribe(app):
+    """Return a function creating the account subscribed to the given subscriptions."""
+    with app.app_context():
+        def create_account(*names: str) -> Account:
+            account = Account(email=EMAIL,
+                              full_name='Subscriber',
+                              is_admin=False,
+                              notification_settings={
+                                  'subscriptions': [subscription(name) for name in names],
+                              })
+            db.session.add(account)
+            db.session.commit()
+            return account
+
+        yield create_account
+        db.session.rollback()
+        Notification.query.filter_by(recipient_email=EMAIL).delete()
+        Account.query.filter_by(email=EMAIL).delete()
+        db.session.commit()
+
+
+def push(account: Account):
+    """Push a notification to the account and return the error, if any."""
+    notification = Notification(recipient=account,
+                                type=NotificationType.service,
+                                payload={'message': 'The Innopoints store is open this Friday.'})
+    db.session.add(notification)
+    db.session.flush()
+    errors = push_module.push([notification])
+    db.session.commit()
+    return errors[notification.id]
+
+
+def endpoints(account: Account) -> list:
+    db.session.refresh(account)
+    return [subscription['endpoint']
+            for subscription in account.notification_settings['subscriptions']]
+
+
+def test_gone_subscriptions_removed(subscribe, push_service):
+    # pylint: disable=redefined-outer-name
+    account = subscribe('ok', 'gone', 'not-found', 'server-error', 'timeout')
+    assert push(account) is None
+
+    assert sorted(push_service) == sorted(PUSH_SERVICE + name for name in OUTCOMES)
+    assert endpoints(account) == [PUSH_SERVICE + name
+                                  for name in ('ok', 'server-error', 'timeout')]
+
+
+def test_failed_subscriptions_kept(subscribe, push_service):
+    # pylint: disable=redefined-outer-name,unused-argument
+    account = subscribe('server-error', 'timeout')
+    assert push(account) is not None
+    assert endpoints(account) == [PUSH_SERVICE + 'server-error', PUSH_SERVICE + 'timeout']
+
+
+def test_unsubscribe(app, subscribe):  # pylint: disable=redefined-outer-name
+    account = subscribe('ok', 'timeout')
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = EMAIL
+        session['csrf_token'] = 'token'
+
+    response = client.post('/api/v1/notifications/unsubscribe',
+                           json={'endpoint': PUSH_SERVICE + 'ok'},
+                           headers={'X-CSRF-Token': 'token'})
+    assert response.status_code == 204
+    assert endpoints(account) == [PUSH_SERVICE + 'timeout']
+
+    response = client.post('/api/v1/notifications/unsubscribe',
+                           json={'endpoint': 42},
+                           headers={'X-CSRF-Token': 'token'})
+    assert response.status_code == 400
+    assert endpoints(account) == [PUSH_SERVICE + 'timeout']
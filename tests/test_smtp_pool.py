@@ -0,0 +1,157 @@
+"""Checks the SMTP pool against a local SMTP server run by aiosmtpd, no mail server is needed."""
+
+import smtplib
+import socket
+import threading
+
+import pytest
+from aiosmtpd.controller import Controller
+from flask import Flask
+from flask_mail import Message
+
+from innopoints.core.notifications.smtp import SMTPPool
+from innopoints.extensions import mail
+
+
+class RecordingHandler:
+    """Accepts the messages and records the sessions they came over."""
+    def __init__(self):
+        self.sessions = []
+        self.messages = []
+        self.reject = False
+
+    async def handle_DATA(self, _server, session, envelope):  # pylint: disable=invalid-name
+        if self.reject:
+            return '451 Try again later'
+        if not any(known is session for known in self.sessions):
+            self.sessions.append(session)
+        self.messages.append(envelope.content)
+        return '250 OK'
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def handler():
+    """Run the SMTP server and return its handler."""
+    recording = RecordingHandler()
+    controller = Controller(recording, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    recording.port = controller.port
+    yield recording
+    controller.stop()
+
+
+@pytest.fixture
+def mail_app(handler):  # pylint: disable=redefined-outer-name
+    """Return an application sending the mail to the local server."""
+    app = Flask(__name__)
+    app.config.update(MAIL_SERVER='127.0.0.1',
+                      MAIL_PORT=handler.port,
+                      MAIL_USE_TLS=False,
+                      MAIL_DEFAULT_SENDER='innopoints@innopolis.university')
+    mail.init_app(app)
+    with app.app_context():
+        yield app
+
+
+def message(index: int = 0) -> Message:
+    return Message(f'Notification {index}',
+                   recipients=[f'user{index}@innopolis.university'],
+                   body='The Innopoints store is open this Friday.')
+
+
+@pytest.mark.usefixtures('mail_app')
+def test_connection_reused(handler):  # pylint: disable=redefined-outer-name
+    pool = SMTPPool(size=2, max_age=600, max_idle=60)
+    for index in range(5):
+        pool.send(message(index))
+    pool.close()
+
+    assert len(handler.messages) == 5
+    assert len(handler.sessions) == 1
+    assert (pool.stats.sent, pool.stats.failed) == (5, 0)
+    assert (pool.stats.connections_opened, pool.stats.connections_recycled) == (1, 0)
+
+
+@pytest.mark.usefixtures('mail_app')
+def test_old_connection_replaced(handler):  # pylint: disable=redefined-outer-name
+    pool = SMTPPool(size=2, max_age=0, max_idle=60)
+    for index in range(3):
+        pool.send(message(index))
+    pool.close()
+
+    assert len(handler.sessions) == 3
+    assert pool.stats.sent == 3
+    assert (pool.stats.connections_opened, pool.stats.connections_recycled) == (3, 2)
+
+
+@pytest.mark.usefixtures('mail_app')
+def test_dropped_connection_replaced(handler):  # pylint: disable=redefined-outer-name
+    pool = SMTPPool(size=2, max_age=600, max_idle=60)
+    pool.send(message(0))
+    # the server drops the idle session
+    pool._idle[0].connection.host.close()  # pylint: disable=protected-access
+    pool.send(message(1))
+    pool.close()
+
+    assert len(handler.messages) == 2
+    assert len(handler.sessions) == 2
+    assert (pool.stats.sent, pool.stats.failed) == (2, 0)
+    assert (pool.stats.connections_opened, pool.stats.connections_recycled) == (2, 1)
+
+
+@pytest.mark.usefixtures('mail_app')
+def test_connection_replaced_after_error(handler):  # pylint: disable=redefined-outer-name
+    pool = SMTPPool(size=2, max_age=600, max_idle=60)
+    pool.send(message(0))
+    handler.reject = True
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send(message(1))
+    handler.reject = False
+    pool.send(message(2))
+    pool.close()
+
+    assert len(handler.messages) == 2
+    assert len(handler.sessions) == 2
+    assert (pool.stats.sent, pool.stats.failed) == (2, 1)
+    assert (pool.stats.connections_opened, pool.stats.connections_recycled) == (2, 0)
+
+
+@pytest.mark.usefixtures('mail_app')
+def test_invalid_message_keeps_connection(handler):  # pylint: disable=redefined-outer-name
+    pool = SMTPPool(size=2, max_age=600, max_idle=60)
+    pool.send(message(0))
+    with pytest.raises(AssertionError):
+        pool.send(Message('No recipients', body='Nobody to send it to.'))
+    pool.send(message(1))
+    pool.close()
+
+    assert len(handler.sessions) == 1
+    assert (pool.stats.sent, pool.stats.failed) == (2, 1)
+    assert pool.stats.connections_opened == 1
+
+
+def test_concurrent_sends_counted(mail_app, handler):  # pylint: disable=redefined-outer-name
+    pool = SMTPPool(size=2, max_age=600, max_idle=60)
+
+    def send_messages(offset):
+        with mail_app.app_context():
+            for index in range(offset, offset + 10):
+                pool.send(message(index))
+
+    threads = [threading.Thread(target=send_messages, args=(offset,))
+               for offset in range(0, 40, 10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+
+    assert len(handler.messages) == 40
+    assert (pool.stats.sent, pool.stats.failed) == (40, 0)
+    assert pool.stats.connections_opened == len(handler.sessions) <= 2